@@ -20,7 +20,7 @@ sys.path.append(os.getcwd())
 from app.core.config import Settings
 from app.models.base import Base
 # Strictly import all models here so Alembic detects them
-from app.models import customer, transaction 
+from app.models import customer, transaction, screening_alert
 
 # ------------------------------------------------------------------------
 # 3. Load Config
@@ -0,0 +1,48 @@
+"""Add screening alerts
+
+Revision ID: 5c1e7a9d2f40
+Revises: 160b20ab970a
+Create Date: 2026-10-18 10:02:11.412907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7a9d2f40'
+down_revision: Union[str, Sequence[str], None] = '160b20ab970a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('screening_alerts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subject_type', sa.String(), nullable=False),
+    sa.Column('subject_ref', sa.String(), nullable=False),
+    sa.Column('screened_name', sa.String(), nullable=False),
+    sa.Column('matched_name', sa.String(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('list_uid', sa.String(), nullable=False),
+    sa.Column('list_source', sa.String(), nullable=False),
+    sa.Column('list_version', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('subject_type', 'subject_ref', 'list_source', 'list_uid', name='uq_screening_alert_subject_party')
+    )
+    op.create_index(op.f('ix_screening_alerts_id'), 'screening_alerts', ['id'], unique=False)
+    op.create_index(op.f('ix_screening_alerts_status'), 'screening_alerts', ['status'], unique=False)
+    op.create_index(op.f('ix_transactions_counterparty_name'), 'transactions', ['counterparty_name'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_transactions_counterparty_name'), table_name='transactions')
+    op.drop_index(op.f('ix_screening_alerts_status'), table_name='screening_alerts')
+    op.drop_index(op.f('ix_screening_alerts_id'), table_name='screening_alerts')
+    op.drop_table('screening_alerts')
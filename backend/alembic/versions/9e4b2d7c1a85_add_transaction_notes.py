@@ -0,0 +1,28 @@
+"""Add transaction notes
+
+Revision ID: 9e4b2d7c1a85
+Revises: 5c1e7a9d2f40
+Create Date: 2026-10-18 11:24:37.208514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b2d7c1a85'
+down_revision: Union[str, Sequence[str], None] = '5c1e7a9d2f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('transactions', sa.Column('notes', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('transactions', 'notes')
@@ -2,7 +2,7 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.v1.deps import get_db  # We will create this dependency next
-from app.schemas.customer import CustomerCreate, CustomerResponse
+from app.schemas.customer import CustomerBulkCreate, CustomerCreate, CustomerResponse
 from app.services import customer_service
 
 router = APIRouter()
@@ -15,6 +15,7 @@ async def create_new_customer(
     """
     Create a new customer.
     - Validates email, phone, and country codes.
+    - Screens the full name against the sanctions and PEP lists (sets risk and PEP flag).
     - Persists to PostgreSQL.
     - Returns the created customer with ID and KYC status.
     """
@@ -24,6 +25,21 @@ async def create_new_customer(
         # In a real app, we'd handle specific IntegrityErrors (duplicate email) here
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/bulk", response_model=List[CustomerResponse], status_code=status.HTTP_201_CREATED)
+async def create_customers_bulk(
+    payload: CustomerBulkCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Onboard many customers at once.
+    - All names are screened as one batch (sanctions + PEP).
+    - One insert round, one read-back; all-or-nothing.
+    """
+    try:
+        return await customer_service.create_customers(db=db, customers_in=payload.customers)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/", response_model=List[CustomerResponse])
 async def read_customers(
     skip: int = 0, 
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException, Depends
+from app.rules.registry import rule_registry
+from app.api.deps import get_current_user
+
+router = APIRouter()
+
+@router.get("/")
+def list_active_rules():
+    """Returns the rule set currently loaded by the registry."""
+    return rule_registry.describe()
+
+@router.post("/reload")
+async def reload_rules(current_user: str = Depends(get_current_user)):
+    """
+    Hot-reloads RULE_DEFINITIONS from configuration.
+    SECURE: Requires valid JWT Token. In-flight evaluations are not interrupted.
+    """
+    try:
+        await rule_registry.reload()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Rule reload rejected: {str(e)}")
+    return rule_registry.describe()
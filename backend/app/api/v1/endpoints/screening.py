@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from app.schemas.screening import ScreeningBatchRequest, ScreeningBatchResponse, ScreeningMatch, ScreeningResult
+from app.services.watchlist_service import watchlist_service
+from app.api.deps import get_current_user
+
+router = APIRouter()
+
+@router.post("/batch", response_model=ScreeningBatchResponse)
+def screen_batch(request: ScreeningBatchRequest, current_user: str = Depends(get_current_user)):
+    """
+    Screens up to 10,000 names against the sanctions lists in one call.
+    SECURE: Requires valid JWT Token. Runs in the threadpool: scoring is multithreaded C code.
+    """
+    threshold = watchlist_service.threshold if request.threshold is None else request.threshold
+    version = watchlist_service.version
+    outcomes = watchlist_service.screen_many(request.names, threshold=threshold, limit=request.max_matches)
+
+    results = [
+        ScreeningResult(
+            name=name,
+            is_hit=bool(matches),
+            matches=[
+                ScreeningMatch(
+                    matched_name=m.name, score=m.score, list_uid=m.entry.uid, list_name=m.entry.name, source=m.entry.source
+                )
+                for m in matches
+            ],
+        )
+        for name, matches in zip(request.names, outcomes)
+    ]
+    return ScreeningBatchResponse(
+        list_version=version,
+        threshold=threshold,
+        screened=len(results),
+        hits=sum(r.is_hit for r in results),
+        results=results,
+    )
+
+@router.get("/stats")
+def screening_stats():
+    """Sanctions list version/size and screening cache hit-rate."""
+    return watchlist_service.stats()
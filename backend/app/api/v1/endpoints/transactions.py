@@ -1,9 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Any
 from pydantic import BaseModel
 from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
 import random
+import asyncio
+from app.api.deps import get_current_user
+from app.api.v1.deps import get_db
+from app.models.transaction import Transaction as TransactionRecord
+from app.schemas.transaction import TransactionAccepted, TransactionBatchCreate, TransactionBatchResponse
+from app.schemas.transaction import TransactionCreate as TransactionIn
+from app.services import transaction_service
+from app.services.ingestion_queue import ingestion_queue
+from app.services.stream_ingestion import ingest_ndjson
 
 # Define schemas locally to avoid import errors
 class TransactionCreate(BaseModel):
@@ -39,7 +51,82 @@ async def create_transaction(transaction: TransactionCreate):
     }
 
 # -------------------------------------------------------------------
-# 2. VIEW ENDPOINT (This fixes the 405 Error on Dashboard)
+# 2. BULK INGESTION ENDPOINT (end-of-day file loads)
+# -------------------------------------------------------------------
+@router.post("/batch", response_model=TransactionBatchResponse)
+async def create_transactions_batch(
+    payload: TransactionBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+):
+    """
+    Ingests up to 10,000 transactions in one call: one customer lookup, batch rule
+    evaluation, one graph ring lookup, one multi-row insert and one commit. Decisions match
+    POST / (including the +100 circular round-trip kill switch). SECURE: Requires valid JWT Token.
+    """
+    results = await transaction_service.create_transactions_batch(db, payload.transactions)
+    rejected = sum(1 for r in results if r.status == "REJECTED")
+    return TransactionBatchResponse(accepted=len(results) - rejected, rejected=rejected, results=results)
+
+# -------------------------------------------------------------------
+# 3. STREAMING INGESTION ENDPOINT (large partner files, NDJSON in / NDJSON out)
+# -------------------------------------------------------------------
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose generator is still reading the request body.
+    The stock class (ASGI spec < 2.4) runs a disconnect listener that competes for
+    receive() and can swallow body messages; here the body reader sees the disconnect itself.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+@router.post("/stream")
+async def stream_transactions(request: Request, current_user: str = Depends(get_current_user)):
+    """
+    Accepts a (chunked) NDJSON body of transactions and streams back one NDJSON decision
+    per line, in input order, as micro-batches complete. The body is read only as fast
+    as the rule/DB pipeline keeps up. Each micro-batch goes through the /batch path, graph
+    circular check included. SECURE: Requires valid JWT Token.
+    """
+    return DuplexStreamingResponse(ingest_ndjson(request.stream()), media_type="application/x-ndjson")
+
+# -------------------------------------------------------------------
+# 4. ASYNC INGESTION ENDPOINTS (accept now, decide in micro-batches)
+# -------------------------------------------------------------------
+@router.post("/async", response_model=TransactionAccepted, status_code=202)
+async def submit_transaction(transaction: TransactionIn, current_user: str = Depends(get_current_user)):
+    """
+    Validates and enqueues a transaction, returning its UUID straight away; poll
+    GET /async/{transaction_uuid} for the decision. Decided by the /batch path, graph
+    circular check included. SECURE: Requires valid JWT Token.
+    """
+    try:
+        return ingestion_queue.submit(transaction)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, retry later.", headers={"Retry-After": "1"})
+
+@router.get("/async/{transaction_uuid}")
+async def transaction_status(transaction_uuid: str, db: AsyncSession = Depends(get_db), current_user: str = Depends(get_current_user)):
+    """QUEUED / PROCESSING, or the decision. Decisions no longer in memory are read from Postgres."""
+    record = ingestion_queue.status(transaction_uuid)
+    if record is not None:
+        return record
+    result = await db.execute(select(TransactionRecord).where(TransactionRecord.transaction_uuid == transaction_uuid))
+    stored = result.scalars().first()
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Unknown transaction.")
+    return {
+        "transaction_uuid": stored.transaction_uuid, "status": stored.status, "id": stored.id,
+        "risk_score": stored.risk_score, "flagged_reason": stored.flagged_reason,
+    }
+
+@router.get("/queue/stats")
+def ingestion_queue_stats():
+    """Queue depth, in-flight records, batch sizes and acceptance-to-decision lag."""
+    return ingestion_queue.stats()
+
+# -------------------------------------------------------------------
+# 5. VIEW ENDPOINT (This fixes the 405 Error on Dashboard)
 # -------------------------------------------------------------------
 @router.get("/", response_model=List[dict])
 async def read_transactions(limit: int = 50):
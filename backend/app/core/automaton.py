@@ -0,0 +1,61 @@
+from collections import deque
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+class AhoCorasick:
+    """
+    Multi-pattern automaton: finds every occurrence of every pattern in ONE left-to-right
+    pass over the text, whatever the number of patterns (goto / failure / output links).
+    """
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        self.goto: List[Dict[str, int]] = [{}]
+        # Pattern ending exactly at each state (-1 = none), and the next state on the
+        # failure chain that ends a pattern (so matches are enumerated without walking it)
+        self.terminal: List[int] = [-1]
+        self.fail: List[int] = [0]
+        self.output: List[int] = [0]
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.terminal.append(-1)
+                    self.fail.append(0)
+                    self.output.append(0)
+                state = next_state
+            if pattern and self.terminal[state] < 0:
+                self.terminal[state] = pattern_id
+
+        # Breadth-first: a state's failure target is always shallower, hence already final
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.output[child] = target if self.terminal[target] >= 0 else self.output[target]
+
+    def __len__(self) -> int:
+        return len(self.goto)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(end offset, pattern id) for every occurrence, overlapping ones included."""
+        goto, fail, terminal, output = self.goto, self.fail, self.terminal, self.output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match = state if terminal[state] >= 0 else output[state]
+            while match:
+                yield position + 1, terminal[match]
+                match = output[match]
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+async def next_batch(queue: asyncio.Queue, max_batch_size: int, max_wait: float) -> List[Any]:
+    """Waits for one item, then takes more until `max_batch_size` items or `max_wait` seconds after the first."""
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + max_wait
+    while len(batch) < max_batch_size:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Coalesces concurrent submit() calls into ONE bulk handler call, run in an executor
+    so CPU-bound work never blocks the event loop.
+
+    A batch is dispatched when `max_batch_size` items are waiting or `max_wait_ms`
+    after its first item, whichever comes first. The queue holds at most `max_pending`
+    items: beyond that, submit() waits (backpressure) instead of growing memory.
+    The handler receives a list of items and must return one result per item.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[T]], List[R]],
+        executor: Optional[Executor] = None,
+        max_batch_size: int = 256,
+        max_wait_ms: float = 2.0,
+        max_pending: int = 10_000,
+        name: str = "batcher",
+    ):
+        self.handler = handler
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def _ensure_worker(self):
+        # One queue/worker per event loop (tests and scripts may run several loops)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: T) -> R:
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            batch: List[Tuple[T, asyncio.Future]] = await next_batch(queue, self.max_batch_size, self.max_wait)
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch: List[Tuple[T, asyncio.Future]]):
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            results = await self._loop.run_in_executor(self.executor, self.handler, [item for item, _ in batch])
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+        }
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, List, Dict, Any
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "VertexAntiMoneyLaundering Compliance Engine"
@@ -26,6 +26,85 @@ class Settings(BaseSettings):
     AUDIT_LOG_PATH: str = "/app/logs/audit_trail.jsonl"
     COMPLIANCE_OFFICER_EMAIL: str = "officer@sentinelflow.com"
 
+    # Rule Engine: run independent rules concurrently, each bounded by a timeout (rules that
+    # query the DB are only timed on a session of their own, never on the request's)
+    RULE_ENGINE_CONCURRENT: bool = True
+    RULE_TIMEOUT_SECONDS: float = 2.0
+    # A rule that can block (max score >= 100) but errors or times out fails CLOSED with this
+    # score (FLAGGED -> manual review) instead of letting the payment through as COMPLETED
+    RULE_ERROR_RISK_SCORE: float = 50.0
+    # Skip rules that can no longer change the (MAX) risk score; audit mode runs everything
+    RULE_ENGINE_SHORT_CIRCUIT: bool = True
+    RULE_ENGINE_AUDIT_MODE: bool = False
+
+    # Velocity Store: in-memory per-customer windows instead of a COUNT query per transaction
+    VELOCITY_STORE_ENABLED: bool = True
+    VELOCITY_WINDOWS_SECONDS: List[int] = [60, 300, 3600, 86400, 604800]  # 1m/5m/1h/24h/7d
+    VELOCITY_BUCKETS_PER_WINDOW: int = 12
+    # Rolling sums of sub-threshold amounts (aggregated structuring); the threshold itself is the
+    # structuring rule's REPORTING_THRESHOLD, handed to the store when the rule warms up
+    STRUCTURING_WINDOWS_SECONDS: List[int] = [86400, 259200]  # 24h/72h
+    VELOCITY_STORE_MAX_CUSTOMERS: int = 100_000
+
+    # Rule Registry: the active rules and their thresholds (JSON in env/.env)
+    RULE_DEFINITIONS: List[Dict[str, Any]] = [
+        {"type": "structuring", "params": {"LOWER_BOUND": 9000.0, "REPORTING_THRESHOLD": 10000.0, "AGGREGATE_WINDOWS": ["24h", "72h"]}},
+        {"type": "velocity", "params": {"TIME_WINDOW_MINUTES": 5, "MAX_TRANSACTIONS": 3}},
+        {"type": "watchlist"},
+    ]
+    # Declarative rules (JSON list of specs), see app/rules/typologies.example.json
+    RULE_DSL_PATH: Optional[str] = None
+
+    # Sanctions lists: local CSV/XML files (OFAC SDN, UN consolidated, EU FSF). Empty = built-in demo list
+    SANCTIONS_LIST_PATHS: List[str] = []
+    # Compiled, memory-mapped snapshot directory (see sanctions_snapshot.py); preferred over the list files.
+    # Every worker polls it and swaps new versions / deltas in without a restart
+    SANCTIONS_SNAPSHOT_DIR: Optional[str] = None
+    SANCTIONS_SNAPSHOT_POLL_SECONDS: float = 5.0
+    # Politically exposed persons (same file formats), screened at onboarding
+    PEP_LIST_PATHS: List[str] = []
+    PEP_THRESHOLD: float = 85.0
+    # Screening outcomes per (normalized name, list version); repeat counterparties skip scoring. 0 = off
+    SCREENING_CACHE_SIZE: int = 100_000
+    # Compact customer records (id, risk, PEP flag, jurisdiction) for the transaction path; entries are
+    # evicted on ORM updates, the TTL bounds staleness from other processes. 0 = off
+    CUSTOMER_CACHE_SIZE: int = 50_000
+    CUSTOMER_CACHE_TTL_SECONDS: float = 60.0
+    # Fuzzy scoring runs in a dedicated thread pool; concurrent screenings are coalesced into one bulk call
+    SCREENING_EXECUTOR_WORKERS: int = 2
+    SCREENING_BATCH_MAX_SIZE: int = 256
+    SCREENING_BATCH_MAX_WAIT_MS: float = 2.0
+    SCREENING_QUEUE_MAX: int = 10_000
+    # Remittance text screening ({"type": "remittance"} rule): listed names plus these keywords,
+    # matched as whole words in transaction notes
+    REMITTANCE_KEYWORDS: List[str] = ["hawala", "crimea", "donetsk", "luhansk", "pyongyang", "ship to ship transfer"]
+    REMITTANCE_MIN_ALIAS_LENGTH: int = 4
+    # Streaming NDJSON ingestion: records per micro-batch, and parsed batches allowed to wait
+    # for the rule/DB pipeline before the upload is throttled
+    INGEST_STREAM_BATCH_SIZE: int = 500
+    INGEST_STREAM_MAX_PENDING_BATCHES: int = 2
+    INGEST_STREAM_MAX_LINE_BYTES: int = 65_536
+    # Accept-then-process ingestion (202 + status lookup): worker tasks, each owning the customers
+    # hashed to it, drain their queue in micro-batches of up to BATCH_SIZE records or MAX_WAIT_MS
+    # after the first, whichever comes first. Submissions beyond MAX_PENDING are refused with 503
+    # instead of growing memory
+    INGEST_QUEUE_WORKERS: int = 4
+    INGEST_QUEUE_BATCH_SIZE: int = 200
+    INGEST_QUEUE_MAX_WAIT_MS: float = 50.0
+    INGEST_QUEUE_MAX_PENDING: int = 50_000
+    # Recent decisions kept in memory for status lookups (older ones are read back from Postgres)
+    INGEST_QUEUE_STATUS_CACHE_SIZE: int = 100_000
+    INGEST_QUEUE_DRAIN_SECONDS: float = 10.0
+    # A failed micro-batch is retried RETRIES times, backing off exponentially from RETRY_BACKOFF_MS;
+    # records still failing (or undecided at shutdown) go to the dead-letter file, to be replayed
+    INGEST_QUEUE_RETRIES: int = 3
+    INGEST_QUEUE_RETRY_BACKOFF_MS: float = 200.0
+    INGEST_QUEUE_DEAD_LETTER_PATH: Optional[str] = "/app/logs/ingest_dead_letter.jsonl"
+    # Portfolio rescreen after list additions (rescreen.py): small pool + rate cap to spare live traffic
+    RESCREEN_WORKERS: int = 2
+    RESCREEN_PAGE_SIZE: int = 5000
+    RESCREEN_MAX_NAMES_PER_SECOND: float = 20_000
+
     # Pydantic V2: Construct the URL after initialization if missing
     def model_post_init(self, __context):
         if not self.DATABASE_URL:
@@ -0,0 +1,98 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+class QueryStats:
+    """
+    SQL statements and database round trips, in total and per pipeline stage.
+    A round trip is one statement sent (executemany included) or one COMMIT / ROLLBACK.
+    The BEGIN the driver issues with the first statement of a transaction is not counted.
+    """
+
+    def __init__(self):
+        self.statements = 0
+        self.round_trips = 0
+        self.stages: Dict[str, Dict[str, int]] = {}
+
+    def add(self, stage: Optional[str], statements: int):
+        self.statements += statements
+        self.round_trips += 1
+        if stage is not None:
+            counters = self.stages.setdefault(stage, {"statements": 0, "round_trips": 0})
+            counters["statements"] += statements
+            counters["round_trips"] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"statements": self.statements, "round_trips": self.round_trips, "stages": self.stages}
+
+# The stats of the request (or test) in progress, and the stage it is in. Context variables
+# follow the request into the tasks it spawns and into SQLAlchemy's greenlets
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_stage: ContextVar[Optional[str]] = ContextVar("query_stage", default=None)
+
+class _Totals:
+    """Process-wide totals over every tracked request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.stats = QueryStats()
+
+    def record(self, stats: QueryStats):
+        with self._lock:
+            self.requests += 1
+            self.stats.statements += stats.statements
+            self.stats.round_trips += stats.round_trips
+            for stage, counters in stats.stages.items():
+                totals = self.stats.stages.setdefault(stage, {"statements": 0, "round_trips": 0})
+                totals["statements"] += counters["statements"]
+                totals["round_trips"] += counters["round_trips"]
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            per_request = round(self.stats.round_trips / self.requests, 2) if self.requests else 0.0
+            return {"requests": self.requests, "round_trips_per_request": per_request, **self.stats.as_dict()}
+
+# Singleton Instance
+query_totals = _Totals()
+
+@contextmanager
+def track_queries(record: bool = True) -> Iterator[QueryStats]:
+    """Counts every statement executed inside the block (on any engine)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        if record:
+            query_totals.record(stats)
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Attributes the statements inside the block to pipeline stage `name`."""
+    token = _stage.set(name)
+    try:
+        yield
+    finally:
+        _stage.reset(token)
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+# --- Engine hooks (every engine, sync or async, in this process) -------------
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None:
+        stats.add(_stage.get(), len(parameters) if executemany and parameters else 1)
+
+@event.listens_for(Engine, "commit")
+@event.listens_for(Engine, "rollback")
+def _count_transaction_end(conn):
+    stats = _current.get()
+    if stats is not None:
+        stats.add(_stage.get(), 0)
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -5,10 +6,21 @@ from slowapi.errors import RateLimitExceeded
 from app.core.config import Settings
 
 # UPDATED: Importing all endpoints including Auth (Day 14) and Graph (Day 12)
-from app.api.v1.endpoints import customers, transactions, analytics, reports, audit, graph, auth
+from app.api.v1.endpoints import customers, transactions, analytics, reports, audit, graph, auth, rules, screening
+from app.core.query_counter import query_totals, track_queries
+from app.rules.registry import rule_registry
+from app.services.ingestion_queue import ingestion_queue
 
 settings = Settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the process-wide rule engine once, before the first request arrives
+    await rule_registry.startup()
+    yield
+    # Decide what was accepted (202) before the process goes away
+    await ingestion_queue.shutdown()
+
 # 1. INITIALIZE RATE LIMITER (Day 14 Security)
 # Strategies: FixedWindow is default. Key: Remote IP Address.
 limiter = Limiter(key_func=get_remote_address)
@@ -16,14 +28,33 @@ limiter = Limiter(key_func=get_remote_address)
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.PROJECT_VERSION,
-    description="VertexAntiMoneyLaundering Regulatory Compliance Engine API"
+    description="VertexAntiMoneyLaundering Regulatory Compliance Engine API",
+    lifespan=lifespan
 )
 
 # 2. REGISTER LIMITER CORE
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-# 3. REGISTER ROUTERS
+# 3. DATABASE ROUND-TRIP ACCOUNTING
+# Every response says how many SQL statements / round trips it cost, in total and per stage.
+# (streamed bodies are still running when the headers go out, so their queries are not included)
+@app.middleware("http")
+async def count_round_trips(request: Request, call_next):
+    with track_queries() as stats:
+        response = await call_next(request)
+    response.headers["X-DB-Statements"] = str(stats.statements)
+    response.headers["X-DB-Round-Trips"] = str(stats.round_trips)
+    if stats.stages:
+        response.headers["X-DB-Stages"] = ", ".join(f"{name}={c['round_trips']}" for name, c in stats.stages.items())
+    return response
+
+@app.get("/metrics/db")
+def database_round_trips():
+    """Round trips per request and per pipeline stage since startup."""
+    return query_totals.as_dict()
+
+# 4. REGISTER ROUTERS
 # --------------------------------------------------------------------------
 # 1. Customers Router
 app.include_router(customers.router, prefix="/api/v1/customers", tags=["customers"])
@@ -47,6 +78,12 @@ app.include_router(graph.router, prefix="/api/v1/graph", tags=["graph"])
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 # CRITICAL: Mount at root for standard OAuth2 /token path
 app.include_router(auth.router, tags=["auth"]) 
+
+# 8. Rules Router (Rule Registry inspection & hot-reload)
+app.include_router(rules.router, prefix="/api/v1/rules", tags=["rules"])
+
+# 9. Screening Router (Bulk sanctions screening)
+app.include_router(screening.router, prefix="/api/v1/screening", tags=["screening"])
 # --------------------------------------------------------------------------
 
 @app.get("/")
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, UniqueConstraint
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+class ScreeningAlert(Base):
+    """A customer or counterparty name that matches a (newly) listed sanctioned party."""
+    __tablename__ = "screening_alerts"
+    # One alert per subject and listed party: a resumed rescreen never duplicates alerts
+    __table_args__ = (
+        UniqueConstraint("subject_type", "subject_ref", "list_source", "list_uid", name="uq_screening_alert_subject_party"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # What was screened: "customer" (ref = customer id) or "counterparty" (ref = the name)
+    subject_type = Column(String, nullable=False)
+    subject_ref = Column(String, nullable=False)
+    screened_name = Column(String, nullable=False)
+
+    # What it matched
+    matched_name = Column(String, nullable=False)
+    score = Column(Float, nullable=False)
+    list_uid = Column(String, nullable=False)
+    list_source = Column(String, nullable=False)
+    list_version = Column(String, nullable=False)
+
+    # Review workflow
+    status = Column(String, default="OPEN", index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ScreeningAlert {self.subject_type}:{self.subject_ref} -> {self.matched_name} ({self.score})>"
@@ -20,11 +20,15 @@ class Transaction(Base):
     status = Column(String, default="PENDING")
     
     # Counterparty Info
-    counterparty_name = Column(String, nullable=False)
+    # Indexed: rescreens page through the distinct names in order
+    counterparty_name = Column(String, nullable=False, index=True)
     counterparty_account = Column(String, nullable=False)
     
     # MISSING FIELD ADDED HERE:
     nationality = Column(String, nullable=True)
+
+    # Free-text remittance information (screened for listed names and keywords)
+    notes = Column(String, nullable=True)
     
     # Relationship Linkage
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Any
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 # 1. Define the Standard Output for ANY Rule
@@ -8,6 +8,8 @@ class RuleResult(BaseModel):
     triggered: bool
     risk_score: float  # 0.0 to 100.0
     reason: Optional[str] = None
+    # True when the rule could not be evaluated (error / timeout) and this result fails closed
+    errored: bool = False
 
 # 2. The Abstract Contract
 class BaseRule(ABC):
@@ -15,7 +17,19 @@ class BaseRule(ABC):
     All compliance rules must inherit from this class.
     This ensures the Rule Engine can run them blindly.
     """
-    
+
+    # Scheduling hints for the engine's cost-aware ordering:
+    # the highest score this rule can ever return, and its expected latency before any is observed.
+    max_risk_score: float = 100.0
+    estimated_cost_ms: float = 1.0
+
+    def __init__(self, **params: Any):
+        # Thresholds declared in configuration override the class defaults
+        for key, value in params.items():
+            if not hasattr(type(self), key):
+                raise ValueError(f"Unknown parameter '{key}' for rule {type(self).__name__}")
+            setattr(self, key, value)
+
     @property
     @abstractmethod
     def rule_name(self) -> str:
@@ -25,7 +39,45 @@ class BaseRule(ABC):
     async def check(self, transaction: Any, customer_context: Any = None) -> RuleResult:
         """
         The core logic. 
-        Input: Transaction data (and optional customer history).
+        Input: Transaction data (and optional customer context: customer_id, the cached
+        `customer` record - risk level, PEP flag, jurisdiction - and the db session).
         Output: RuleResult.
         """
-        pass
\ No newline at end of file
+        pass
+
+    async def check_batch(self, batch: Any, customer_context: Any = None) -> Any:
+        """
+        Evaluates a whole TransactionBatch, returning a BatchRuleResult.
+        Default: one check() per row. Rules override this with vectorized logic.
+        """
+        from app.rules.batch import BatchRuleResult
+
+        customers = (customer_context or {}).get("customers") or {}
+        results = []
+        for i, transaction in enumerate(batch.transactions):
+            customer_id = int(batch.customer_ids[i])
+            context = {**(customer_context or {}), "customer_id": customer_id, "customer": customers.get(customer_id)}
+            results.append(await self.check(transaction, context))
+        return BatchRuleResult.from_results(self.rule_name, results)
+
+    def history_windows(self) -> Dict[str, List[int]]:
+        """
+        Customer activity this rule reads from the velocity store: {series: windows in
+        seconds}, series being "all" or "sub_threshold" (amounts below
+        sub_threshold_limit()). Replays build their store from these.
+        """
+        return {}
+
+    def sub_threshold_limit(self) -> Optional[float]:
+        return None
+
+    def uses_session(self) -> bool:
+        """Whether check() may query customer_context['db'] (the velocity store's DB fallback)."""
+        return bool(self.history_windows())
+
+    async def warm_up(self) -> None:
+        """
+        Optional hook, called once when the rule registry builds the rule.
+        Rules that need caches or connections prepare them here.
+        """
+        pass
@@ -0,0 +1,150 @@
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.rules.base import RuleResult
+
+class TransactionBatch:
+    """
+    Column view over many transactions, extracted once and shared by every rule.
+    Works with anything exposing the transaction attributes (TransactionCreate,
+    ORM rows, SimpleNamespace). Missing timestamps default to "now".
+    """
+
+    def __init__(self, transactions: Sequence[Any], customer_ids: Optional[Sequence[int]] = None):
+        self.transactions = transactions
+        n = len(transactions)
+        now = time.time()
+
+        self.amounts = np.fromiter((t.amount for t in transactions), dtype=np.float64, count=n)
+        if customer_ids is None:
+            customer_ids = [getattr(t, "customer_id", -1) for t in transactions]
+        self.customer_ids = np.asarray(customer_ids, dtype=np.int64)
+        self.timestamps = np.fromiter(
+            (_epoch(getattr(t, "timestamp", None), now) for t in transactions), dtype=np.float64, count=n
+        )
+        self._columns: Dict[str, np.ndarray] = {}
+        self._customer_index = None
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def column(self, field: str) -> np.ndarray:
+        """Any other attribute as an (object) array, extracted on first use."""
+        if field not in self._columns:
+            values = [getattr(t, field, None) for t in self.transactions]
+            self._columns[field] = np.asarray(values, dtype=object)
+        return self._columns[field]
+
+    def numeric(self, field: str) -> np.ndarray:
+        """A numeric attribute as float64; missing values become NaN (never match)."""
+        key = f"#{field}"
+        if key not in self._columns:
+            self._columns[key] = np.fromiter(
+                (np.nan if v is None else v for v in self.column(field)), dtype=np.float64, count=len(self)
+            )
+        return self._columns[key]
+
+    def customer_index(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(unique customer ids, row -> customer position, earliest timestamp per customer)."""
+        if self._customer_index is None:
+            customers, inverse = np.unique(self.customer_ids, return_inverse=True)
+            first_seen = np.full(len(customers), np.inf)
+            np.minimum.at(first_seen, inverse, self.timestamps)
+            self._customer_index = (customers, inverse, first_seen)
+        return self._customer_index
+
+    def prior_in_window(self, window_seconds: float, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        For every row: (count, summed amount) of EARLIER rows of the same customer in this
+        batch whose timestamp is within `window_seconds`. `mask` limits which rows count.
+        Fully vectorized: sort by (customer, time), then prefix sums + searchsorted.
+        """
+        n = len(self)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        weights = np.ones(n) if mask is None else mask.astype(np.float64)
+        values = self.amounts * weights
+
+        order = np.lexsort((self.timestamps, self.customer_ids))
+        customers = self.customer_ids[order]
+        ts = self.timestamps[order] - self.timestamps.min()
+
+        # Lay the customer groups end to end on one time axis so one searchsorted serves all
+        new_group = np.concatenate(([True], customers[1:] != customers[:-1]))
+        group_rank = np.cumsum(new_group) - 1
+        stride = ts.max() + window_seconds + 1.0
+        axis = ts + group_rank * stride
+
+        starts = np.searchsorted(axis, axis - window_seconds, side="left")
+        positions = np.arange(n)
+        count_prefix = np.concatenate(([0.0], np.cumsum(weights[order])))
+        value_prefix = np.concatenate(([0.0], np.cumsum(values[order])))
+
+        counts = np.empty(n, dtype=np.int64)
+        sums = np.empty(n)
+        counts[order] = (count_prefix[positions] - count_prefix[starts]).astype(np.int64)
+        sums[order] = value_prefix[positions] - value_prefix[starts]
+        return counts, sums
+
+class BatchRuleResult:
+    """Per-row outcome of one rule over a batch. Reasons exist only for triggered rows."""
+    __slots__ = ("rule_name", "triggered", "risk_score", "reasons")
+
+    def __init__(self, rule_name: str, triggered: np.ndarray, risk_score: np.ndarray, reasons: Dict[int, str]):
+        self.rule_name = rule_name
+        self.triggered = triggered
+        self.risk_score = risk_score
+        self.reasons = reasons
+
+    @classmethod
+    def empty(cls, rule_name: str, n: int) -> "BatchRuleResult":
+        return cls(rule_name, np.zeros(n, dtype=bool), np.zeros(n), {})
+
+    @classmethod
+    def errored(cls, rule_name: str, n: int, risk_score: float, reason: str) -> "BatchRuleResult":
+        """Every row flagged for review: the rule could not be evaluated."""
+        return cls(rule_name, np.ones(n, dtype=bool), np.full(n, risk_score), dict.fromkeys(range(n), reason))
+
+    @classmethod
+    def from_results(cls, rule_name: str, results: List[RuleResult]) -> "BatchRuleResult":
+        triggered = np.fromiter((r.triggered for r in results), dtype=bool, count=len(results))
+        scores = np.fromiter((r.risk_score if r.triggered else 0.0 for r in results), dtype=np.float64, count=len(results))
+        reasons = {i: r.reason for i, r in enumerate(results) if r.triggered}
+        return cls(rule_name, triggered, scores, reasons)
+
+class BatchEvaluation:
+    """
+    Outcome of RuleEngine.evaluate_batch: one BatchRuleResult per rule.
+    Pydantic RuleResults are only built on request, per row.
+    """
+
+    def __init__(self, size: int, rule_results: List[BatchRuleResult]):
+        self.size = size
+        self.rule_results = rule_results
+
+    @property
+    def total_risk(self) -> np.ndarray:
+        # Same aggregation as RuleEngine.calculate_total_risk: the MAX triggered score
+        if not self.rule_results:
+            return np.zeros(self.size)
+        return np.max(np.vstack([r.risk_score for r in self.rule_results]), axis=0)
+
+    def hit_counts(self) -> Dict[str, int]:
+        return {r.rule_name: int(r.triggered.sum()) for r in self.rule_results}
+
+    def results(self, i: int) -> List[RuleResult]:
+        return [
+            RuleResult(rule_name=r.rule_name, triggered=True, risk_score=float(r.risk_score[i]), reason=r.reasons.get(i))
+            for r in self.rule_results if r.triggered[i]
+        ]
+
+    def reasons(self, i: int) -> List[str]:
+        return [r.reasons.get(i) for r in self.rule_results if r.triggered[i]]
+
+def _epoch(value: Any, default: float) -> float:
+    if value is None:
+        return default
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
@@ -0,0 +1,204 @@
+import json
+import operator
+import re
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from app.rules.base import BaseRule, RuleResult
+from app.rules.batch import BatchRuleResult, TransactionBatch
+from app.services.velocity_store import velocity_store, parse_window, aggregate_from_db, batch_window_totals
+from app.core.config import settings
+
+# Comparison operators allowed in a condition
+_ORDERED_OPS = {"<": "<", "<=": "<=", ">": ">", ">=": ">="}
+_EQUALITY_OPS = {"==": "==", "!=": "!="}
+_NUMPY_OPS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "==": operator.eq, "!=": operator.ne,
+}
+_FIELD = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class DeclarativeRule(BaseRule):
+    """
+    A rule declared as data instead of a BaseRule subclass, e.g.
+
+        {
+          "name": "High-Risk Corridor Cash",
+          "risk_score": 70,
+          "reason": "Cash deposit of {amount} from {nationality}",
+          "when": [
+            {"field": "transaction_type", "op": "in", "value": ["DEPOSIT"]},
+            {"field": "nationality", "op": "in", "value": ["KP", "IR", "SY"]},
+            {"field": "amount", "op": "between", "value": [5000, 10000]},
+            {"window": "24h", "metric": "count", "op": ">=", "value": 5}
+          ]
+        }
+
+    All conditions must hold. Field conditions support <, <=, >, >=, ==, !=, in,
+    not_in and between (ordering and between only on numbers, == and != on any
+    value); window conditions compare the customer's count/amount over
+    the window, including the current transaction.
+
+    The spec is compiled ONCE: field conditions become a single generated Python
+    function (no per-call interpretation) and a NumPy mask for batch mode.
+    Non-triggered checks return one shared RuleResult instead of allocating.
+    """
+    rule_name = "Declarative Rule"
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.rule_name = spec["name"]
+        self.risk = float(spec["risk_score"])
+        self.max_risk_score = self.risk
+        self.reason_template = spec.get("reason", self.rule_name)
+
+        conditions = spec.get("when", [])
+        self.field_conditions = [c for c in conditions if "field" in c]
+        self.window_conditions = [c for c in conditions if "window" in c]
+        for condition in self.window_conditions:
+            if condition.get("metric") not in ("count", "amount") or condition.get("op") not in _NUMPY_OPS:
+                raise ValueError(f"{self.rule_name}: invalid window condition {condition}")
+        self.estimated_cost_ms = 1.0 if self.window_conditions else 0.01
+
+        self._predicate = self._compile_predicate(self.field_conditions)
+        self._clear = RuleResult(rule_name=self.rule_name, triggered=False, risk_score=0.0)
+
+    # --- Compilation ---------------------------------------------------------
+    def _compile_predicate(self, conditions: List[Dict[str, Any]]) -> Callable[[Any], bool]:
+        namespace: Dict[str, Any] = {}
+        clauses = []
+        for i, condition in enumerate(conditions):
+            field, op, value = condition["field"], condition["op"], condition.get("value")
+            if not _FIELD.match(field):
+                raise ValueError(f"{self.rule_name}: invalid field name '{field}'")
+            ref = f"_v{i}"
+            attr = f"getattr(tx, '{field}', None)"
+
+            if op in ("in", "not_in"):
+                # A bare string would become the set of its characters
+                if not isinstance(value, (list, tuple)):
+                    raise ValueError(f"{self.rule_name}: '{op}' needs a list of values on '{field}'")
+                namespace[ref] = frozenset(value)
+                clauses.append(f"({attr} {'in' if op == 'in' else 'not in'} {ref})")
+            elif op == "between":
+                low, high = value
+                if not (_is_number(low) and _is_number(high)):
+                    raise ValueError(f"{self.rule_name}: 'between' needs numeric bounds on '{field}'")
+                namespace[ref + "_lo"], namespace[ref + "_hi"] = low, high
+                clauses.append(f"((_x := {attr}) is not None and {ref}_lo <= _x < {ref}_hi)")
+            elif op in _ORDERED_OPS:
+                if not _is_number(value):
+                    raise ValueError(f"{self.rule_name}: '{op}' needs a numeric value on '{field}'")
+                namespace[ref] = value
+                clauses.append(f"((_x := {attr}) is not None and _x {_ORDERED_OPS[op]} {ref})")
+            elif op in _EQUALITY_OPS:
+                namespace[ref] = value
+                clauses.append(f"({attr} {_EQUALITY_OPS[op]} {ref})")
+            else:
+                raise ValueError(f"{self.rule_name}: unknown operator '{op}'")
+
+        source = f"def predicate(tx):\n    return {' and '.join(clauses) or 'True'}\n"
+        exec(compile(source, f"<rule {self.rule_name}>", "exec"), namespace)
+        return namespace["predicate"]
+
+    def _mask(self, batch: TransactionBatch) -> np.ndarray:
+        """Vectorized form of the field conditions."""
+        mask = np.ones(len(batch), dtype=bool)
+        for condition in self.field_conditions:
+            field, op, value = condition["field"], condition["op"], condition.get("value")
+            if op in ("in", "not_in"):
+                allowed = frozenset(value)
+                column = batch.column(field)
+                hits = np.fromiter((v in allowed for v in column), dtype=bool, count=len(column))
+                mask &= hits if op == "in" else ~hits
+                continue
+            if op in _EQUALITY_OPS and not _is_number(value):
+                # Strings (and None/booleans) compare on the object column, as in the closure
+                column = batch.column(field)
+                hits = np.fromiter((v == value for v in column), dtype=bool, count=len(column))
+                mask &= hits if op == "==" else ~hits
+                continue
+
+            column = batch.amounts if field == "amount" else batch.numeric(field)
+            if op == "between":
+                mask &= (column >= value[0]) & (column < value[1])
+            else:
+                mask &= _NUMPY_OPS[op](column, value)
+        return mask
+
+    def history_windows(self) -> Dict[str, List[int]]:
+        return {"all": sorted({parse_window(c["window"]) for c in self.window_conditions})} if self.window_conditions else {}
+
+    # --- Evaluation ----------------------------------------------------------
+    def _reason(self, transaction: Any) -> str:
+        try:
+            return self.reason_template.format_map(_Fields(transaction))
+        except (AttributeError, KeyError, ValueError, IndexError):
+            return self.reason_template
+
+    async def check(self, transaction: Any, customer_context: Any = None) -> RuleResult:
+        if not self._predicate(transaction):
+            return self._clear
+
+        if self.window_conditions:
+            if not customer_context or 'customer_id' not in customer_context:
+                return self._clear
+            windows = sorted({parse_window(c["window"]) for c in self.window_conditions})
+            customer_id = customer_context['customer_id']
+
+            aggregates = {}
+            store = customer_context.get('velocity_store')
+            if store is not None or settings.VELOCITY_STORE_ENABLED:
+                aggregates = {w: (velocity_store if store is None else store).window(customer_id, w) for w in windows}
+            if not aggregates or any(v is None for v in aggregates.values()):
+                if 'db' not in customer_context:
+                    return self._clear
+                aggregates = await aggregate_from_db(
+                    customer_context['db'], customer_id, windows, lock=customer_context.get('db_lock')
+                )
+
+            for condition in self.window_conditions:
+                count, volume = aggregates[parse_window(condition["window"])]
+                observed = count + 1 if condition["metric"] == "count" else volume + transaction.amount
+                if not _NUMPY_OPS[condition["op"]](observed, condition["value"]):
+                    return self._clear
+
+        return RuleResult(rule_name=self.rule_name, triggered=True, risk_score=self.risk, reason=self._reason(transaction))
+
+    async def check_batch(self, batch: TransactionBatch, customer_context: Any = None) -> BatchRuleResult:
+        triggered = self._mask(batch)
+
+        if self.window_conditions and triggered.any():
+            windows = sorted({parse_window(c["window"]) for c in self.window_conditions})
+            history = await batch_window_totals(customer_context or {}, batch, windows)
+            for condition in self.window_conditions:
+                window = parse_window(condition["window"])
+                stored = history[window]
+                in_batch_count, in_batch_sum = batch.prior_in_window(window)
+                if condition["metric"] == "count":
+                    observed = stored[:, 0] + in_batch_count + 1
+                else:
+                    observed = stored[:, 1] + in_batch_sum + batch.amounts
+                triggered &= _NUMPY_OPS[condition["op"]](observed, condition["value"])
+
+        reasons = {int(i): self._reason(batch.transactions[i]) for i in np.flatnonzero(triggered)}
+        return BatchRuleResult(self.rule_name, triggered, np.where(triggered, self.risk, 0.0), reasons)
+
+class _Fields(dict):
+    """format_map adapter: '{amount}' in a reason template reads transaction.amount."""
+    def __init__(self, transaction: Any):
+        super().__init__()
+        self.transaction = transaction
+
+    def __missing__(self, key: str) -> Any:
+        return getattr(self.transaction, key)
+
+def load_declarative_rules(path: Optional[str]) -> List[DeclarativeRule]:
+    """Reads a JSON list of rule specs; disabled entries ("enabled": false) are skipped."""
+    if not path:
+        return []
+    with open(path, "r") as f:
+        specs = json.load(f)
+    return [DeclarativeRule(spec) for spec in specs if spec.get("enabled", True)]
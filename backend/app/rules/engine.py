@@ -1,25 +1,259 @@
-from typing import List, Any
+import asyncio
+import logging
+import time
+from typing import List, Any, Optional, Dict
+from app.core.config import settings
 from app.rules.base import BaseRule, RuleResult
+from app.rules.batch import BatchEvaluation, BatchRuleResult, TransactionBatch
+
+logger = logging.getLogger(__name__)
+
+# Event loop turns a just-started rule gets before the next one is started
+_SETTLE_TURNS = 4
+
+class RuleStats:
+    """
+    Observed behaviour of one rule: EWMA latency and hit rate.
+    Drives the cost-aware scheduling of the engine.
+    """
+    __slots__ = ("latency_ms", "runs", "hits", "skipped", "errors")
+
+    EWMA_ALPHA = 0.1
+
+    def __init__(self, initial_latency_ms: float):
+        self.latency_ms = initial_latency_ms
+        self.runs = 0
+        self.hits = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def observe(self, latency_ms: float, triggered: bool):
+        self.latency_ms += self.EWMA_ALPHA * (latency_ms - self.latency_ms)
+        self.runs += 1
+        if triggered:
+            self.hits += 1
+
+    @property
+    def hit_rate(self) -> float:
+        # Laplace smoothing: unseen rules start at 50% instead of 0%
+        return (self.hits + 1) / (self.runs + 2)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": round(self.latency_ms, 4),
+            "runs": self.runs,
+            "hits": self.hits,
+            "hit_rate": round(self.hit_rate, 4),
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
 
 class RuleEngine:
-    def __init__(self):
+    def __init__(
+        self,
+        concurrent: Optional[bool] = None,
+        rule_timeout: Optional[float] = None,
+        short_circuit: Optional[bool] = None,
+        audit_mode: Optional[bool] = None,
+    ):
         self.rules: List[BaseRule] = []
+        self.stats: Dict[str, RuleStats] = {}
+        # Concurrent mode overlaps independent rules (e.g. Watchlist scoring runs
+        # while the Velocity COUNT query is in flight).
+        self.concurrent = settings.RULE_ENGINE_CONCURRENT if concurrent is None else concurrent
+        self.rule_timeout = settings.RULE_TIMEOUT_SECONDS if rule_timeout is None else rule_timeout
+        # Short-circuit stops evaluating once no remaining rule can change the outcome.
+        # Audit mode always runs every rule so every reason is recorded.
+        self.short_circuit = settings.RULE_ENGINE_SHORT_CIRCUIT if short_circuit is None else short_circuit
+        self.audit_mode = settings.RULE_ENGINE_AUDIT_MODE if audit_mode is None else audit_mode
 
     def add_rule(self, rule: BaseRule):
         self.rules.append(rule)
+        self.stats.setdefault(rule.rule_name, RuleStats(rule.estimated_cost_ms))
+
+    def adopt_stats(self, other: "RuleEngine"):
+        """Carries observed latency/hit rates over from a previous engine (hot-reload)."""
+        for name, stats in other.stats.items():
+            if name in self.stats:
+                self.stats[name] = stats
 
-    async def evaluate(self, transaction: Any, customer_context: Any = None) -> List[RuleResult]:
+    def schedule(self) -> List[BaseRule]:
         """
-        Run all registered rules against the transaction.
+        Cheap, decisive rules first: sort by latency per unit of expected risk.
         """
-        results = []
-        for rule in self.rules:
+        def priority(rule: BaseRule) -> float:
+            stats = self.stats[rule.rule_name]
+            return stats.latency_ms / (stats.hit_rate * rule.max_risk_score + 1e-9)
+        return sorted(self.rules, key=priority)
+
+    async def evaluate(self, transaction: Any, customer_context: Any = None, audit: Optional[bool] = None) -> List[RuleResult]:
+        """
+        Run the registered rules against the transaction.
+        Returns only the triggered results, in rule registration order.
+        """
+        audit = self.audit_mode if audit is None else audit
+        short_circuit = self.short_circuit and not audit
+
+        if self.concurrent:
+            if isinstance(customer_context, dict) and 'db' in customer_context:
+                # One AsyncSession cannot run two statements at once
+                customer_context = {**customer_context, 'db_lock': asyncio.Lock()}
+            outcomes = await self._evaluate_concurrent(transaction, customer_context, short_circuit)
+        else:
+            outcomes = await self._evaluate_sequential(transaction, customer_context, short_circuit)
+
+        results = [outcomes.get(id(rule)) for rule in self.rules]
+        return [result for result in results if result is not None and result.triggered]
+
+    async def _evaluate_sequential(self, transaction: Any, customer_context: Any, short_circuit: bool) -> Dict[int, Optional[RuleResult]]:
+        outcomes: Dict[int, Optional[RuleResult]] = {}
+        ordered = self.schedule() if short_circuit else self.rules
+        current_max = 0.0
+
+        for i, rule in enumerate(ordered):
+            if short_circuit and self._is_decided(current_max, ordered[i:]):
+                for skipped in ordered[i:]:
+                    self.stats[skipped.rule_name].skipped += 1
+                break
             # We await here because some rules might need DB access (Async)
-            result = await rule.check(transaction, customer_context)
-            if result.triggered:
-                results.append(result)
-        
-        return results
+            result = await self._run_rule(rule, transaction, customer_context)
+            outcomes[id(rule)] = result
+            if result is not None and result.triggered:
+                current_max = max(current_max, result.risk_score)
+
+        return outcomes
+
+    async def _evaluate_concurrent(self, transaction: Any, customer_context: Any, short_circuit: bool) -> Dict[int, Optional[RuleResult]]:
+        if not short_circuit:
+            results = await asyncio.gather(
+                *(self._run_rule(rule, transaction, customer_context) for rule in self.rules)
+            )
+            return {id(rule): result for rule, result in zip(self.rules, results)}
+
+        # Start rules lazily in cost order: each one gets a few loop turns to finish before the next
+        # is started, so rules that never really wait (store lookups, cached screening) decide
+        # the outcome without starting the rest, while I/O-bound rules still overlap.
+        # Started rules are never cancelled: one may be mid-statement on the shared session,
+        # which the INSERT and commit use next.
+        outcomes: Dict[int, Optional[RuleResult]] = {}
+        ordered = self.schedule()
+        running: Dict[asyncio.Task, BaseRule] = {}
+        current_max = 0.0
+
+        def collect(done):
+            nonlocal current_max
+            for task in done:
+                result = task.result()
+                outcomes[id(running.pop(task))] = result
+                if result is not None and result.triggered:
+                    current_max = max(current_max, result.risk_score)
+
+        for i, rule in enumerate(ordered):
+            if self._is_decided(current_max, ordered[i:]):
+                for skipped in ordered[i:]:
+                    self.stats[skipped.rule_name].skipped += 1
+                break
+            task = asyncio.ensure_future(self._run_rule(rule, transaction, customer_context))
+            running[task] = rule
+            # A rule that never waits needs a few turns (the timeout wrapper is a task of its own)
+            for _ in range(_SETTLE_TURNS):
+                if task.done():
+                    break
+                await asyncio.sleep(0)
+            collect([t for t in running if t.done()])
+
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            collect(done)
+        return outcomes
+
+    @staticmethod
+    def _is_decided(current_max: float, remaining: List[BaseRule]) -> bool:
+        # The total is a MAX, so rules that cannot exceed it cannot change it
+        return current_max > 0 and all(rule.max_risk_score <= current_max for rule in remaining)
+
+    @staticmethod
+    def fails_closed(rule: BaseRule) -> bool:
+        """Rules that can block (e.g. sanctions screening) must not pass a payment they could not check."""
+        return rule.max_risk_score >= 100
+
+    def _error_result(self, rule: BaseRule, error: str) -> RuleResult:
+        if not self.fails_closed(rule):
+            # Fails open, but visibly: the reason is recorded without adding any risk
+            return RuleResult(
+                rule_name=rule.rule_name, triggered=True, risk_score=0.0,
+                reason=f"{rule.rule_name} could not be evaluated ({error}); not applied.", errored=True,
+            )
+        return RuleResult(
+            rule_name=rule.rule_name, triggered=True, risk_score=settings.RULE_ERROR_RISK_SCORE,
+            reason=f"{rule.rule_name} could not be evaluated ({error}). Manual review required.", errored=True,
+        )
+
+    async def _check(self, rule: BaseRule, transaction: Any, customer_context: Any) -> RuleResult:
+        if not self.rule_timeout or self.rule_timeout <= 0:
+            return await rule.check(transaction, customer_context)
+        if not (rule.uses_session() and isinstance(customer_context, dict) and 'db' in customer_context):
+            return await asyncio.wait_for(rule.check(transaction, customer_context), timeout=self.rule_timeout)
+
+        # Never cancel a statement on the request's session: the INSERT and commit run on it
+        # next. A timed rule queries a session of its own, which is discarded if it times out
+        session_factory = customer_context.get('session_factory')
+        if session_factory is None:
+            return await rule.check(transaction, customer_context)
+        async with session_factory() as db:
+            own_context = {**customer_context, 'db': db, 'db_lock': None}
+            return await asyncio.wait_for(rule.check(transaction, own_context), timeout=self.rule_timeout)
+
+    async def _run_rule(self, rule: BaseRule, transaction: Any, customer_context: Any) -> Optional[RuleResult]:
+        """
+        Error isolation: a rule that times out or raises is logged and can never stall
+        or crash the transaction pipeline. Rules that can block fail CLOSED (an errored
+        result flags the payment for review); the others fail open with a zero-score
+        result whose reason records that they were not applied.
+        Rules that query the session are timed only on a session of their own
+        (customer_context['session_factory']), otherwise they run to completion.
+        """
+        stats = self.stats[rule.rule_name]
+        start = time.perf_counter()
+        try:
+            result = await self._check(rule, transaction, customer_context)
+            stats.observe((time.perf_counter() - start) * 1000, result.triggered)
+            return result
+        except asyncio.TimeoutError:
+            stats.errors += 1
+            stats.observe((time.perf_counter() - start) * 1000, False)
+            logger.warning(f"Rule '{rule.rule_name}' timed out after {self.rule_timeout}s.")
+            return self._error_result(rule, f"timed out after {self.rule_timeout}s")
+        except Exception as e:
+            stats.errors += 1
+            logger.error(f"Rule '{rule.rule_name}' failed: {e}")
+            return self._error_result(rule, "error")
+
+    async def evaluate_batch(
+        self, transactions: Any, customer_context: Any = None, customer_ids: Optional[List[int]] = None
+    ) -> BatchEvaluation:
+        """
+        Evaluates many transactions in one call (bulk ingestion, backtesting).
+        Every rule runs over the whole batch (vectorized where the rule supports it);
+        a failing rule is logged and, like in evaluate(), fails closed (every row
+        flagged for review) when it can block, or is "not triggered" otherwise.
+        Rows are judged as if processed in input order: earlier rows of the same
+        customer count as prior activity for later ones.
+        """
+        batch = transactions if isinstance(transactions, TransactionBatch) else TransactionBatch(transactions, customer_ids)
+        rule_results = []
+        for rule in self.rules:
+            try:
+                rule_results.append(await rule.check_batch(batch, customer_context))
+            except Exception as e:
+                self.stats[rule.rule_name].errors += 1
+                logger.error(f"Rule '{rule.rule_name}' failed on a batch of {len(batch)}: {e}")
+                error = self._error_result(rule, "error")
+                rule_results.append(
+                    BatchRuleResult.errored(rule.rule_name, len(batch), error.risk_score, error.reason)
+                    if self.fails_closed(rule) else BatchRuleResult.empty(rule.rule_name, len(batch))
+                )
+        return BatchEvaluation(len(batch), rule_results)
 
     def calculate_total_risk(self, results: List[RuleResult]) -> float:
         """
@@ -28,4 +262,4 @@ class RuleEngine:
         """
         if not results:
             return 0.0
-        return max(r.risk_score for r in results)
\ No newline at end of file
+        return max(r.risk_score for r in results)
@@ -0,0 +1,111 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Type
+from app.core.config import Settings
+from app.rules.base import BaseRule
+from app.rules.dsl import load_declarative_rules
+from app.rules.engine import RuleEngine
+from app.rules.identifier import IdentifierRule
+from app.rules.remittance import RemittanceTextRule
+from app.rules.structuring import StructuringRule
+from app.rules.velocity import VelocityRule
+from app.rules.watchlist import WatchlistRule
+
+logger = logging.getLogger(__name__)
+
+# Rule "type" keys usable in settings.RULE_DEFINITIONS
+RULE_TYPES: Dict[str, Type[BaseRule]] = {
+    "structuring": StructuringRule,
+    "velocity": VelocityRule,
+    "watchlist": WatchlistRule,
+    "remittance": RemittanceTextRule,
+    "identifier": IdentifierRule,
+}
+
+class RuleRegistry:
+    """
+    Process-wide holder of the configured RuleEngine.
+
+    The engine is built once (at startup or on first use) and shared by every request.
+    reload() builds a complete new engine off to the side and then swaps a single
+    reference, so in-flight evaluations finish on the engine they started with.
+    """
+
+    def __init__(self):
+        self._engine: Optional[RuleEngine] = None
+        self._lock = threading.Lock()
+        self.version = 0
+
+    @property
+    def engine(self) -> RuleEngine:
+        engine = self._engine
+        if engine is None:
+            with self._lock:
+                if self._engine is None:
+                    config = Settings()
+                    self._engine = self._build(config.RULE_DEFINITIONS, config.RULE_DSL_PATH)
+                    self.version += 1
+                engine = self._engine
+        return engine
+
+    def _build(self, definitions: List[Dict[str, Any]], dsl_path: Optional[str] = None) -> RuleEngine:
+        engine = RuleEngine()
+        for definition in definitions:
+            if not definition.get("enabled", True):
+                continue
+            rule_type = definition.get("type")
+            rule_cls = RULE_TYPES.get(rule_type)
+            if rule_cls is None:
+                raise ValueError(f"Unknown rule type '{rule_type}'. Known types: {sorted(RULE_TYPES)}")
+            engine.add_rule(rule_cls(**definition.get("params", {})))
+
+        # Compliance-authored typologies, compiled once per (re)load
+        for rule in load_declarative_rules(dsl_path):
+            engine.add_rule(rule)
+        return engine
+
+    async def startup(self) -> RuleEngine:
+        """Builds the engine eagerly and runs every rule's warm-up hook."""
+        engine = self.engine
+        for rule in engine.rules:
+            await rule.warm_up()
+        logger.info(f"Rule registry v{self.version} ready: {[r.rule_name for r in engine.rules]}")
+        return engine
+
+    async def reload(self, definitions: Optional[List[Dict[str, Any]]] = None, dsl_path: Optional[str] = None) -> RuleEngine:
+        """
+        Rebuilds the engine from configuration (re-reading env/.env and the rule DSL
+        file unless explicit definitions are given) and atomically swaps it in.
+        A bad configuration raises and leaves the current engine in place.
+        """
+        if definitions is None:
+            config = Settings()
+            definitions, dsl_path = config.RULE_DEFINITIONS, config.RULE_DSL_PATH
+        new_engine = self._build(definitions, dsl_path)
+        if self._engine is not None:
+            new_engine.adopt_stats(self._engine)
+        for rule in new_engine.rules:
+            await rule.warm_up()
+
+        with self._lock:
+            self._engine = new_engine
+            self.version += 1
+        logger.info(f"Rule registry reloaded to v{self.version}: {[r.rule_name for r in new_engine.rules]}")
+        return new_engine
+
+    def describe(self) -> Dict[str, Any]:
+        engine = self.engine
+        return {
+            "version": self.version,
+            "concurrent": engine.concurrent,
+            "rule_timeout": engine.rule_timeout,
+            "short_circuit": engine.short_circuit,
+            "audit_mode": engine.audit_mode,
+            "rules": [
+                {"rule_name": r.rule_name, "type": type(r).__name__, "stats": engine.stats[r.rule_name].as_dict()}
+                for r in engine.schedule()
+            ],
+        }
+
+# Singleton Instance
+rule_registry = RuleRegistry()
@@ -0,0 +1,47 @@
+import asyncio
+import numpy as np
+from app.rules.base import BaseRule, RuleResult
+from app.rules.batch import BatchRuleResult, TransactionBatch
+from app.services.text_screening import text_screening_service
+
+class RemittanceTextRule(BaseRule):
+    """Screens the free-text `notes` of a payment for listed names, vessels and keywords."""
+    rule_name = "Remittance Text Screen"
+    max_risk_score = 100.0
+    estimated_cost_ms = 0.2
+
+    # A listed party named in the notes blocks; a keyword alone only flags
+    KEYWORD_RISK_SCORE = 50.0
+
+    async def warm_up(self) -> None:
+        # Compile the automaton for the current list version before traffic arrives
+        await asyncio.to_thread(text_screening_service.screener)
+
+    def _assess(self, screener, notes):
+        hits = screener.scan(notes) if notes else []
+        if not hits:
+            return 0.0, "Clear"
+        sanctions = [h for h in hits if h.kind == "sanction"]
+        if sanctions:
+            listed = ", ".join(f"'{h.pattern}'" for h in sanctions[:3])
+            return 100.0, f"SANCTIONED NAME IN NOTES: {listed}"
+        keywords = ", ".join(f"'{h.pattern}'" for h in hits[:3])
+        return self.KEYWORD_RISK_SCORE, f"RISK KEYWORD IN NOTES: {keywords}"
+
+    async def check(self, transaction, customer_context: dict = None) -> RuleResult:
+        # Never compiles on the event loop: after a list change the previous automaton is used until the new one is ready
+        screener = await text_screening_service.current()
+        score, reason = self._assess(screener, getattr(transaction, "notes", None))
+        return RuleResult(rule_name=self.rule_name, triggered=score > 0, risk_score=score, reason=reason)
+
+    async def check_batch(self, batch: TransactionBatch, customer_context: dict = None) -> BatchRuleResult:
+        # Scan each distinct message once
+        screener = await text_screening_service.current()
+        notes = batch.column("notes")
+        unique_notes, inverse = np.unique(np.array([n or "" for n in notes], dtype=str), return_inverse=True)
+        outcomes = [self._assess(screener, text) for text in unique_notes.tolist()]
+
+        scores = np.fromiter((score for score, _ in outcomes), dtype=np.float64, count=len(outcomes))[inverse]
+        triggered = scores > 0
+        reasons = {int(i): outcomes[inverse[i]][1] for i in np.flatnonzero(triggered)}
+        return BatchRuleResult(self.rule_name, triggered, scores, reasons)
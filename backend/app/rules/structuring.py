@@ -1,13 +1,34 @@
-from typing import Any
+from typing import Any, Dict, List, Optional
+import numpy as np
+from app.core.config import settings
 from app.rules.base import BaseRule, RuleResult
+from app.rules.batch import BatchRuleResult, TransactionBatch
+from app.services.velocity_store import velocity_store, parse_window, aggregate_from_db, batch_window_totals
 
 class StructuringRule(BaseRule):
     rule_name = "Structuring Detection"
+    max_risk_score = 75.0
+    estimated_cost_ms = 0.01
     
     # Configurable thresholds
     LOWER_BOUND = 9000.0
     REPORTING_THRESHOLD = 10000.0
 
+    # Aggregated mode (smurfing): rolling windows of sub-threshold amounts, e.g. ["24h", "72h"]
+    AGGREGATE_WINDOWS: List[str] = []
+
+    def history_windows(self) -> Dict[str, List[int]]:
+        return {"sub_threshold": sorted({parse_window(label) for label in self.AGGREGATE_WINDOWS})} if self.AGGREGATE_WINDOWS else {}
+
+    def sub_threshold_limit(self) -> Optional[float]:
+        return self.REPORTING_THRESHOLD
+
+    async def warm_up(self) -> None:
+        if self.AGGREGATE_WINDOWS:
+            # The store's sub-threshold series follows this rule's threshold (one source of truth)
+            velocity_store.track_sub_threshold(self.REPORTING_THRESHOLD)
+            await velocity_store.ensure_warm()
+
     async def check(self, transaction: Any, customer_context: Any = None) -> RuleResult:
         amount = transaction.amount
         
@@ -19,5 +40,74 @@ class StructuringRule(BaseRule):
                 risk_score=75.0, # High risk
                 reason=f"Transaction amount {amount} is just below the reporting threshold of {self.REPORTING_THRESHOLD}. Potential Structuring."
             )
+
+        # Logic: Do several smaller deposits add up to more than the threshold?
+        if self.AGGREGATE_WINDOWS and amount < self.REPORTING_THRESHOLD:
+            reason = await self._check_aggregate(amount, customer_context)
+            if reason:
+                return RuleResult(rule_name=self.rule_name, triggered=True, risk_score=75.0, reason=reason)
         
-        return RuleResult(rule_name=self.rule_name, triggered=False, risk_score=0.0)
\ No newline at end of file
+        return RuleResult(rule_name=self.rule_name, triggered=False, risk_score=0.0)
+
+    async def _check_aggregate(self, amount: float, customer_context: Any) -> Optional[str]:
+        if not customer_context or 'customer_id' not in customer_context:
+            return None
+        customer_id = customer_context['customer_id']
+        windows = {parse_window(label): label for label in self.AGGREGATE_WINDOWS}
+
+        # Fast path: the store's incremental sub-threshold sums (same threshold only)
+        aggregates = {}
+        store = customer_context.get('velocity_store')
+        enabled = store is not None or settings.VELOCITY_STORE_ENABLED
+        store = velocity_store if store is None else store
+        if enabled and store.sub_threshold_limit == self.REPORTING_THRESHOLD:
+            aggregates = {w: store.window(customer_id, w, series="sub_threshold") for w in windows}
+
+        if not aggregates or any(v is None for v in aggregates.values()):
+            if 'db' not in customer_context:
+                return None
+            aggregates = await aggregate_from_db(
+                customer_context['db'], customer_id, sorted(windows), below_amount=self.REPORTING_THRESHOLD,
+                lock=customer_context.get('db_lock')
+            )
+
+        for window in sorted(windows):
+            count, total = aggregates[window]
+            if count and total + amount >= self.REPORTING_THRESHOLD:
+                return (
+                    f"{count + 1} sub-threshold transactions totalling {total + amount:.2f} in last {windows[window]} "
+                    f"exceed the reporting threshold of {self.REPORTING_THRESHOLD}. Potential Structuring (Aggregated)."
+                )
+        return None
+
+    async def check_batch(self, batch: TransactionBatch, customer_context: Any = None) -> BatchRuleResult:
+        """Vectorized: the threshold test is one NumPy expression over all amounts."""
+        amounts = batch.amounts
+        triggered = (amounts >= self.LOWER_BOUND) & (amounts < self.REPORTING_THRESHOLD)
+        reasons = {
+            int(i): f"Transaction amount {amounts[i]} is just below the reporting threshold of {self.REPORTING_THRESHOLD}. Potential Structuring."
+            for i in np.flatnonzero(triggered)
+        }
+
+        if self.AGGREGATE_WINDOWS and len(batch):
+            windows = {parse_window(label): label for label in self.AGGREGATE_WINDOWS}
+            sub_threshold = amounts < self.REPORTING_THRESHOLD
+            history = await batch_window_totals(
+                customer_context or {}, batch, sorted(windows),
+                series="sub_threshold", below_amount=self.REPORTING_THRESHOLD
+            )
+            for window in sorted(windows):
+                # Prior activity = history before the batch + earlier rows of the batch
+                stored = history[window]
+                in_batch_count, in_batch_sum = batch.prior_in_window(window, mask=sub_threshold)
+                count = stored[:, 0] + in_batch_count
+                total = stored[:, 1] + in_batch_sum
+                hits = sub_threshold & ~triggered & (count > 0) & (total + amounts >= self.REPORTING_THRESHOLD)
+                for i in np.flatnonzero(hits):
+                    reasons[int(i)] = (
+                        f"{int(count[i]) + 1} sub-threshold transactions totalling {total[i] + amounts[i]:.2f} in last {windows[window]} "
+                        f"exceed the reporting threshold of {self.REPORTING_THRESHOLD}. Potential Structuring (Aggregated)."
+                    )
+                triggered |= hits
+
+        return BatchRuleResult(self.rule_name, triggered, np.where(triggered, 75.0, 0.0), reasons)
@@ -1,44 +1,115 @@
-from datetime import datetime, timedelta
-from typing import Any
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.transaction import Transaction
+import logging
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from app.core.config import settings
 from app.rules.base import BaseRule, RuleResult
+from app.rules.batch import BatchRuleResult, TransactionBatch
+from app.services.velocity_store import velocity_store, parse_window, aggregate_from_db, batch_window_totals
+
+logger = logging.getLogger(__name__)
 
 class VelocityRule(BaseRule):
     rule_name = "Velocity/High Frequency Check"
+    max_risk_score = 60.0
+    estimated_cost_ms = 5.0
     
     # Thresholds: More than 3 transactions in 5 minutes
     TIME_WINDOW_MINUTES = 5
     MAX_TRANSACTIONS = 3
 
+    # Additional windows, e.g. {"1h": {"count": 20}, "24h": {"count": 50, "amount": 50000.0}}
+    WINDOW_LIMITS: Dict[str, Dict[str, float]] = {}
+
+    def _limits(self) -> Dict[int, Tuple[str, Dict[str, float]]]:
+        limits = {
+            parse_window(label): (label, limit) for label, limit in self.WINDOW_LIMITS.items()
+        }
+        primary = self.TIME_WINDOW_MINUTES * 60
+        label, limit = limits.get(primary, (f"{self.TIME_WINDOW_MINUTES}m", {}))
+        limits[primary] = (label, {**limit, "count": self.MAX_TRANSACTIONS})
+        return limits
+
+    def history_windows(self) -> Dict[str, List[int]]:
+        return {"all": sorted(self._limits())}
+
+    async def warm_up(self) -> None:
+        # Load recent history once so checks can be answered from memory
+        untracked = [label for w, (label, _) in self._limits().items() if not velocity_store.supports(w)]
+        if untracked:
+            logger.warning(f"{self.rule_name}: windows {untracked} are not tracked by the velocity store, using the DB path.")
+        await velocity_store.ensure_warm()
+
     async def check(self, transaction: Any, customer_context: Any = None) -> RuleResult:
-        # We need the DB session to check history
-        if not customer_context or 'db' not in customer_context:
+        # We need the customer (and the DB session for the fallback path)
+        if not customer_context or 'customer_id' not in customer_context:
             return RuleResult(rule_name=self.rule_name, triggered=False, risk_score=0.0)
 
-        db: AsyncSession = customer_context['db']
         customer_id = customer_context.get('customer_id')
+        limits = self._limits()
 
-        # Define the lookback window
-        window_start = datetime.now() - timedelta(minutes=self.TIME_WINDOW_MINUTES)
+        # Fast path: the in-memory windows (None when the store cannot answer)
+        aggregates = {}
+        store = customer_context.get('velocity_store')
+        if store is not None or settings.VELOCITY_STORE_ENABLED:
+            aggregates = {w: (velocity_store if store is None else store).window(customer_id, w) for w in limits}
 
-        # Query: Count EXISTING transactions for this customer in the window
-        query = select(func.count(Transaction.id)).where(
-            Transaction.customer_id == customer_id,
-            Transaction.timestamp >= window_start
-        )
-        
-        result = await db.execute(query)
-        count = result.scalar() or 0
+        if not aggregates or any(v is None for v in aggregates.values()):
+            if 'db' not in customer_context:
+                return RuleResult(rule_name=self.rule_name, triggered=False, risk_score=0.0)
+            aggregates = await aggregate_from_db(
+                customer_context['db'], customer_id, sorted(limits), lock=customer_context.get('db_lock')
+            )
 
-        # Logic: If count is ALREADY at threshold, this new one breaks it.
-        if count >= self.MAX_TRANSACTIONS:
+        # Logic: If a window is ALREADY at its limit, this new transaction breaks it.
+        reasons = []
+        for window in sorted(limits):
+            label, limit = limits[window]
+            count, volume = aggregates[window]
+            if "count" in limit and count >= limit["count"]:
+                reasons.append(f"{count} prior transactions in last {label}")
+            if "amount" in limit and volume + transaction.amount > limit["amount"]:
+                reasons.append(f"volume {volume + transaction.amount:.2f} in last {label} exceeds {limit['amount']}")
+
+        if reasons:
             return RuleResult(
                 rule_name=self.rule_name,
                 triggered=True,
                 risk_score=60.0, # Medium-High Risk
-                reason=f"Velocity High: {count} prior transactions in last {self.TIME_WINDOW_MINUTES} mins."
+                reason=f"Velocity High: {'; '.join(reasons)}."
             )
 
-        return RuleResult(rule_name=self.rule_name, triggered=False, risk_score=0.0)
\ No newline at end of file
+        return RuleResult(rule_name=self.rule_name, triggered=False, risk_score=0.0)
+
+    async def check_batch(self, batch: TransactionBatch, customer_context: Any = None) -> BatchRuleResult:
+        """
+        One store lookup (or ONE grouped query) per customer instead of one COUNT per row;
+        earlier rows of the same customer inside the batch count as prior activity.
+        """
+        n = len(batch)
+        if n == 0:
+            return BatchRuleResult.empty(self.rule_name, 0)
+        limits = self._limits()
+        history = await batch_window_totals(customer_context or {}, batch, sorted(limits))
+
+        reasons_per_row = [[] for _ in range(n)]
+        triggered = np.zeros(n, dtype=bool)
+        for window in sorted(limits):
+            label, limit = limits[window]
+            stored = history[window]
+            in_batch_count, in_batch_sum = batch.prior_in_window(window)
+            count = stored[:, 0] + in_batch_count
+            volume = stored[:, 1] + in_batch_sum
+
+            if "count" in limit:
+                hits = count >= limit["count"]
+                for i in np.flatnonzero(hits):
+                    reasons_per_row[i].append(f"{int(count[i])} prior transactions in last {label}")
+                triggered |= hits
+            if "amount" in limit:
+                hits = volume + batch.amounts > limit["amount"]
+                for i in np.flatnonzero(hits):
+                    reasons_per_row[i].append(f"volume {volume[i] + batch.amounts[i]:.2f} in last {label} exceeds {limit['amount']}")
+                triggered |= hits
+
+        reasons = {int(i): f"Velocity High: {'; '.join(reasons_per_row[i])}." for i in np.flatnonzero(triggered)}
+        return BatchRuleResult(self.rule_name, triggered, np.where(triggered, 60.0, 0.0), reasons)
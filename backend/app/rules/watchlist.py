@@ -1,26 +1,34 @@
+import numpy as np
 from app.rules.base import BaseRule, RuleResult
+from app.rules.batch import BatchRuleResult, TransactionBatch
 from app.services.watchlist_service import watchlist_service
 
 class WatchlistRule(BaseRule):
     # This ID must match what the RuleEngine expects
     rule_name = "Global Sanctions Screen"
+    max_risk_score = 100.0
+    estimated_cost_ms = 0.5
+
+    async def warm_up(self) -> None:
+        # Build the sanctions index from the configured list files before traffic arrives
+        await watchlist_service.ensure_loaded()
 
     # METHOD NAME: check (Matches BaseRule)
     async def check(self, transaction, customer_context: dict = None) -> RuleResult:
         # 1. Identify the Target
         target_name = transaction.counterparty_name
         
-        # 2. Query the Intelligence Service (RapidFuzz)
-        is_hit, match_name, score = watchlist_service.check_sanction(target_name)
+        # 2. Query the Intelligence Service (RapidFuzz, off the event loop unless cached)
+        match = await watchlist_service.best_match_async(target_name)
         
         # 3. Decision Logic
-        if is_hit:
+        if match:
             return RuleResult(
                 rule_name=self.rule_name,
                 triggered=True,
                 # FIX: Changed 'risk_score_impact' to 'risk_score' to match Base definition
                 risk_score=100.0,  
-                reason=f"SANCTION MATCH: '{target_name}' ~ '{match_name}' (Score: {score:.1f}%)"
+                reason=f"SANCTION MATCH: '{target_name}' ~ '{match.name}' (Score: {match.score:.1f}%)"
             )
             
         return RuleResult(
@@ -29,4 +37,18 @@ class WatchlistRule(BaseRule):
             # FIX: Changed 'risk_score_impact' to 'risk_score'
             risk_score=0.0,
             reason="Clear"
-        )
\ No newline at end of file
+        )
+
+    async def check_batch(self, batch: TransactionBatch, customer_context: dict = None) -> BatchRuleResult:
+        # Screen each distinct counterparty once (cache, then one matrix scoring call for the rest)
+        names = batch.column("counterparty_name")
+        unique_names, inverse = np.unique(names.astype(str), return_inverse=True)
+        outcomes = await watchlist_service.best_matches_async(unique_names.tolist())
+
+        hit_by_name = np.fromiter((match is not None for match in outcomes), dtype=bool, count=len(outcomes))
+        triggered = hit_by_name[inverse]
+        reasons = {}
+        for i in np.flatnonzero(triggered):
+            match = outcomes[inverse[i]]
+            reasons[int(i)] = f"SANCTION MATCH: '{names[i]}' ~ '{match.name}' (Score: {match.score:.1f}%)"
+        return BatchRuleResult(self.rule_name, triggered, np.where(triggered, 100.0, 0.0), reasons)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, EmailStr, Field
 from app.models.customer import RiskLevel
 
@@ -15,6 +15,10 @@ class CustomerBase(BaseModel):
 class CustomerCreate(CustomerBase):
     pass
 
+# Bulk onboarding: names are screened as one batch
+class CustomerBulkCreate(BaseModel):
+    customers: List[CustomerCreate] = Field(..., min_length=1, max_length=1000)
+
 # Output Schema
 class CustomerResponse(CustomerBase):
     id: int
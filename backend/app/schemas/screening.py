@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class ScreeningBatchRequest(BaseModel):
+    names: List[str] = Field(..., min_length=1, max_length=10000)
+    # Defaults to the service threshold (80.0)
+    threshold: Optional[float] = Field(None, gt=0, le=100)
+    max_matches: int = Field(1, ge=1, le=10)
+
+class ScreeningMatch(BaseModel):
+    matched_name: str
+    score: float
+    list_uid: str
+    list_name: str
+    source: str
+
+class ScreeningResult(BaseModel):
+    name: str
+    is_hit: bool
+    matches: List[ScreeningMatch]
+
+class ScreeningBatchResponse(BaseModel):
+    list_version: str
+    threshold: float
+    screened: int
+    hits: int
+    results: List[ScreeningResult]
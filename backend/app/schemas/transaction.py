@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class TransactionBase(BaseModel):
     amount: float = Field(..., gt=0)
@@ -10,6 +10,8 @@ class TransactionBase(BaseModel):
     counterparty_account: str = Field(..., min_length=1)
     transaction_type: str
     nationality: Optional[str] = None
+    # Remittance information / payment reference
+    notes: Optional[str] = Field(None, max_length=1000)
 
     @field_validator('transaction_type')
     def validate_type(cls, v):
@@ -30,4 +32,28 @@ class TransactionResponse(TransactionBase):
     timestamp: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Bulk ingestion (end-of-day files): per-item results come back in input order
+class TransactionBatchCreate(BaseModel):
+    transactions: List[TransactionCreate] = Field(..., min_length=1, max_length=10000)
+
+class TransactionBatchItem(BaseModel):
+    index: int
+    status: str                      # COMPLETED / FLAGGED / BLOCKED, or REJECTED (not persisted)
+    id: Optional[int] = None
+    transaction_uuid: Optional[str] = None
+    risk_score: float = 0.0
+    flagged_reason: Optional[str] = None
+    error: Optional[str] = None
+
+class TransactionBatchResponse(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[TransactionBatchItem]
+
+# Accept-then-process ingestion: 202 with the UUID to poll for the decision
+class TransactionAccepted(BaseModel):
+    transaction_uuid: str
+    status: str                      # QUEUED
+    accepted_at: datetime
@@ -0,0 +1,90 @@
+import logging
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.customer import Customer
+
+logger = logging.getLogger(__name__)
+
+class CustomerContext(NamedTuple):
+    id: int
+    full_name: str
+    risk_score: float
+    risk_level: Optional[str]       # RiskLevel value
+    is_pep: bool
+    jurisdiction: Optional[str]
+
+# Only what the hot path and the rules need, not the whole row
+_COLUMNS = (Customer.id, Customer.full_name, Customer.risk_score, Customer.risk_level, Customer.is_pep, Customer.jurisdiction)
+
+def _context(row: Any) -> CustomerContext:
+    risk_level = row.risk_level.value if hasattr(row.risk_level, "value") else row.risk_level
+    return CustomerContext(row.id, row.full_name, row.risk_score or 0.0, risk_level, bool(row.is_pep), row.jurisdiction)
+
+class CustomerContextCache:
+    """
+    Bounded, TTL-based cache of compact customer records for the transaction path.
+
+    Filled on first use; an ORM update or delete of a Customer evicts its entry at
+    flush and again at commit, so the next transaction reads the new state. Changes
+    made outside this process (or by bulk UPDATE statements, which skip ORM events)
+    are picked up when the entry expires. Unknown ids are not cached: a customer
+    may be created a moment later.
+    """
+
+    def __init__(self, max_size: int = settings.CUSTOMER_CACHE_SIZE, ttl_seconds: float = settings.CUSTOMER_CACHE_TTL_SECONDS):
+        self.cache = LRUCache(max_size, ttl_seconds=ttl_seconds)
+
+    def peek(self, customer_id: int) -> Optional[CustomerContext]:
+        """The cached context, without ever querying."""
+        return self.cache.get(customer_id)
+
+    async def get(self, db: Any, customer_id: int) -> Optional[CustomerContext]:
+        return (await self.get_many(db, [customer_id])).get(customer_id)
+
+    async def get_many(self, db: Any, customer_ids: Iterable[int]) -> Dict[int, CustomerContext]:
+        """Contexts of the known customers among `customer_ids`; misses are read with ONE query."""
+        found: Dict[int, CustomerContext] = {}
+        missing = []
+        for customer_id in set(customer_ids):
+            context = self.cache.get(customer_id)
+            if context is None:
+                missing.append(customer_id)
+            else:
+                found[customer_id] = context
+        if missing:
+            result = await db.execute(select(*_COLUMNS).where(Customer.id.in_(sorted(missing))))
+            for row in result.all():
+                context = _context(row)
+                self.cache.set(context.id, context)
+                found[context.id] = context
+        return found
+
+    def invalidate(self, customer_id: int):
+        self.cache.pop(customer_id)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        return self.cache.stats()
+
+# Singleton Instance
+customer_context_cache = CustomerContextCache()
+
+# --- Invalidation --------------------------------------------------------------
+@event.listens_for(Customer, "after_update")
+@event.listens_for(Customer, "after_delete")
+def _evict_changed_customer(mapper, connection, target):
+    customer_context_cache.invalidate(target.id)
+    # Evict again once committed: a concurrent reader may re-cache the old row in between
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_customers", set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed_customers(session):
+    for customer_id in session.info.pop("changed_customers", ()):
+        customer_context_cache.invalidate(customer_id)
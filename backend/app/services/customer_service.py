@@ -1,22 +1,49 @@
+from typing import List, Optional, Sequence, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.customer import Customer, RiskLevel
 from app.schemas.customer import CustomerCreate
+from app.services.sanctions_index import SanctionMatch
+from app.services.watchlist_service import watchlist_service
+
+# Onboarding risk per screening outcome
+SANCTION_RISK_SCORE = 100.0
+PEP_RISK_SCORE = 60.0
+
+def risk_level_for(risk_score: float) -> RiskLevel:
+    """Maps a 0-100 customer risk score to its level."""
+    if risk_score >= 100:
+        return RiskLevel.CRITICAL
+    elif risk_score >= 60:
+        return RiskLevel.HIGH
+    elif risk_score >= 30:
+        return RiskLevel.MEDIUM
+    return RiskLevel.LOW
+
+def assess_screening(sanction: Optional[SanctionMatch], pep: Optional[SanctionMatch]) -> dict:
+    """Initial compliance state from the onboarding screening of `full_name`."""
+    risk_score = SANCTION_RISK_SCORE if sanction else PEP_RISK_SCORE if pep else 0.0
+    return {
+        "kyc_status": "PENDING",
+        "risk_score": risk_score,
+        "risk_level": risk_level_for(risk_score),
+        "is_pep": pep is not None,
+    }
+
+def _build(customers_in: Sequence[CustomerCreate], outcomes: List[Tuple[Optional[SanctionMatch], Optional[SanctionMatch]]]) -> List[Customer]:
+    return [Customer(**c.model_dump(), **assess_screening(*outcome)) for c, outcome in zip(customers_in, outcomes)]
 
 async def create_customer(db: AsyncSession, customer_in: CustomerCreate) -> Customer:
     """
     Creates a new customer in the Postgres database.
-    Injects default initial compliance state (PENDING, LOW Risk).
+    The full name is screened against the sanctions and PEP lists first, and the
+    initial compliance state (PENDING, risk score/level, PEP flag) follows from it.
     """
-    # 1. Create the ORM object
-    # We unpack the input data AND explicitly set the initial compliance state
-    db_customer = Customer(
-        **customer_in.model_dump(),
-        kyc_status="PENDING",
-        risk_score=0.0,
-        risk_level=RiskLevel.LOW,  # Ensure this matches your Enum in models/customer.py
-        is_pep=False
-    )
+    # 1. Screen, then create the ORM object with the resulting compliance state.
+    # The lists are loaded here too: the rules that would otherwise load them may be disabled
+    await watchlist_service.ensure_loaded()
+    outcomes = await watchlist_service.screen_parties_async([customer_in.full_name])
+    db_customer = _build([customer_in], outcomes)[0]
     
     # 2. Add to session
     db.add(db_customer)
@@ -31,9 +58,31 @@ async def create_customer(db: AsyncSession, customer_in: CustomerCreate) -> Cust
         await db.rollback()
         raise e
 
+async def create_customers(db: AsyncSession, customers_in: Sequence[CustomerCreate]) -> List[Customer]:
+    """
+    Bulk onboarding: all names are screened as ONE batch, the customers are inserted in
+    one flush and read back with one query (no per-customer refresh).
+    """
+    await watchlist_service.ensure_loaded()
+    outcomes = await watchlist_service.screen_parties_async([c.full_name for c in customers_in])
+    db_customers = _build(customers_in, outcomes)
+    db.add_all(db_customers)
+
+    try:
+        await db.flush()
+        ids = [c.id for c in db_customers]
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+    result = await db.execute(select(Customer).where(Customer.id.in_(ids)).execution_options(populate_existing=True))
+    by_id = {c.id: c for c in result.scalars().all()}
+    return [by_id[i] for i in ids]
+
 async def get_customers(db: AsyncSession, skip: int = 0, limit: int = 100):
     """
     Retrieve a list of customers with pagination.
     """
     result = await db.execute(select(Customer).offset(skip).limit(limit))
-    return result.scalars().all()
\ No newline at end of file
+    return result.scalars().all()
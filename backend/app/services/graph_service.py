@@ -1,4 +1,5 @@
 import logging
+from typing import Any, Dict, Optional, Sequence, Set, Tuple
 from neo4j import GraphDatabase
 from app.core.config import settings
 
@@ -59,6 +60,78 @@ class GraphService:
         except Exception as e:
             logger.error(f"Failed to ingest transaction to graph: {e}")
 
+    def create_customer_node(self, customer_id, full_name: Optional[str], risk_score: Optional[float]):
+        """Upserts the Person node of a customer with its name and risk score."""
+        if not self.driver:
+            return
+
+        query = """
+        MERGE (p:Person {id: $customer_id})
+        SET p.name = $full_name, p.risk_score = $risk_score
+        """
+        try:
+            with self.driver.session() as session:
+                session.run(query, customer_id=str(customer_id), full_name=full_name, risk_score=risk_score)
+        except Exception as e:
+            logger.error(f"Failed to upsert customer node: {e}")
+
+    def record_transaction(self, sender_id, counterparty_account: Optional[str], amount: float, currency: str):
+        """One customer -> counterparty payment (see record_transactions)."""
+        self.record_transactions([
+            {"sender": str(sender_id), "receiver": counterparty_account, "amount": amount, "currency": currency}
+        ])
+
+    def record_transactions(self, transfers: Sequence[Dict[str, Any]]):
+        """
+        Shadow-writes committed payments in ONE query: dicts with sender, receiver, amount,
+        currency and optionally txn_id, sender_name, sender_risk. Payments without a
+        counterparty account are skipped.
+        """
+        transfers = [t for t in transfers if t.get("receiver")]
+        if not self.driver or not transfers:
+            return
+
+        query = """
+        UNWIND $transfers AS t
+        MERGE (a:Person {id: t.sender})
+        SET a.name = coalesce(t.sender_name, a.name), a.risk_score = coalesce(t.sender_risk, a.risk_score)
+        MERGE (b:Person {id: t.receiver})
+        MERGE (a)-[r:SENT_FUNDS]->(b)
+        SET r.amount = t.amount, r.currency = t.currency, r.txn_id = t.txn_id, r.timestamp = datetime()
+        """
+        try:
+            with self.driver.session() as session:
+                session.run(query, transfers=transfers)
+        except Exception as e:
+            logger.error(f"Failed to ingest {len(transfers)} transactions to graph: {e}")
+
+    def circular_pairs(self, pairs: Sequence[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """
+        The (sender, counterparty) pairs for which a payment sender -> counterparty closes a
+        ring of 2..4 hops, i.e. the counterparty already reaches the sender. ONE query for all.
+        """
+        if not self.driver or not pairs:
+            return set()
+
+        query = """
+        UNWIND $pairs AS pair
+        MATCH (b:Person {id: pair[1]})-[:SENT_FUNDS*1..3]->(a:Person {id: pair[0]})
+        RETURN DISTINCT pair[0] AS sender, pair[1] AS counterparty
+        """
+        try:
+            with self.driver.session() as session:
+                result = session.run(query, pairs=[list(pair) for pair in pairs])
+                return {(record["sender"], record["counterparty"]) for record in result}
+        except Exception as e:
+            logger.error(f"Graph circular check failed: {e}")
+            return set()
+
+    def check_circular_dependency(self, sender_id, counterparty_account: Optional[str]) -> bool:
+        """Would this payment close a ring? (see circular_pairs)"""
+        if not counterparty_account:
+            return False
+        return (str(sender_id), counterparty_account) in self.circular_pairs([(str(sender_id), counterparty_account)])
+
     def detect_circular_flow(self):
         """
         Detects cycles: A -> B -> C -> A (The 'Ring').
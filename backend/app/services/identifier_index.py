@@ -0,0 +1,171 @@
+import csv
+import hashlib
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Sequence, Tuple
+import numpy as np
+from app.services.sanctions_index import SanctionEntry
+
+_SEPARATORS = re.compile(r"[\s\-./:]+")
+_IBAN = re.compile(r"^[A-Za-z]{2}\d{2}[A-Za-z0-9]{8,30}$")
+# List identifier types that name a payment endpoint. Passports, national IDs, tax and
+# registration numbers are NOT indexed: they collide with account numbers ("12345678")
+_PAYMENT_ID_TYPES = re.compile(r"digital currency|crypto|wallet|iban|account", re.IGNORECASE)
+
+# Bloom filter sizing: 16 bits per identifier and 4 probes -> ~0.2% false positives,
+# which then cost one binary search each
+_BLOOM_BITS_PER_ITEM = 16
+_BLOOM_PROBES = 4
+
+class IdentifierMatch(NamedTuple):
+    identifier: str     # normalized, as listed
+    entry: SanctionEntry
+
+def normalize_identifier(value: str) -> str:
+    """
+    Separators removed. Hex (0x...) and bech32 (bc1...) addresses are case-insensitive and
+    IBANs / account numbers are uppercased; other addresses (base58: BTC legacy, TRON...)
+    are case-sensitive and kept as is.
+    """
+    compact = _SEPARATORS.sub("", (value or "").strip())
+    lowered = compact.lower()
+    if lowered.startswith(("0x", "bc1", "ltc1", "tb1")):
+        return lowered
+    if _IBAN.match(compact) or compact.isdigit():
+        return compact.upper()
+    return compact
+
+def identifier_hashes(values: Sequence[str]) -> np.ndarray:
+    # Stable 64-bit keys (snapshots persist them)
+    digests = b"".join(hashlib.blake2b(v.encode("utf-8"), digest_size=8).digest() for v in values)
+    return np.frombuffer(digests, dtype="<u8").copy() if values else np.zeros(0, dtype=np.uint64)
+
+class IdentifierIndex:
+    """
+    Exact-match index over listed account numbers, IBANs and crypto addresses.
+    A Bloom filter answers the (overwhelmingly common) "not listed" case in a few bit
+    probes; possible hits are confirmed against the sorted hash array and the identifier
+    itself. Everything is a flat NumPy array, so snapshots memory-map it.
+    """
+
+    ARRAYS = ("hashes", "owners", "bloom")
+
+    def __init__(self, records: Iterable[Tuple[SanctionEntry, Sequence[str]]] = ()):
+        self.entries: List[SanctionEntry] = []
+        identifiers, owners = [], []
+        for entry, values in records:
+            for value in dict.fromkeys(normalize_identifier(v) for v in values):
+                if value:
+                    identifiers.append(value)
+                    owners.append(len(self.entries))
+            self.entries.append(entry)
+
+        hashes = identifier_hashes(identifiers)
+        order = np.argsort(hashes, kind="stable")
+        self.hashes = hashes[order]
+        self.owners = np.asarray(owners, dtype=np.int32)[order]
+        self.identifiers = [identifiers[i] for i in order.tolist()]
+
+        size = 1 << max(6, int(len(identifiers) * _BLOOM_BITS_PER_ITEM).bit_length())
+        bits = np.zeros(size, dtype=bool)
+        bits[self._probes(self.hashes, size).ravel()] = True
+        self.bloom = np.packbits(bits)
+
+        digest = hashlib.sha1("\n".join(f"{self.entries[o].source}|{self.entries[o].uid}|{v}" for o, v in zip(self.owners.tolist(), self.identifiers)).encode("utf-8"))
+        self.version = digest.hexdigest()[:12]
+
+    def __len__(self) -> int:
+        return len(self.identifiers)
+
+    @staticmethod
+    def _probes(hashes: np.ndarray, size: int) -> np.ndarray:
+        # Double hashing: probe i = h1 + i * h2 (mod size, a power of two)
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(_BLOOM_PROBES, dtype=np.uint64)
+        return ((h1[:, None] + steps[None, :] * h2[:, None]) & np.uint64(size - 1)).astype(np.int64)
+
+    def lookup_many(self, values: Sequence[str]) -> List[List[IdentifierMatch]]:
+        """Listed parties per value (usually none), vectorized over the whole batch."""
+        results: List[List[IdentifierMatch]] = [[] for _ in values]
+        if not len(self) or not len(values):
+            return results
+        normalized = [normalize_identifier(v) for v in values]
+        hashes = identifier_hashes(normalized)
+
+        # 1. Bloom filter: rows with any unset probe bit are certainly not listed
+        probes = self._probes(hashes, len(self.bloom) * 8)
+        maybe = np.flatnonzero(np.all((self.bloom[probes >> 3] >> (7 - (probes & 7))) & 1, axis=1))
+        if not len(maybe):
+            return results
+
+        # 2. Sorted hashes + identifier equality confirm the survivors
+        starts = np.searchsorted(self.hashes, hashes[maybe], side="left")
+        ends = np.searchsorted(self.hashes, hashes[maybe], side="right")
+        for row, start, end in zip(maybe.tolist(), starts.tolist(), ends.tolist()):
+            for position in range(start, end):
+                if self.identifiers[position] == normalized[row] and normalized[row]:
+                    results[row].append(IdentifierMatch(normalized[row], self.entries[int(self.owners[position])]))
+        return results
+
+    def lookup(self, value: str) -> List[IdentifierMatch]:
+        return self.lookup_many([value])[0]
+
+    def records(self) -> Iterable[Tuple[SanctionEntry, List[str]]]:
+        """(entry, identifiers) per listed party."""
+        by_entry: dict = {}
+        for position, owner in enumerate(self.owners.tolist()):
+            by_entry.setdefault(owner, []).append(self.identifiers[position])
+        for owner, values in sorted(by_entry.items()):
+            yield self.entries[owner], values
+
+# --- List loaders -------------------------------------------------------------
+def load_identifier_file(path: str) -> List[Tuple[SanctionEntry, List[str]]]:
+    """
+    Identifiers published with one list file, as (entry, identifiers) records.
+    CSV: an `identifiers` column (";"-separated) next to `uid`, `name` and `source`.
+    XML: OFAC SDN idList entries and EU FSF identifications, for payment identifier
+    types only (accounts, IBANs, digital currency addresses).
+    """
+    source = Path(path).stem
+    records = []
+    if not path.lower().endswith(".xml"):
+        with open(path, "r", newline="", encoding="utf-8-sig") as f:
+            for i, row in enumerate(csv.DictReader(f)):
+                values = [v.strip() for v in (row.get("identifiers") or "").split(";") if v.strip()]
+                if values:
+                    name = (row.get("name") or "").strip()
+                    records.append((SanctionEntry(row.get("uid") or str(i), name, row.get("source") or source), values))
+        return records
+
+    def local(tag: str) -> str:
+        return tag.rsplit("}", 1)[-1]
+
+    def child_text(element: ET.Element, tag: str) -> str:
+        return next((c.text.strip() for c in element if local(c.tag) == tag and c.text and c.text.strip()), "")
+
+    for _, element in ET.iterparse(path, events=("end",)):
+        tag = local(element.tag)
+        if tag == "sdnEntry":
+            name = " ".join(p for p in (child_text(element, "firstName"), child_text(element, "lastName")) if p)
+            values = [
+                child_text(i, "idNumber") for i in element.iter()
+                if local(i.tag) == "id" and _PAYMENT_ID_TYPES.search(child_text(i, "idType"))
+            ]
+            uid = child_text(element, "uid")
+        elif tag == "sanctionEntity":
+            name = next((a.get("wholeName", "") for a in element.iter() if local(a.tag) == "nameAlias" and a.get("wholeName")), "")
+            values = [
+                i.get("number", "") for i in element.iter()
+                if local(i.tag) == "identification"
+                and _PAYMENT_ID_TYPES.search(f"{i.get('identificationTypeCode', '')} {i.get('identificationTypeDescription', '')}")
+            ]
+            uid = element.get("logicalId", "")
+        else:
+            continue
+        values = [v for v in values if v]
+        if values:
+            records.append((SanctionEntry(uid or str(len(records)), name, source), values))
+        element.clear()
+    return records
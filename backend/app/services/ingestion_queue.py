@@ -0,0 +1,359 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from fastapi import HTTPException
+from app.core.batching import next_batch
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.query_counter import track_queries
+from app.schemas.transaction import TransactionBatchItem, TransactionCreate
+
+logger = logging.getLogger(__name__)
+
+# (transactions, their pre-assigned UUIDs) -> one decision per transaction, in order
+Processor = Callable[[List[TransactionCreate], List[str]], Awaitable[List[TransactionBatchItem]]]
+
+async def _persist(items: List[TransactionCreate], uuids: List[str]) -> List[TransactionBatchItem]:
+    # A short-lived session per micro-batch, as for streaming ingestion. The batch path also
+    # runs the graph ring check and writes the committed payments to Neo4j
+    from app.db.base import async_session_factory
+    from app.services.transaction_service import create_transactions_batch
+
+    async with async_session_factory() as db:
+        return await create_transactions_batch(db, items, transaction_uuids=uuids)
+
+def _retryable(error: Exception) -> bool:
+    # A 4xx is the same on every attempt; anything else (database down, timeout) may pass later
+    return not (isinstance(error, HTTPException) and error.status_code < 500)
+
+class DeadLetterStore:
+    """
+    Append-only JSONL file of accepted records that could not be decided: the transaction
+    as submitted, its UUID and the error. Nothing a 202 acknowledged is dropped, and the
+    file answers status lookups once the in-memory decision has been evicted.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = Path(path) if path else None
+        self._errors: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def _index(self) -> Dict[str, Dict[str, Any]]:
+        # UUID -> status record, read from the file once
+        if self._errors is None:
+            self._errors = {}
+            for entry in self.records():
+                self._errors[entry["transaction_uuid"]] = self._status(entry)
+        return self._errors
+
+    @staticmethod
+    def _status(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {"transaction_uuid": entry["transaction_uuid"], "status": "ERROR", "error": entry["error"],
+                "dead_lettered_at": entry["dead_lettered_at"]}
+
+    def add(self, items: List[Tuple[str, TransactionCreate]], error: Any) -> int:
+        """Appends `items` ((UUID, transaction) pairs). Blocking file I/O: call it off the event loop."""
+        if self.path is None:
+            return 0
+        dead_lettered_at = datetime.now().isoformat()
+        entries = [
+            {"transaction_uuid": transaction_uuid, "transaction": transaction.model_dump(mode="json"),
+             "error": error, "dead_lettered_at": dead_lettered_at}
+            for transaction_uuid, transaction in items
+        ]
+        index = self._index()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        for entry in entries:
+            index[entry["transaction_uuid"]] = self._status(entry)
+        return len(entries)
+
+    def get(self, transaction_uuid: str) -> Optional[Dict[str, Any]]:
+        return self._index().get(transaction_uuid) if self.path is not None else None
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        if self.path is None or not self.path.exists():
+            return
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def take(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Removes and returns the oldest `limit` entries (all by default); the rest stay on file."""
+        entries = list(self.records())
+        taken, kept = entries[:limit], entries[limit:] if limit is not None else []
+        if self.path is not None and self.path.exists():
+            if kept:
+                # Rewrite then swap, so a crash never leaves a half-written store
+                scratch = self.path.with_suffix(self.path.suffix + ".tmp")
+                with open(scratch, "w") as f:
+                    f.writelines(json.dumps(entry) + "\n" for entry in kept)
+                scratch.replace(self.path)
+            else:
+                self.path.unlink()
+        self._errors = None
+        return taken
+
+    def put_back(self, entries: List[Dict[str, Any]]):
+        """Appends entries returned by take() unchanged (original error and timestamp)."""
+        if self.path is None or not entries:
+            return
+        index = self._index()
+        with open(self.path, "a") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        for entry in entries:
+            index[entry["transaction_uuid"]] = self._status(entry)
+
+    def __len__(self) -> int:
+        return len(self._index()) if self.path is not None else 0
+
+class IngestionQueue:
+    """
+    Accept-then-process ingestion: submit() validates nothing beyond the schema, hands
+    out the transaction UUID and returns at once; a pool of worker tasks drains the
+    queue in micro-batches through the batch pipeline (one customer lookup, batch rule
+    evaluation, one multi-row insert per batch).
+
+    Records are partitioned by customer: each worker owns the customers hashed to it, so
+    one customer's records are evaluated by one worker, in acceptance order, and never
+    concurrently. A batch is dispatched when `max_batch_size` records are waiting or
+    `max_wait_ms` after its first record. At most `max_pending` records may be undecided:
+    beyond that submit() raises asyncio.QueueFull and the caller should back off.
+
+    A failed batch is retried `retries` times with exponential backoff (its worker waits,
+    keeping the order); records still failing are reported as ERROR and appended to the
+    dead-letter store, as are records still queued or in flight at shutdown. requeue_dead_letters()
+    submits them again under their original UUIDs.
+    """
+
+    def __init__(
+        self,
+        process: Optional[Processor] = None,
+        workers: int = settings.INGEST_QUEUE_WORKERS,
+        max_batch_size: int = settings.INGEST_QUEUE_BATCH_SIZE,
+        max_wait_ms: float = settings.INGEST_QUEUE_MAX_WAIT_MS,
+        max_pending: int = settings.INGEST_QUEUE_MAX_PENDING,
+        status_cache_size: int = settings.INGEST_QUEUE_STATUS_CACHE_SIZE,
+        retries: int = settings.INGEST_QUEUE_RETRIES,
+        retry_backoff_ms: float = settings.INGEST_QUEUE_RETRY_BACKOFF_MS,
+        dead_letter_path: Optional[str] = settings.INGEST_QUEUE_DEAD_LETTER_PATH,
+    ):
+        self.process = process or _persist
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self.retries = retries
+        self.retry_backoff = retry_backoff_ms / 1000.0
+        self.dead_letters = DeadLetterStore(dead_letter_path)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # One queue and one worker task per partition
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[Optional[asyncio.Task]] = []
+        # QUEUED / PROCESSING records (insertion order = acceptance order), then decided ones
+        self.pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.decisions = LRUCache(status_cache_size)
+        self.accepted = 0
+        self.in_flight = 0
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.retried = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.last_lag = 0.0
+
+    def _ensure_workers(self):
+        # One set of queues/workers per event loop (tests and scripts may run several loops)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queues = [asyncio.Queue() for _ in range(self.workers)]
+            self._tasks = [None] * self.workers
+        for partition, task in enumerate(self._tasks):
+            if task is None or task.done():
+                self._tasks[partition] = loop.create_task(self._run(self._queues[partition]))
+
+    def submit(self, transaction: TransactionCreate, transaction_uuid: Optional[str] = None) -> Dict[str, Any]:
+        """Enqueues one transaction and returns its QUEUED status record. Raises asyncio.QueueFull."""
+        self._ensure_workers()
+        if len(self.pending) >= self.max_pending:
+            raise asyncio.QueueFull
+        transaction_uuid = transaction_uuid or str(uuid.uuid4())
+        self._queues[hash(transaction.customer_id) % self.workers].put_nowait((transaction_uuid, transaction, time.monotonic()))
+        record = {"transaction_uuid": transaction_uuid, "status": "QUEUED", "accepted_at": datetime.now()}
+        self.pending[transaction_uuid] = record
+        self.accepted += 1
+        return record
+
+    def status(self, transaction_uuid: str) -> Optional[Dict[str, Any]]:
+        """QUEUED / PROCESSING, or the decision if it is still in memory or dead-lettered (None otherwise)."""
+        record = self.pending.get(transaction_uuid)
+        if record is not None:
+            return record
+        record = self.decisions.get(transaction_uuid)
+        if record is not None:
+            return record
+        return self.dead_letters.get(transaction_uuid)
+
+    async def _run(self, queue: asyncio.Queue):
+        while True:
+            batch: List[Tuple[str, TransactionCreate, float]] = await next_batch(queue, self.max_batch_size, self.max_wait)
+            try:
+                await self._dispatch(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _process_with_retries(self, transactions: List[TransactionCreate], uuids: List[str]) -> List[Dict[str, Any]]:
+        attempt = 0
+        while True:
+            try:
+                # Workers outlive the request that started them: each batch is accounted on its own
+                with track_queries():
+                    results = await self.process(transactions, uuids)
+                return [result.model_dump(exclude={"index"}, exclude_none=True) for result in results]
+            except Exception as e:
+                if attempt >= self.retries or not _retryable(e):
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                attempt += 1
+                self.retried += len(transactions)
+                logger.warning(f"Ingestion queue: batch of {len(transactions)} failed ({e}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _dispatch(self, batch: List[Tuple[str, TransactionCreate, float]]):
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self.in_flight += len(batch)
+        uuids = [transaction_uuid for transaction_uuid, _, _ in batch]
+        transactions = [transaction for _, transaction, _ in batch]
+        for transaction_uuid in uuids:
+            self.pending[transaction_uuid]["status"] = "PROCESSING"
+
+        try:
+            decisions = await self._process_with_retries(transactions, uuids)
+        except Exception as e:
+            # Every record of a failed batch is reported and kept for replay; the workers keep going
+            logger.error(f"Ingestion queue: batch of {len(batch)} failed: {e}")
+            self.failed += len(batch)
+            detail = getattr(e, "detail", str(e))
+            decisions = [{"status": "ERROR", "error": detail} for _ in batch]
+            await self._dead_letter(list(zip(uuids, transactions)), detail)
+        except asyncio.CancelledError:
+            # Shutdown after the drain timeout: the batch is already off the queue, so keep it
+            # for replay here (synchronously, the task is being cancelled) instead of leaving
+            # it PROCESSING forever
+            for transaction_uuid in uuids:
+                self.pending.pop(transaction_uuid, None)
+            self._dead_letter_now(list(zip(uuids, transactions)), "Not processed before shutdown.")
+            raise
+        finally:
+            self.in_flight -= len(batch)
+
+        now = time.monotonic()
+        for (transaction_uuid, _, enqueued), decision in zip(batch, decisions):
+            record = self.pending.pop(transaction_uuid)
+            lag = now - enqueued
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+            self.last_lag = lag
+            self.decisions.set(transaction_uuid, {
+                **record, **decision, "transaction_uuid": transaction_uuid,
+                "decided_at": datetime.now(), "lag_ms": round(lag * 1000, 2),
+            })
+
+    async def _dead_letter(self, items: List[Tuple[str, TransactionCreate]], error: Any):
+        try:
+            self.dead_lettered += await asyncio.to_thread(self.dead_letters.add, items, error)
+        except OSError as e:
+            logger.error(f"Ingestion queue: could not dead-letter {len(items)} records: {e}")
+
+    def _dead_letter_now(self, items: List[Tuple[str, TransactionCreate]], error: Any):
+        # Blocking variant for code that cannot await (a task being cancelled)
+        try:
+            self.dead_lettered += self.dead_letters.add(items, error)
+        except OSError as e:
+            logger.error(f"Ingestion queue: could not dead-letter {len(items)} records: {e}")
+
+    async def requeue_dead_letters(self) -> int:
+        """
+        Submits dead-lettered records again, under their original UUIDs, as far as
+        `max_pending` allows; returns how many. The rest stay in the store for a later call.
+        """
+        headroom = self.max_pending - len(self.pending)
+        if headroom <= 0:
+            return 0
+        entries = await asyncio.to_thread(self.dead_letters.take, headroom)
+        for n, entry in enumerate(entries):
+            try:
+                self.submit(TransactionCreate(**entry["transaction"]), transaction_uuid=entry["transaction_uuid"])
+            except asyncio.QueueFull:
+                # Submissions arrived while the store was read: write the remainder back
+                await asyncio.to_thread(self.dead_letters.put_back, entries[n:])
+                return n
+        return len(entries)
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Waits until every accepted record has a decision (or `timeout` seconds)."""
+        if self._queues and self._loop is asyncio.get_running_loop():
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+
+    async def shutdown(self, timeout: float = settings.INGEST_QUEUE_DRAIN_SECONDS):
+        """Drains what was accepted, then stops the workers and dead-letters what is still undecided (queued or in flight)."""
+        try:
+            await self.drain(timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Ingestion queue: stopped with {len(self.pending)} records undecided.")
+        tasks = [task for task in self._tasks if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = [None] * len(self._tasks)
+
+        queued = []
+        for queue in self._queues:
+            while not queue.empty():
+                transaction_uuid, transaction, _ = queue.get_nowait()
+                queue.task_done()
+                self.pending.pop(transaction_uuid, None)
+                queued.append((transaction_uuid, transaction))
+        if queued:
+            await self._dead_letter(queued, "Not processed before shutdown.")
+
+    def stats(self) -> Dict[str, Any]:
+        decided = self.items - self.in_flight
+        oldest = next(iter(self.pending.values()), None)
+        return {
+            "workers": len([task for task in self._tasks if task is not None and not task.done()]),
+            "accepted": self.accepted,
+            "queue_depth": sum(queue.qsize() for queue in self._queues),
+            "in_flight": self.in_flight,
+            "retried": self.retried,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+            "batches": self.batches,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            # Acceptance -> decision, in milliseconds
+            "lag_ms": {
+                "last": round(self.last_lag * 1000, 2),
+                "avg": round(self.lag_total / decided * 1000, 2) if decided else 0.0,
+                "max": round(self.lag_max * 1000, 2),
+            },
+            "oldest_pending_seconds": round((datetime.now() - oldest["accepted_at"]).total_seconds(), 3) if oldest else 0.0,
+            "status_cache": self.decisions.stats(),
+        }
+
+# Singleton Instance
+ingestion_queue = IngestionQueue()
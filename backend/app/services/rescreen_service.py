@@ -0,0 +1,178 @@
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select
+from app.core.config import settings
+from app.models.customer import Customer
+from app.models.screening_alert import ScreeningAlert
+from app.models.transaction import Transaction
+from app.services.sanctions_index import SanctionEntry, SanctionsIndex
+
+logger = logging.getLogger(__name__)
+
+# Subjects rescreened, in this order: customers by id, then distinct counterparty names
+PHASES = ("customer", "counterparty")
+# Bind parameters one statement may carry (PostgreSQL / asyncpg limit)
+_MAX_BIND_PARAMS = 32767
+
+# --- Worker processes -------------------------------------------------------------
+# Each worker builds the (small) index of ADDED parties once; pages are then scored there
+_delta_index: Optional[SanctionsIndex] = None
+_threshold = 0.0
+
+def _init_worker(records: List[Tuple[SanctionEntry, List[str]]], threshold: float):
+    global _delta_index, _threshold
+    _delta_index = SanctionsIndex(records)
+    _threshold = threshold
+
+def _screen_names(names: List[str]):
+    return _delta_index.screen_many(names, _threshold)
+
+class RescreenJob:
+    """
+    Rescreens every customer `full_name` and every distinct `counterparty_name` against
+    the parties ADDED to the sanctions list (not the whole list), writing hits to
+    `screening_alerts`.
+
+    - Names are read with keyset pagination (id / name > last key), never OFFSET.
+    - Each page is split across a process pool and scored with matrix cdist.
+    - Alerts are inserted idempotently and the checkpoint advances only after commit,
+      so an interrupted job resumes from the last committed page.
+    - Throughput is capped (names per second) and the pool is kept small, so live
+      screening and the database keep their headroom.
+    """
+
+    def __init__(
+        self,
+        added: Sequence[Tuple[SanctionEntry, List[str]]],
+        checkpoint_path: str,
+        threshold: Optional[float] = None,
+        workers: int = settings.RESCREEN_WORKERS,
+        page_size: int = settings.RESCREEN_PAGE_SIZE,
+        max_names_per_second: float = settings.RESCREEN_MAX_NAMES_PER_SECOND,
+    ):
+        from app.services.watchlist_service import watchlist_service
+
+        self.added = list(added)
+        self.threshold = watchlist_service.threshold if threshold is None else threshold
+        # Job identity: the same additions resume the same checkpoint
+        self.version = SanctionsIndex(self.added).version
+        self.checkpoint_path = Path(checkpoint_path)
+        self.workers = max(1, workers)
+        self.page_size = page_size
+        self.max_names_per_second = max_names_per_second
+
+    # --- Checkpoint ---------------------------------------------------------------
+    def load_checkpoint(self) -> Dict[str, Any]:
+        if self.checkpoint_path.exists():
+            state = json.loads(self.checkpoint_path.read_text())
+            if state.get("job") == self.version:
+                return state
+            logger.info(f"Checkpoint {self.checkpoint_path} belongs to another rescreen; starting over.")
+        return {"job": self.version, "phase": PHASES[0], "after": None, "screened": 0, "alerts": 0, "done": False}
+
+    def save_checkpoint(self, state: Dict[str, Any]):
+        staging = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        staging.write_text(json.dumps(state))
+        staging.replace(self.checkpoint_path)
+
+    # --- Database -----------------------------------------------------------------
+    async def fetch_page(self, phase: str, after: Any) -> List[Tuple[Any, str]]:
+        """(key, name) rows strictly after `after`, in key order."""
+        from app.db.base import async_session_factory
+
+        if phase == "customer":
+            query = select(Customer.id, Customer.full_name).where(Customer.full_name.is_not(None)).order_by(Customer.id)
+            if after is not None:
+                query = query.where(Customer.id > after)
+        else:
+            # Distinct names in index order: the name is its own key
+            name = Transaction.counterparty_name
+            query = select(name).distinct().order_by(name)
+            if after is not None:
+                query = query.where(name > after)
+
+        async with async_session_factory() as db:
+            result = await db.execute(query.limit(self.page_size))
+            rows = result.all()
+        return [tuple(row) for row in rows] if phase == "customer" else [(row[0], row[0]) for row in rows]
+
+    async def write_alerts(self, rows: List[Dict[str, Any]]):
+        """Inserts alerts, skipping ones already raised (a resumed page is re-inserted)."""
+        from sqlalchemy.dialects.postgresql import insert
+        from app.db.base import async_session_factory
+
+        # One multi-row INSERT per chunk (every column of a row is a parameter), one commit for the page
+        chunk = max(1, _MAX_BIND_PARAMS // len(rows[0]))
+        async with async_session_factory() as db:
+            for start in range(0, len(rows), chunk):
+                statement = insert(ScreeningAlert).values(rows[start:start + chunk])
+                await db.execute(statement.on_conflict_do_nothing(constraint="uq_screening_alert_subject_party"))
+            await db.commit()
+
+    # --- Run ----------------------------------------------------------------------
+    async def _score(self, pool: Optional[ProcessPoolExecutor], names: List[str]):
+        if pool is None:
+            return await asyncio.to_thread(_screen_names, names)
+        loop = asyncio.get_running_loop()
+        size = -(-len(names) // self.workers)
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(pool, _screen_names, names[i:i + size]) for i in range(0, len(names), size)
+        ))
+        return [matches for part in parts for matches in part]
+
+    async def run(self) -> Dict[str, Any]:
+        state = self.load_checkpoint()
+        if state["done"] or not self.added:
+            return state
+
+        if self.workers == 1:
+            _init_worker(self.added, self.threshold)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.added, self.threshold))
+        try:
+            for phase in PHASES[PHASES.index(state["phase"]):]:
+                while True:
+                    started = time.monotonic()
+                    page = await self.fetch_page(phase, state["after"] if state["phase"] == phase else None)
+                    if not page:
+                        break
+
+                    # 1. Score the page in parallel against the added parties only
+                    results = await self._score(pool, [name for _, name in page])
+
+                    # 2. Persist hits, then advance the checkpoint past the page
+                    rows = [
+                        {
+                            "subject_type": phase, "subject_ref": str(key), "screened_name": name,
+                            "matched_name": match.name, "score": match.score, "list_uid": match.entry.uid,
+                            "list_source": match.entry.source, "list_version": self.version, "status": "OPEN",
+                        }
+                        for (key, name), matches in zip(page, results) for match in matches
+                    ]
+                    if rows:
+                        await self.write_alerts(rows)
+                    state.update(phase=phase, after=page[-1][0], screened=state["screened"] + len(page), alerts=state["alerts"] + len(rows))
+                    self.save_checkpoint(state)
+
+                    # 3. Throttle: never exceed the configured names per second
+                    if self.max_names_per_second:
+                        await asyncio.sleep(max(0.0, len(page) / self.max_names_per_second - (time.monotonic() - started)))
+                    if len(page) < self.page_size:
+                        break
+                if phase != PHASES[-1]:
+                    state.update(phase=PHASES[PHASES.index(phase) + 1], after=None)
+                    self.save_checkpoint(state)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        state["done"] = True
+        self.save_checkpoint(state)
+        logger.info(f"Rescreen {self.version}: {state['screened']} names screened, {state['alerts']} alerts.")
+        return state
@@ -0,0 +1,427 @@
+import csv
+import hashlib
+import logging
+import math
+import re
+import unicodedata
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from rapidfuzz import fuzz, process
+
+logger = logging.getLogger(__name__)
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+class SanctionEntry(NamedTuple):
+    uid: str
+    name: str
+    source: str
+
+class SanctionMatch(NamedTuple):
+    name: str       # the alias that matched, as listed
+    score: float
+    entry: SanctionEntry
+
+def normalize_name(name: str) -> str:
+    """
+    Accent-stripped, casefolded, punctuation-free, tokens sorted.
+    fuzz.ratio on two normalized names equals token_sort_ratio on the cleaned originals.
+    """
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(sorted(_SEPARATORS.sub(" ", stripped.casefold()).split()))
+
+# Spelling variants of the same sound fold to one form (a Double Metaphone-style rule set):
+# "Mohammed" / "Muhammad" -> "mahamad", "Aleksandr" / "Alexander" -> "alaksandr" / "alaksandar"
+_SPELLINGS = {
+    "tch": "ch", "sch": "sh", "dzh": "j", "dj": "j", "zh": "j", "kh": "h", "gh": "g", "ph": "f", "th": "t",
+    "ck": "k", "ce": "se", "ci": "si", "cy": "si", "ch": "ch", "c": "k", "x": "ks", "q": "k", "w": "v", "y": "i",
+}
+_SPELLING = re.compile("|".join(sorted(_SPELLINGS, key=len, reverse=True)))
+_VOWELS = re.compile(r"[aeiou]+")
+_REPEATS = re.compile(r"(\S)\1+")
+# Phonetic keys this short (e.g. "l" for Li / Lee / Lu) would block far too much
+_MIN_PHONETIC_KEY = 3
+# A phonetic candidate must be this close once transliterated, and no more than this far
+# below the threshold in plain spelling, to count as a transliteration variant
+_PHONETIC_MIN_SCORE = 95.0
+_PHONETIC_MAX_SPELLING_GAP = 15.0
+
+def transliterate(normalized: str) -> str:
+    """Transliteration-normalized form of a normalized name (tokens folded, then re-sorted)."""
+    folded = _SPELLING.sub(lambda m: _SPELLINGS[m.group()], normalized)
+    folded = _REPEATS.sub(r"\1", _VOWELS.sub("a", folded))
+    return " ".join(sorted(folded.split()))
+
+def _aligned(normalized: str) -> str:
+    """Normalized tokens ordered by their transliteration, so "yevgeny" lines up with "evgeniy"."""
+    return " ".join(sorted(normalized.split(), key=transliterate))
+
+def phonetic_key(translit: str) -> str:
+    """Consonant skeleton per token (first letter kept), sorted: "mahamad ali" -> "al mhmd"."""
+    return " ".join(sorted(token[0] + token[1:].replace("a", "") for token in translit.split()))
+
+def _key_hash(key: str) -> int:
+    # Stable across processes (snapshots persist it), unlike hash()
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+def _bigrams(names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (gram, owner) for every bigram of every name. Grams are occurrence-numbered
+    ("an"#0, "an"#1, ...) so multiset overlap becomes plain set overlap.
+    """
+    lengths = np.fromiter(map(len, names), dtype=np.int64, count=len(names))
+    codes = np.frombuffer("".join(names).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    owner = np.repeat(np.arange(len(names), dtype=np.int64), lengths)
+    inside = owner[1:] == owner[:-1]
+    keys = ((codes[:-1] << 21) | codes[1:])[inside]
+    owner = owner[:-1][inside]
+
+    order = np.lexsort((keys, owner))
+    keys, owner = keys[order], owner[order]
+    positions = np.arange(len(keys))
+    new_group = np.ones(len(keys), dtype=bool)
+    new_group[1:] = (keys[1:] != keys[:-1]) | (owner[1:] != owner[:-1])
+    occurrence = positions - np.maximum.accumulate(np.where(new_group, positions, 0))
+    return (keys << 16) | occurrence, owner
+
+class SanctionsIndex:
+    """
+    Bigram index over normalized aliases: a shortlist is built first, and only the
+    shortlist is scored with RapidFuzz.
+
+    Blocking is exact (no match above the threshold is ever filtered out):
+    1. Length filter: ratio >= t is impossible when the lengths differ too much.
+    2. Count filter: ratio >= t means LCS >= t*(L1+L2)/200, and every insertion
+       or deletion destroys at most 2 bigrams, so a match shares at least `tau` bigrams.
+    3. Prefix filter: a name sharing `tau` bigrams shares at least one of the query's
+       (m - tau + 1) RAREST bigrams, so only those (short) posting lists are scanned;
+       the frequent lists are binary-searched for the surviving candidates only.
+    Postings are one sorted NumPy array, built vectorized.
+
+    Transliteration variants are caught by a second channel: aliases sharing the query's
+    phonetic key (an exact lookup, precomputed at load time) are rescored on sound AND
+    spelling (see _phonetic_matches), and the better of the two channels' scores counts.
+    """
+
+    # Array attributes persisted in (and memory-mapped from) a snapshot
+    ARRAYS = ("alias_entry", "lengths", "length_starts", "grams", "postings", "phonetic_keys", "phonetic_ids")
+
+    def __init__(self, records: Iterable[Tuple[SanctionEntry, Sequence[str]]]):
+        self.entries: List[SanctionEntry] = []
+        self.aliases: List[str] = []
+        self.normalized: List[str] = []
+        owners = []
+        for entry, names in records:
+            seen = set()
+            for alias in names:
+                key = normalize_name(alias)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                self.aliases.append(alias)
+                self.normalized.append(key)
+                owners.append(len(self.entries))
+            self.entries.append(entry)
+
+        # Alias ids are ordered by length, so every posting list is too: a length range is a slice
+        lengths = np.fromiter(map(len, self.normalized), dtype=np.int32, count=len(self.normalized))
+        order = np.argsort(lengths, kind="stable")
+        self.aliases = [self.aliases[i] for i in order.tolist()]
+        self.normalized = [self.normalized[i] for i in order.tolist()]
+        self.alias_entry = np.asarray(owners, dtype=np.int32)[order]
+        self.lengths = lengths[order]
+        self.length_starts = np.searchsorted(self.lengths, np.arange(int(self.lengths.max(initial=0)) + 2))
+
+        # Postings as one sorted array of (gram id * alias count + alias id): the slice of
+        # every query gram within a length range is found with ONE searchsorted call
+        grams, owner = _bigrams(self.normalized)
+        self.grams, gram_ids = np.unique(grams, return_inverse=True)
+        self.postings = np.sort(gram_ids.astype(np.int64) * max(len(self), 1) + owner)
+
+        self.build_phonetic()
+
+        digest = hashlib.sha1("\n".join(f"{e.source}|{e.uid}|{e.name}" for e in self.entries).encode("utf-8"))
+        digest.update("\n".join(self.normalized).encode("utf-8"))
+        self.version = digest.hexdigest()[:12]
+
+    def build_phonetic(self):
+        """Phonetic channel: (key hash, alias id) sorted by hash, for aliases with a usable key."""
+        self.translit = [transliterate(name) for name in self.normalized]
+        keyed = [(_key_hash(key), i) for i, key in enumerate(map(phonetic_key, self.translit)) if len(key.replace(" ", "")) >= _MIN_PHONETIC_KEY]
+        pairs = np.array(keyed, dtype=np.int64).reshape(-1, 2)
+        order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+        self.phonetic_keys = pairs[order, 0]
+        self.phonetic_ids = pairs[order, 1].astype(np.int32)
+
+    def __len__(self) -> int:
+        return len(self.normalized)
+
+    @property
+    def party_count(self) -> int:
+        return len(self.entries)
+
+    def records(self) -> Iterable[Tuple[SanctionEntry, List[str]]]:
+        """(entry, aliases) per listed party: the inverse of the constructor."""
+        order = np.argsort(self.alias_entry, kind="stable")
+        owners = self.alias_entry[order]
+        bounds = np.searchsorted(owners, np.arange(len(self.entries) + 1))
+        for e in range(len(self.entries)):
+            yield self.entries[e], [self.aliases[int(i)] for i in order[bounds[e]:bounds[e + 1]]]
+
+    @classmethod
+    def from_names(cls, names: Sequence[str], source: str = "internal") -> "SanctionsIndex":
+        return cls((SanctionEntry(str(i), name, source), [name]) for i, name in enumerate(names))
+
+    @classmethod
+    def from_files(cls, paths: Sequence[str]) -> "SanctionsIndex":
+        records = []
+        for path in paths:
+            loaded = load_list_file(path)
+            logger.info(f"Loaded {len(loaded)} sanctioned parties from {path}")
+            records.extend(loaded)
+        return cls(records)
+
+    # --- Blocking -----------------------------------------------------------
+    def candidates(self, query: str, threshold: float) -> np.ndarray:
+        """Alias ids that can possibly score >= threshold against the normalized query."""
+        n1 = len(query)
+        t = threshold / 100.0
+        if t <= 0:
+            return np.arange(len(self), dtype=np.int32)
+
+        # 1. Length filter -> one contiguous id range
+        max_length = len(self.length_starts) - 2
+        low = min(math.floor(n1 * t / (2 - t)), max_length + 1)
+        high = min(math.ceil(n1 * (2 - t) / t), max_length)
+        first, last = int(self.length_starts[low]), int(self.length_starts[high + 1])
+        if first >= last:
+            return np.zeros(0, dtype=np.int32)
+
+        # 2. Minimum shared bigrams per candidate length
+        n2 = np.arange(low, high + 1)
+        lcs = np.ceil(t * (n1 + n2) / 2 - 1e-6)
+        deletions, insertions = n1 - lcs, n2 - lcs
+        tau = np.maximum((n1 - 1) - 2 * deletions - insertions, (n2 - 1) - 2 * insertions - deletions)
+        if n1 < 2 or tau.min() <= 0 or not len(self.grams):
+            # Too short / too loose for the bigram bound at some lengths: keep those lengths whole
+            loose = n2[tau <= 0] if n1 >= 2 and len(self.grams) else n2
+            keep = [np.arange(self.length_starts[l], self.length_starts[l + 1]) for l in loose.tolist()]
+            if n1 < 2 or not len(self.grams) or len(loose) == len(n2):
+                return np.concatenate(keep).astype(np.int32)
+        else:
+            keep = []
+
+        # 3. Prefix + count filter: a candidate of length n2 shares >= tau(n2) of the query's
+        #    m bigrams, so it appears in one of the (m - tau_min + 1) rarest posting lists.
+        #    Those are scanned; the frequent lists are only probed for surviving candidates.
+        grams, _ = _bigrams([query])
+        slots = np.minimum(np.searchsorted(self.grams, grams), len(self.grams) - 1)
+        slots = slots[self.grams[slots] == grams]
+        base = slots * max(len(self), 1)
+        bounds = np.searchsorted(self.postings, np.concatenate((base + first, base + last)))
+        starts, ends = bounds[:len(slots)], bounds[len(slots):]
+        order = np.argsort(ends - starts, kind="stable")
+        starts, ends, base = starts[order], ends[order], base[order]
+
+        # Grams missing from the index are the rarest of all (empty lists)
+        scanned = max(0, len(grams) - int(tau[tau > 0].min()) + 1 - (len(grams) - len(slots)))
+        if scanned:
+            counts = np.bincount(
+                np.concatenate([self.postings[starts[i]:ends[i]] - base[i] for i in range(scanned)]) - first,
+                minlength=last - first,
+            )
+            required = np.repeat(tau, np.diff(self.length_starts[low:high + 2]))
+            remaining = len(slots) - scanned
+            ids = np.flatnonzero((required > 0) & (counts + remaining >= required))
+            counts, required, ids = counts[ids], required[ids], ids + first
+            for i in range(scanned, len(slots)):
+                if not len(ids):
+                    break
+                postings = self.postings[starts[i]:ends[i]]
+                keys = ids + base[i]
+                positions = np.minimum(np.searchsorted(postings, keys), len(postings) - 1)
+                counts = counts + (postings[positions] == keys) if len(postings) else counts
+                remaining -= 1
+                alive = counts + remaining >= required
+                ids, counts, required = ids[alive], counts[alive], required[alive]
+            keep.append(ids)
+        return np.unique(np.concatenate(keep)).astype(np.int32) if keep else np.zeros(0, dtype=np.int32)
+
+    def phonetic_candidates(self, query: str) -> np.ndarray:
+        """Alias ids sharing the normalized query's phonetic key."""
+        key = phonetic_key(transliterate(query))
+        if len(key.replace(" ", "")) < _MIN_PHONETIC_KEY:
+            return np.zeros(0, dtype=np.int32)
+        hashed = _key_hash(key)
+        start, end = np.searchsorted(self.phonetic_keys, hashed, side="left"), np.searchsorted(self.phonetic_keys, hashed, side="right")
+        return np.asarray(self.phonetic_ids[start:end], dtype=np.int32)
+
+    def _phonetic_matches(self, query: str, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (alias ids, scores) of phonetic candidates that are near-identical once transliterated
+        (>= _PHONETIC_MIN_SCORE) AND close in spelling. The transliterated ratio alone is far
+        too lenient (vowels all fold to "a": "Ola Hussein" ~ "Ali Hassan" = 100), so it is
+        never reported: the score is the mean of it and the plain ratio on the normalized
+        forms (tokens aligned by sound), and must reach `threshold` like any other match.
+        """
+        ids = self.phonetic_candidates(query)
+        if not len(ids):
+            return ids, np.zeros(0)
+        translit = transliterate(query)
+        aligned = _aligned(query)
+        kept, scores = [], []
+        for i in ids.tolist():
+            sound = fuzz.ratio(translit, self.translit[i])
+            if sound < _PHONETIC_MIN_SCORE:
+                continue
+            spelling = fuzz.ratio(aligned, _aligned(self.normalized[i]))
+            score = (sound + spelling) / 2
+            if spelling >= threshold - _PHONETIC_MAX_SPELLING_GAP and score >= max(threshold, 1e-9):
+                kept.append(i)
+                scores.append(score)
+        return np.asarray(kept, dtype=np.int32), np.asarray(scores, dtype=np.float64)
+
+    # --- Screening ------------------------------------------------------------
+    def screen(self, name: str, threshold: float, limit: Optional[int] = None, exhaustive: bool = False) -> List[SanctionMatch]:
+        """
+        Listed parties scoring >= threshold, best first (one match per party).
+        exhaustive=True scores every alias (brute force), for audits and verification.
+        """
+        query = normalize_name(name)
+        if not query or not len(self):
+            return []
+        ids = np.arange(len(self), dtype=np.int32) if exhaustive else self.candidates(query, threshold)
+        phonetic_ids, phonetic_scores = self._phonetic_matches(query, threshold)
+        if not len(ids) and not len(phonetic_ids):
+            return []
+
+        scored = process.extract(
+            query, [self.normalized[i] for i in ids.tolist()], scorer=fuzz.ratio, score_cutoff=threshold, limit=None
+        )
+        positions = np.fromiter((r[2] for r in scored), dtype=np.int64, count=len(scored))
+        scores = np.fromiter((r[1] for r in scored), dtype=np.float64, count=len(scored))
+        return self._collect(np.concatenate((ids[positions], phonetic_ids)), np.concatenate((scores, phonetic_scores)), limit)
+
+    def screen_many(
+        self, names: Sequence[str], threshold: float, limit: Optional[int] = None, max_cells: int = 4_000_000
+    ) -> List[List[SanctionMatch]]:
+        """
+        Screens many names at once, same results as screen() per name.
+        Distinct queries are grouped so each group is scored with ONE multithreaded
+        cdist against the union of its shortlists (bounded to `max_cells` scores).
+        """
+        queries = [normalize_name(name) for name in names]
+        distinct = sorted({q for q in queries if q})
+        found = {}
+        if distinct and len(self):
+            shortlists = [self.candidates(q, threshold) for q in distinct]
+            group, budget = [], 0
+            for query, shortlist in zip(distinct + [None], shortlists + [None]):
+                if group and (query is None or (len(group) + 1) * (budget + len(shortlist)) > max_cells):
+                    found.update(self._score_group(group, threshold, limit))
+                    group, budget = [], 0
+                if query is not None:
+                    group.append((query, shortlist))
+                    budget += len(shortlist)
+        return [found.get(q, []) for q in queries]
+
+    def _score_group(self, group: List[Tuple[str, np.ndarray]], threshold: float, limit: Optional[int]):
+        union = np.unique(np.concatenate([shortlist for _, shortlist in group]))
+        scores = process.cdist(
+            [query for query, _ in group], [self.normalized[i] for i in union.tolist()],
+            scorer=fuzz.ratio, score_cutoff=threshold, dtype=np.float64, workers=-1,
+        ) if len(union) else np.zeros((len(group), 0))
+        results = {}
+        for row, (query, _) in enumerate(group):
+            columns = np.flatnonzero(scores[row] >= max(threshold, 1e-9))
+            phonetic_ids, phonetic_scores = self._phonetic_matches(query, threshold)
+            if len(columns) or len(phonetic_ids):
+                results[query] = self._collect(
+                    np.concatenate((union[columns], phonetic_ids)), np.concatenate((scores[row, columns], phonetic_scores)), limit
+                )
+        return results
+
+    def _collect(self, alias_ids: np.ndarray, scores: np.ndarray, limit: Optional[int]) -> List[SanctionMatch]:
+        """Best first (ties by alias id), one match per listed party."""
+        matches, seen = [], set()
+        for k in np.lexsort((alias_ids, -scores)).tolist():
+            alias = int(alias_ids[k])
+            entry = int(self.alias_entry[alias])
+            if entry in seen:
+                continue
+            seen.add(entry)
+            matches.append(SanctionMatch(self.aliases[alias], float(scores[k]), self.entries[entry]))
+            if limit and len(matches) >= limit:
+                break
+        return matches
+
+    def best_match(self, name: str, threshold: float) -> Optional[SanctionMatch]:
+        matches = self.screen(name, threshold, limit=1)
+        return matches[0] if matches else None
+
+# --- List loaders -------------------------------------------------------------
+def load_list_file(path: str) -> List[Tuple[SanctionEntry, List[str]]]:
+    """
+    Reads one local list file into (entry, aliases) records.
+    CSV: a header with `name`, optional `aliases` (";"-separated), `uid` and `source`.
+    XML: OFAC SDN (sdnEntry), UN consolidated (INDIVIDUAL/ENTITY) or EU FSF (sanctionEntity).
+    """
+    source = Path(path).stem
+    if path.lower().endswith(".xml"):
+        return _load_xml(path, source)
+
+    records = []
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            name = (row.get("name") or "").strip()
+            if not name:
+                continue
+            aliases = [a.strip() for a in (row.get("aliases") or "").split(";") if a.strip()]
+            entry = SanctionEntry(row.get("uid") or str(i), name, row.get("source") or source)
+            records.append((entry, [name] + aliases))
+    return records
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+def _text(element: ET.Element, *tags: str) -> str:
+    parts = []
+    for tag in tags:
+        for child in element:
+            if _local(child.tag) == tag and child.text and child.text.strip():
+                parts.append(child.text.strip())
+                break
+    return " ".join(parts)
+
+def _load_xml(path: str, source: str) -> List[Tuple[SanctionEntry, List[str]]]:
+    records = []
+    for _, element in ET.iterparse(path, events=("end",)):
+        tag = _local(element.tag)
+        if tag == "sdnEntry":
+            name = _text(element, "firstName", "lastName")
+            aliases = [
+                _text(aka, "firstName", "lastName")
+                for aka in element.iter() if _local(aka.tag) == "aka"
+            ]
+            uid = _text(element, "uid")
+        elif tag in ("INDIVIDUAL", "ENTITY"):
+            name = _text(element, "FIRST_NAME", "SECOND_NAME", "THIRD_NAME", "FOURTH_NAME")
+            aliases = [
+                _text(alias, "ALIAS_NAME")
+                for alias in element if _local(alias.tag) in ("INDIVIDUAL_ALIAS", "ENTITY_ALIAS")
+            ]
+            uid = _text(element, "DATAID")
+        elif tag == "sanctionEntity":
+            aliases = [a.get("wholeName", "") for a in element.iter() if _local(a.tag) == "nameAlias"]
+            name = next((a for a in aliases if a), "")
+            uid = element.get("logicalId", "")
+        else:
+            continue
+
+        if name:
+            records.append((SanctionEntry(uid or str(len(records)), name, source), [name] + [a for a in aliases if a]))
+        element.clear()
+    return records
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.services.identifier_index import IdentifierIndex, IdentifierMatch
+from app.services.sanctions_index import SanctionEntry, SanctionMatch, SanctionsIndex
+
+logger = logging.getLogger(__name__)
+
+# Snapshot layout:
+#   <root>/CURRENT                    name of the live version directory (replaced atomically)
+#   <root>/v<version>/*.npy           index arrays and string tables, memory-mapped by every worker
+#   <root>/v<version>/meta.json
+#   <root>/v<version>/identifiers/    exact-match account / IBAN / wallet index, same format
+#   <root>/v<version>/deltas/*.json   additions/removals applied on top, without a rebuild
+#
+# meta.json records the layout FORMAT. 1 (no "format" key) predates the phonetic channel:
+# it has no translit table nor phonetic arrays, which are then rebuilt in memory on open.
+FORMAT = 2
+_PHONETIC = {"arrays": ("phonetic_keys", "phonetic_ids"), "tables": ("translit",)}
+
+class StringTable:
+    """Read-only list of strings over one UTF-8 byte array + offsets (both memory-mappable)."""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, values: Sequence[str]) -> "StringTable":
+        encoded = [v.encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+class EntryTable:
+    """SanctionEntry rows backed by three StringTables."""
+
+    def __init__(self, uid: StringTable, name: StringTable, source: StringTable):
+        self.columns = (uid, name, source)
+
+    def __len__(self) -> int:
+        return len(self.columns[0])
+
+    def __getitem__(self, i: int) -> SanctionEntry:
+        return SanctionEntry(*(column[i] for column in self.columns))
+
+_ENTRY_TABLES = {
+    "entry_uid": lambda index: [e.uid for e in index.entries],
+    "entry_name": lambda index: [e.name for e in index.entries],
+    "entry_source": lambda index: [e.source for e in index.entries],
+}
+_TABLES = {
+    "normalized": lambda index: index.normalized,
+    "aliases": lambda index: index.aliases,
+    "translit": lambda index: index.translit,
+    **_ENTRY_TABLES,
+}
+_IDENTIFIER_TABLES = {"identifiers": lambda index: index.identifiers, **_ENTRY_TABLES}
+
+def _save(directory: Path, index: Any, tables: Dict[str, Any]):
+    directory.mkdir()
+    for name in type(index).ARRAYS:
+        np.save(directory / f"{name}.npy", np.ascontiguousarray(getattr(index, name)))
+    for name, values in tables.items():
+        table = StringTable.build(values(index))
+        np.save(directory / f"{name}.data.npy", table.data)
+        np.save(directory / f"{name}.offsets.npy", table.offsets)
+
+def _open(directory: Path, cls: type, tables: Dict[str, Any], skip: Sequence[str] = ()) -> Tuple[Any, Dict[str, StringTable]]:
+    index = cls.__new__(cls)
+    for name in cls.ARRAYS:
+        if name not in skip:
+            setattr(index, name, np.load(directory / f"{name}.npy", mmap_mode="r"))
+    opened = {
+        name: StringTable(np.load(directory / f"{name}.data.npy", mmap_mode="r"), np.load(directory / f"{name}.offsets.npy", mmap_mode="r"))
+        for name in tables if name not in skip
+    }
+    index.entries = EntryTable(opened["entry_uid"], opened["entry_name"], opened["entry_source"])
+    return index, opened
+
+# --- Compile / publish ------------------------------------------------------------
+def publish_snapshot(index: SanctionsIndex, root: str, identifiers: Optional[IdentifierIndex] = None) -> str:
+    """
+    Writes `index` (and the identifier index, if any) as a new version directory and then
+    atomically repoints CURRENT. Workers pick the new version up on their next poll;
+    nothing is rewritten in place.
+    """
+    identifiers = identifiers if identifiers is not None else IdentifierIndex()
+    root_path = Path(root)
+    root_path.mkdir(parents=True, exist_ok=True)
+    target = root_path / (f"v{index.version}.{identifiers.version}" if len(identifiers) else f"v{index.version}")
+    if not target.exists():
+        staging = root_path / f".staging-{target.name}-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        _save(staging, index, _TABLES)
+        _save(staging / "identifiers", identifiers, _IDENTIFIER_TABLES)
+        meta = {
+            "format": FORMAT, "version": index.version, "parties": index.party_count, "aliases": len(index),
+            "identifiers_version": identifiers.version, "identifiers": len(identifiers), "created_at": time.time(),
+        }
+        (staging / "meta.json").write_text(json.dumps(meta))
+        os.rename(staging, target)
+
+    _write_atomic(root_path / "CURRENT", target.name)
+    logger.info(f"Published sanctions snapshot {target.name}")
+    return index.version
+
+def publish_delta(
+    root: str, add: Sequence[Tuple[SanctionEntry, List[str]]] = (), remove: Sequence[Tuple[str, str]] = (),
+    identifiers: Optional[Dict[Tuple[str, str], List[str]]] = None,
+) -> str:
+    """
+    Records additions/replacements (`add`, with their identifiers keyed by (source, uid))
+    and removals (`remove`: (source, uid)) against the live version. An added party
+    replaces its previous version entirely. Only the small overlay is rebuilt by the workers.
+    """
+    identifiers = identifiers or {}
+    directory = Path(root) / current_version(root) / "deltas"
+    directory.mkdir(exist_ok=True)
+    payload = {
+        "add": [
+            {"uid": e.uid, "name": e.name, "source": e.source, "aliases": aliases, "identifiers": identifiers.get((e.source, e.uid), [])}
+            for e, aliases in add
+        ],
+        "remove": [{"source": source, "uid": uid} for source, uid in remove],
+        "created_at": time.time(),
+    }
+    name = f"{time.time_ns():020d}.json"
+    _write_atomic(directory / name, json.dumps(payload))
+    return name
+
+def pending_additions(root: str) -> List[Tuple[SanctionEntry, List[str]]]:
+    """Parties added by the deltas of the live version (what a rescreen must cover)."""
+    version, delta_files = snapshot_state(root)
+    added: Dict[Tuple[str, str], Tuple[SanctionEntry, List[str]]] = {}
+    for name in delta_files:
+        delta = json.loads((Path(root) / version / "deltas" / name).read_text())
+        for item in delta.get("remove", []):
+            added.pop((item["source"], item["uid"]), None)
+        for item in delta.get("add", []):
+            entry = SanctionEntry(str(item["uid"]), item["name"], item.get("source", "delta"))
+            added[(entry.source, entry.uid)] = (entry, [item["name"]] + list(item.get("aliases", [])))
+    return list(added.values())
+
+def compact_snapshot(root: str) -> str:
+    """Folds the live version and its deltas into a fresh full snapshot."""
+    layered = open_snapshot(root)
+    version = publish_snapshot(SanctionsIndex(layered.records()), root, IdentifierIndex(layered.identifiers.records()))
+    if current_version(root) == layered.base_directory:
+        # The deltas cancelled out: same content as the base, so they are simply dropped
+        shutil.rmtree(Path(root) / layered.base_directory / "deltas", ignore_errors=True)
+    return version
+
+def _write_atomic(path: Path, content: str):
+    staging = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    staging.write_text(content)
+    os.replace(staging, path)
+
+# --- Open (every worker) ----------------------------------------------------------
+def current_version(root: str) -> str:
+    return (Path(root) / "CURRENT").read_text().strip()
+
+def snapshot_state(root: str) -> Tuple[str, Tuple[str, ...]]:
+    """(live version directory, delta files): cheap enough to poll."""
+    version = current_version(root)
+    deltas = Path(root) / version / "deltas"
+    return version, tuple(sorted(p.name for p in deltas.glob("*.json"))) if deltas.exists() else ()
+
+def open_index(directory: str) -> SanctionsIndex:
+    """Memory-maps one version directory: pages are shared by every process that opens it."""
+    path = Path(directory)
+    meta = json.loads((path / "meta.json").read_text())
+    layout = meta.get("format", 1)
+    if layout > FORMAT:
+        raise ValueError(f"Snapshot {path.name} has format {layout}; this version reads up to {FORMAT}")
+    legacy = layout < 2
+    index, tables = _open(path, SanctionsIndex, _TABLES, skip=_PHONETIC["arrays"] + _PHONETIC["tables"] if legacy else ())
+    index.normalized = tables["normalized"]
+    index.aliases = tables["aliases"]
+    if legacy:
+        logger.warning(f"Snapshot {path.name} is format {layout}: phonetic channel built in memory, recompile to map it.")
+        index.build_phonetic()
+    else:
+        index.translit = tables["translit"]
+    index.version = meta["version"]
+    return index
+
+def open_identifier_index(directory: str) -> IdentifierIndex:
+    """Memory-maps the identifier index of one version directory."""
+    path = Path(directory)
+    index, tables = _open(path / "identifiers", IdentifierIndex, _IDENTIFIER_TABLES)
+    index.identifiers = tables["identifiers"]
+    index.version = json.loads((path / "meta.json").read_text())["identifiers_version"]
+    return index
+
+def open_snapshot(root: str, previous: Optional["LayeredIndex"] = None) -> "LayeredIndex":
+    """The live version plus its deltas. The mapped base is reused when only deltas changed."""
+    version, delta_files = snapshot_state(root)
+    if previous is not None and previous.base_directory == version:
+        base, base_identifiers = previous.base, previous.identifiers.base
+    else:
+        base = open_index(str(Path(root) / version))
+        base_identifiers = open_identifier_index(str(Path(root) / version))
+    deltas = [json.loads((Path(root) / version / "deltas" / name).read_text()) for name in delta_files]
+    return LayeredIndex(base, deltas, base_directory=version, base_identifiers=base_identifiers)
+
+class LayeredIndex:
+    """
+    A memory-mapped base index plus a small in-memory overlay built from deltas.
+    Removed or replaced parties are filtered out of base results; added ones are
+    screened in the overlay. Same screening interface as SanctionsIndex.
+    """
+
+    def __init__(
+        self, base: SanctionsIndex, deltas: Sequence[Dict[str, Any]] = (), base_directory: str = "",
+        base_identifiers: Optional[IdentifierIndex] = None,
+    ):
+        self.base = base
+        self.base_directory = base_directory
+        added: Dict[Tuple[str, str], Tuple[SanctionEntry, List[str]]] = {}
+        added_identifiers: Dict[Tuple[str, str], List[str]] = {}
+        self.removed = set()
+        for delta in deltas:
+            for item in delta.get("remove", []):
+                key = (item["source"], item["uid"])
+                self.removed.add(key)
+                added.pop(key, None)
+                added_identifiers.pop(key, None)
+            for item in delta.get("add", []):
+                entry = SanctionEntry(str(item["uid"]), item["name"], item.get("source", "delta"))
+                key = (entry.source, entry.uid)
+                self.removed.add(key)  # replaces any base version of the party
+                added[key] = (entry, [item["name"]] + list(item.get("aliases", [])))
+                added_identifiers[key] = list(item.get("identifiers", []))
+        self.overlay = SanctionsIndex(added.values()) if added else None
+        self.identifiers = LayeredIdentifierIndex(
+            base_identifiers if base_identifiers is not None else IdentifierIndex(),
+            IdentifierIndex((added[key][0], values) for key, values in added_identifiers.items() if values),
+            self.removed,
+        )
+        self._party_count: Optional[int] = None
+
+        if deltas:
+            digest = hashlib.sha1(json.dumps(list(deltas), sort_keys=True).encode("utf-8")).hexdigest()[:8]
+            self.version = f"{base.version}+{digest}"
+        else:
+            self.version = base.version
+
+    def __len__(self) -> int:
+        return len(self.base) + (len(self.overlay) if self.overlay else 0)
+
+    @property
+    def party_count(self) -> int:
+        if self._party_count is None:
+            # One pass over the base entries, once per refresh (not per stats call)
+            entries = self.base.entries
+            removed = sum(1 for e in range(len(entries)) if (entries[e].source, entries[e].uid) in self.removed) if self.removed else 0
+            self._party_count = self.base.party_count - removed + (self.overlay.party_count if self.overlay else 0)
+        return self._party_count
+
+    def _merge(self, base: List[SanctionMatch], overlay: List[SanctionMatch], limit: Optional[int]) -> List[SanctionMatch]:
+        kept = [m for m in base if (m.entry.source, m.entry.uid) not in self.removed] if self.removed else base
+        merged = sorted(kept + overlay, key=lambda m: -m.score)
+        return merged[:limit] if limit else merged
+
+    def screen(self, name: str, threshold: float, limit: Optional[int] = None, exhaustive: bool = False) -> List[SanctionMatch]:
+        base = self.base.screen(name, threshold, None if self.removed else limit, exhaustive=exhaustive)
+        overlay = self.overlay.screen(name, threshold, limit, exhaustive=exhaustive) if self.overlay else []
+        return self._merge(base, overlay, limit)
+
+    def screen_many(self, names: Sequence[str], threshold: float, limit: Optional[int] = None) -> List[List[SanctionMatch]]:
+        base = self.base.screen_many(names, threshold, None if self.removed else limit)
+        overlay = self.overlay.screen_many(names, threshold, limit) if self.overlay else [[] for _ in names]
+        return [self._merge(b, o, limit) for b, o in zip(base, overlay)]
+
+    def best_match(self, name: str, threshold: float) -> Optional[SanctionMatch]:
+        matches = self.screen(name, threshold, limit=1)
+        return matches[0] if matches else None
+
+    def records(self):
+        for entry, aliases in self.base.records():
+            if (entry.source, entry.uid) not in self.removed:
+                yield entry, aliases
+        if self.overlay:
+            yield from self.overlay.records()
+
+class LayeredIdentifierIndex:
+    """Identifier lookups over a mapped base (minus removed/replaced parties) plus the delta overlay."""
+
+    def __init__(self, base: IdentifierIndex, overlay: IdentifierIndex, removed: set):
+        self.base = base
+        self.overlay = overlay
+        self.removed = removed
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.overlay)
+
+    def lookup_many(self, values: Sequence[str]) -> List[List[IdentifierMatch]]:
+        base = self.base.lookup_many(values)
+        overlay = self.overlay.lookup_many(values)
+        return [
+            [m for m in b if (m.entry.source, m.entry.uid) not in self.removed] + o
+            for b, o in zip(base, overlay)
+        ]
+
+    def lookup(self, value: str) -> List[IdentifierMatch]:
+        return self.lookup_many([value])[0]
+
+    def records(self):
+        for entry, values in self.base.records():
+            if (entry.source, entry.uid) not in self.removed:
+                yield entry, values
+        yield from self.overlay.records()
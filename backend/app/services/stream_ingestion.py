@@ -0,0 +1,119 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from pydantic import ValidationError
+from app.core.config import settings
+from app.schemas.transaction import TransactionBatchItem, TransactionCreate
+
+logger = logging.getLogger(__name__)
+
+# (input line number, parsed transaction or the rejection of an unparsable line)
+Batch = List[Tuple[int, Union[TransactionCreate, Dict[str, Any]]]]
+Processor = Callable[[List[TransactionCreate]], Awaitable[List[TransactionBatchItem]]]
+
+async def _persist(items: List[TransactionCreate]) -> List[TransactionBatchItem]:
+    # A short-lived session per micro-batch: nothing is held open between batches
+    from app.db.base import async_session_factory
+    from app.services.transaction_service import create_transactions_batch
+
+    async with async_session_factory() as db:
+        return await create_transactions_batch(db, items)
+
+def _line(payload: Dict[str, Any]) -> bytes:
+    return (json.dumps(payload, default=str) + "\n").encode("utf-8")
+
+async def ingest_ndjson(
+    body: AsyncIterator[bytes],
+    process: Optional[Processor] = None,
+    batch_size: int = settings.INGEST_STREAM_BATCH_SIZE,
+    max_pending_batches: int = settings.INGEST_STREAM_MAX_PENDING_BATCHES,
+    max_line_bytes: int = settings.INGEST_STREAM_MAX_LINE_BYTES,
+) -> AsyncIterator[bytes]:
+    """
+    Parses an NDJSON body incrementally and yields one NDJSON decision per input line
+    (in input order), micro-batch by micro-batch.
+
+    The reader hands batches over a BOUNDED queue: when the rule/DB pipeline falls
+    behind, the reader stops pulling the body, so the upload is slowed by TCP flow
+    control instead of being buffered. At most `max_pending_batches` parsed batches
+    (plus the one being processed) are ever held in memory.
+    """
+    process = process or _persist
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending_batches)
+
+    async def read():
+        batch: Batch = []
+        line_no = 0
+        buffer = b""
+        overlong = False
+
+        async def emit():
+            nonlocal batch
+            await queue.put(batch)
+            batch = []
+
+        def reject(error: str):
+            nonlocal line_no
+            batch.append((line_no, {"status": "REJECTED", "error": error}))
+            line_no += 1
+
+        def parse(raw: bytes):
+            nonlocal line_no
+            if not raw.strip():
+                return
+            try:
+                transaction = TransactionCreate(**json.loads(raw))
+            except (ValueError, TypeError, ValidationError) as e:
+                return reject(str(e).splitlines()[0])
+            batch.append((line_no, transaction))
+            line_no += 1
+
+        try:
+            async for chunk in body:
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for raw in lines:
+                    if overlong:
+                        # The tail of a line that was already rejected
+                        overlong = False
+                        continue
+                    parse(raw)
+                    if len(batch) >= batch_size:
+                        await emit()
+                if len(buffer) > max_line_bytes and not overlong:
+                    reject(f"Line exceeds {max_line_bytes} bytes.")
+                    buffer, overlong = b"", True
+                elif overlong:
+                    buffer = b""
+            if not overlong:
+                parse(buffer)
+            await emit()
+            await queue.put(None)
+        except Exception as e:
+            # Surface body errors (e.g. client disconnect) to the response side
+            await queue.put(e)
+
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            valid = [(index, t) for index, t in item if isinstance(t, TransactionCreate)]
+            decisions = {index: outcome for index, outcome in item if not isinstance(outcome, TransactionCreate)}
+            if valid:
+                try:
+                    results = await process([transaction for _, transaction in valid])
+                    decisions.update((index, result.model_dump(exclude_none=True)) for (index, _), result in zip(valid, results))
+                except Exception as e:
+                    # A failed micro-batch is reported per record; the stream goes on
+                    logger.error(f"Stream ingestion batch of {len(valid)} failed: {e}")
+                    detail = getattr(e, "detail", str(e))
+                    decisions.update((index, {"status": "ERROR", "error": detail}) for index, _ in valid)
+            for index in sorted(decisions):
+                yield _line({**decisions[index], "index": index})
+    finally:
+        reader.cancel()
@@ -0,0 +1,159 @@
+import itertools
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from app.core.config import settings
+from app.rules.batch import TransactionBatch
+from app.rules.structuring import StructuringRule
+from app.rules.velocity import VelocityRule
+from app.rules.watchlist import WatchlistRule
+from app.services.velocity_store import parse_window
+from app.services.watchlist_service import watchlist_service
+
+logger = logging.getLogger(__name__)
+
+# Set bits per byte value, for counting alerts straight from packed hit vectors
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+class ThresholdSweep:
+    """
+    Evaluates a grid of rule parameters in ONE pass over historical transactions.
+
+        grid = {
+            "structuring": {"LOWER_BOUND": [8000, 9000], "REPORTING_THRESHOLD": [10000]},
+            "velocity": {"TIME_WINDOW_MINUTES": [5, 15], "MAX_TRANSACTIONS": [3, 5]},
+            "watchlist": {"threshold": [80, 85, 90]},
+            "ALERT_THRESHOLD_SCORE": [60, 80],
+        }
+
+    Features are computed once and shared by every combination: prior counts per
+    velocity window, sub-threshold rolling sums per reporting threshold, and the best
+    sanctions score per distinct counterparty. Each rule then yields one hit vector
+    per parameter setting, and combinations are counted by OR-ing bit-packed vectors
+    with broadcasting. Parameters missing from the grid keep their configured value.
+
+    The velocity sweep covers the primary window (TIME_WINDOW_MINUTES / MAX_TRANSACTIONS);
+    windows are exact here, whereas the live velocity store may over-count by a bucket.
+    """
+
+    def __init__(self, batch: TransactionBatch, grid: Dict[str, Any], configured: Optional[Sequence[Any]] = None):
+        self.batch = batch
+        defaults = {type(rule): rule for rule in (configured or [])}
+        structuring = defaults.get(StructuringRule) or StructuringRule()
+        velocity = defaults.get(VelocityRule) or VelocityRule()
+
+        def values(section: str, key: str, default: Any) -> List[Any]:
+            return list(grid.get(section, {}).get(key, [default]))
+
+        self.lower_bounds = values("structuring", "LOWER_BOUND", structuring.LOWER_BOUND)
+        self.reporting_thresholds = values("structuring", "REPORTING_THRESHOLD", structuring.REPORTING_THRESHOLD)
+        self.aggregate_windows = [parse_window(label) for label in grid.get("structuring", {}).get("AGGREGATE_WINDOWS", structuring.AGGREGATE_WINDOWS)]
+        self.window_minutes = values("velocity", "TIME_WINDOW_MINUTES", velocity.TIME_WINDOW_MINUTES)
+        self.max_transactions = values("velocity", "MAX_TRANSACTIONS", velocity.MAX_TRANSACTIONS)
+        self.watchlist_thresholds = values("watchlist", "threshold", watchlist_service.threshold)
+        self.alert_thresholds = list(grid.get("ALERT_THRESHOLD_SCORE", [settings.ALERT_THRESHOLD_SCORE]))
+
+        self.scores = {
+            "structuring": StructuringRule.max_risk_score,
+            "velocity": VelocityRule.max_risk_score,
+            "watchlist": WatchlistRule.max_risk_score,
+        }
+        self.settings: Dict[str, List[Dict[str, Any]]] = {}
+        self.hits: Dict[str, np.ndarray] = {}
+        self._precompute()
+
+    # --- Shared features -> one hit vector per rule setting --------------------
+    def _precompute(self):
+        batch = self.batch
+        amounts = batch.amounts
+
+        # 1. Structuring: single-amount band, plus rolling sub-threshold sums per threshold
+        aggregate_hits = {}
+        for threshold in self.reporting_thresholds:
+            below = amounts < threshold
+            hits = np.zeros(len(batch), dtype=bool)
+            for window in self.aggregate_windows:
+                count, total = batch.prior_in_window(window, mask=below)
+                hits |= below & (count > 0) & (total + amounts >= threshold)
+            aggregate_hits[threshold] = hits
+        combos = list(itertools.product(self.lower_bounds, self.reporting_thresholds))
+        self.settings["structuring"] = [{"LOWER_BOUND": low, "REPORTING_THRESHOLD": high} for low, high in combos]
+        self.hits["structuring"] = np.array(
+            [((amounts >= low) & (amounts < high)) | aggregate_hits[high] for low, high in combos]
+        ).reshape(len(combos), len(batch))
+
+        # 2. Velocity: prior count per window, compared against every limit by broadcasting
+        prior = np.array([batch.prior_in_window(minutes * 60)[0] for minutes in self.window_minutes]).reshape(-1, len(batch))
+        limits = np.asarray(self.max_transactions)
+        hits = prior[:, None, :] >= limits[None, :, None]
+        self.settings["velocity"] = [
+            {"TIME_WINDOW_MINUTES": minutes, "MAX_TRANSACTIONS": limit}
+            for minutes, limit in itertools.product(self.window_minutes, self.max_transactions)
+        ]
+        self.hits["velocity"] = hits.reshape(-1, len(batch))
+
+        # 3. Watchlist: best score per distinct counterparty, screened once
+        names = batch.column("counterparty_name")
+        unique_names, inverse = np.unique(np.array([n or "" for n in names], dtype=str), return_inverse=True)
+        best = watchlist_service.best_scores(unique_names.tolist(), floor=min(self.watchlist_thresholds))[inverse] if len(batch) else np.zeros(0)
+        thresholds = np.asarray(self.watchlist_thresholds, dtype=np.float64)
+        self.settings["watchlist"] = [{"threshold": t} for t in self.watchlist_thresholds]
+        self.hits["watchlist"] = (best[None, :] >= thresholds[:, None]).reshape(-1, len(batch))
+
+    # --- Combination counting ----------------------------------------------------
+    def _union_counts(self, rules: List[str]) -> np.ndarray:
+        """Rows hit by ANY of `rules`, for every (structuring, velocity, watchlist) combination."""
+        order = ("structuring", "velocity", "watchlist")
+        shape = tuple(len(self.settings[rule]) for rule in order)
+        if not rules:
+            return np.zeros(shape, dtype=np.int64)
+
+        packed = {rule: np.packbits(self.hits[rule], axis=1) for rule in rules}
+        width = next(iter(packed.values())).shape[1]
+        counts = np.empty(shape, dtype=np.int64)
+        for s in range(shape[0]):
+            # (velocity, watchlist, bytes) slab per structuring setting bounds memory
+            acc = np.zeros((1, 1, width), dtype=np.uint8)
+            if "structuring" in packed:
+                acc = acc | packed["structuring"][s][None, None, :]
+            if "velocity" in packed:
+                acc = acc | packed["velocity"][:, None, :]
+            if "watchlist" in packed:
+                acc = acc | packed["watchlist"][None, :, :]
+            acc = np.broadcast_to(acc, (shape[1], shape[2], width))
+            counts[s] = _POPCOUNT[acc].sum(axis=-1, dtype=np.int64)
+        return counts
+
+    def run(self) -> List[Dict[str, Any]]:
+        """One row per parameter combination: per-rule hits, flagged/blocked volumes and alerts."""
+        rule_hits = {rule: self.hits[rule].sum(axis=1) for rule in self.hits}
+        # Total risk is the MAX triggered score, so "score > x" is a union over the rules scoring above x
+        flagged = self._union_counts([r for r, score in self.scores.items() if score > 0])
+        blocked = self._union_counts([r for r, score in self.scores.items() if score >= 100])
+        alerts = {a: self._union_counts([r for r, score in self.scores.items() if score > a]) for a in self.alert_thresholds}
+
+        rows = []
+        for s, v, w in itertools.product(*(range(len(self.settings[r])) for r in ("structuring", "velocity", "watchlist"))):
+            params = {}
+            for rule, i in (("structuring", s), ("velocity", v), ("watchlist", w)):
+                params.update({f"{rule}.{key}": value for key, value in self.settings[rule][i].items()})
+            outcome = {
+                "structuring_hits": int(rule_hits["structuring"][s]),
+                "velocity_hits": int(rule_hits["velocity"][v]),
+                "watchlist_hits": int(rule_hits["watchlist"][w]),
+                "flagged": int(flagged[s, v, w] - blocked[s, v, w]),
+                "blocked": int(blocked[s, v, w]),
+            }
+            for a in self.alert_thresholds:
+                rows.append({**params, "ALERT_THRESHOLD_SCORE": a, **outcome, "alerts": int(alerts[a][s, v, w])})
+        return rows
+
+async def load_history(source: str, since: Any = None, until: Any = None, chunk_size: int = 50_000) -> TransactionBatch:
+    """Reads the whole history (table or export) into one TransactionBatch."""
+    from app.services.backtest_service import iter_db_chunks, iter_file_chunks
+
+    chunks = iter_db_chunks(0, 1, chunk_size, since, until) if source == "db" else iter_file_chunks(source, 0, 1, chunk_size)
+    rows: List[Any] = []
+    async for chunk in chunks:
+        rows.extend(chunk)
+    return TransactionBatch(rows)
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from app.core.automaton import AhoCorasick
+from app.core.config import settings
+from app.services.sanctions_index import SanctionEntry
+
+logger = logging.getLogger(__name__)
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+class TextHit(NamedTuple):
+    kind: str                         # "sanction" or "keyword"
+    pattern: str                      # the alias / keyword, as listed
+    entry: Optional[SanctionEntry]    # the listed party (sanction hits only)
+    start: int                        # offsets in the folded text
+    end: int
+
+def fold_text(text: str) -> str:
+    """
+    Accent-stripped, casefolded, one space between words and around the whole text.
+    Patterns are folded the same way, so a match always spans whole words.
+    """
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    words = _SEPARATORS.sub(" ", stripped.casefold()).split()
+    return f" {' '.join(words)} " if words else ""
+
+class TextScreener:
+    """
+    Sanctioned names (every alias, in listed word order) and keywords compiled into one
+    Aho-Corasick automaton. A message is scanned in a single linear pass regardless of
+    how many patterns there are. Aliases shorter than `min_alias_length` are skipped:
+    initials and short codes are noise in free text.
+    """
+
+    def __init__(self, index, keywords: Sequence[str] = (), min_alias_length: int = 4):
+        payloads: Dict[str, List[Tuple[str, str, Optional[SanctionEntry]]]] = {}
+        for entry, aliases in index.records():
+            for alias in aliases:
+                folded = fold_text(alias)
+                if len(folded) - 2 >= min_alias_length:
+                    payloads.setdefault(folded, []).append(("sanction", alias, entry))
+        for keyword in keywords:
+            folded = fold_text(keyword)
+            if folded:
+                payloads.setdefault(folded, []).append(("keyword", keyword, None))
+
+        patterns = list(payloads)
+        self.payloads = [payloads[p] for p in patterns]
+        self.automaton = AhoCorasick(patterns)
+        self.list_version = index.version
+        keyword_digest = hashlib.sha1("\n".join(keywords).encode("utf-8")).hexdigest()[:8]
+        self.version = f"{index.version}:{keyword_digest}"
+
+    def scan(self, text: str) -> List[TextHit]:
+        """Every listed name / keyword occurring in `text` (one hit per party or keyword)."""
+        folded = fold_text(text)
+        hits, seen = [], set()
+        for end, pattern_id in self.automaton.iter_matches(folded):
+            length = len(self.automaton.patterns[pattern_id])
+            for kind, pattern, entry in self.payloads[pattern_id]:
+                key = (entry.source, entry.uid) if entry else pattern
+                if key in seen:
+                    continue
+                seen.add(key)
+                # Offsets exclude the padding spaces
+                hits.append(TextHit(kind, pattern, entry, end - length + 1, end - 1))
+        return hits
+
+class TextScreeningService:
+    """
+    Keeps one TextScreener per sanctions list version. On the request path a list change
+    never blocks: the new automaton is compiled in a background thread (seconds for
+    100k aliases) while scans keep using the previous one until it is ready.
+    """
+
+    def __init__(self):
+        self._screener: Optional[TextScreener] = None
+        self._lock = threading.Lock()
+        # Held for as long as a background rebuild runs
+        self._rebuilding = threading.Lock()
+
+    def screener(self) -> TextScreener:
+        """The screener for the current list version, compiling it if needed (blocking)."""
+        from app.services.watchlist_service import watchlist_service
+
+        index = watchlist_service.index
+        screener = self._screener
+        if screener is None or screener.list_version != index.version:
+            with self._lock:
+                screener = self._screener
+                if screener is None or screener.list_version != index.version:
+                    screener = TextScreener(index, settings.REMITTANCE_KEYWORDS, settings.REMITTANCE_MIN_ALIAS_LENGTH)
+                    self._screener = screener
+                    logger.info(f"Remittance screener v{screener.version}: {len(screener.automaton)} automaton states.")
+        return screener
+
+    async def current(self) -> TextScreener:
+        """
+        The screener to scan with now. A stale one is returned as is and a rebuild is
+        started in the background; only the very first build is awaited (in a thread).
+        """
+        from app.services.watchlist_service import watchlist_service
+
+        screener = self._screener
+        if screener is None:
+            return await asyncio.to_thread(self.screener)
+        if screener.list_version != watchlist_service.index.version:
+            self._rebuild_in_background()
+        return screener
+
+    def _rebuild_in_background(self):
+        if not self._rebuilding.acquire(blocking=False):
+            return  # already under way
+
+        def rebuild():
+            try:
+                self.screener()
+            except Exception as e:
+                logger.error(f"Remittance screener rebuild failed, still scanning with v{self._screener.version}: {e}")
+            finally:
+                self._rebuilding.release()
+
+        threading.Thread(target=rebuild, name="remittance-screener", daemon=True).start()
+
+    def scan(self, text: str) -> List[TextHit]:
+        if not text:
+            return []
+        return self.screener().scan(text)
+
+# Singleton Instance
+text_screening_service = TextScreeningService()
@@ -1,47 +1,76 @@
+import asyncio
+import logging
+import uuid
 from datetime import datetime
+from typing import List, Optional, Sequence
 from fastapi import HTTPException
+from sqlalchemy import insert, literal, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+
+from app.core.query_counter import stage
+from app.db.base import async_session_factory
 
 # Imports must match the new Day 6 structure
 from app.models.transaction import Transaction
 from app.models.customer import Customer
-from app.schemas.transaction import TransactionCreate
+from app.schemas.transaction import TransactionBatchItem, TransactionCreate
+from app.services.customer_cache import customer_context_cache
 from app.services.graph_service import graph_service
+from app.services.velocity_store import velocity_store
+
+# Rule Engine (process-wide, built once from settings.RULE_DEFINITIONS)
+from app.rules.registry import rule_registry
 
-# Rule Engine & Rules
-from app.rules.engine import RuleEngine
-from app.rules.structuring import StructuringRule
-from app.rules.watchlist import WatchlistRule
-from app.rules.velocity import VelocityRule
+logger = logging.getLogger(__name__)
+
+# The graph kill switch: a payment closing a ring of accounts is blocked whatever the rules say
+CIRCULAR_RISK_SCORE = 100.0
+CIRCULAR_REASON = "Graph: Circular Round-Trip Detected (LAUNDERING SIGNAL)"
+
+def classify_risk(total_risk_score: float) -> str:
+    """Decision Matrix: maps a total risk score to the transaction status."""
+    if total_risk_score >= 100:
+        return "BLOCKED"
+    elif total_risk_score > 0:
+        return "FLAGGED"
+    return "COMPLETED"
 
 async def create_transaction(db: AsyncSession, transaction_in: TransactionCreate) -> Transaction:
-    # 1. Validate Customer
-    result = await db.execute(select(Customer).filter(Customer.id == transaction_in.customer_id))
-    customer = result.scalars().first()
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found.")
+    """
+    Single-transaction ingestion. With the customer context cached and the velocity
+    store warm it costs two round trips: one INSERT ... SELECT ... RETURNING, which
+    also re-checks that the customer exists, and the COMMIT. A customer not cached yet
+    costs one lookup first (then cached for CUSTOMER_CACHE_TTL_SECONDS); an unknown one
+    is rejected there, before any rule runs. While the velocity store is cold (or
+    disabled), the velocity and structuring rules add their COUNT queries.
+    """
+    # 1. Customer context: cached, or ONE lookup that fills the cache
+    customer = customer_context_cache.peek(transaction_in.customer_id)
+    if customer is None:
+        with stage("customers"):
+            customer = await customer_context_cache.get(db, transaction_in.customer_id)
+        if customer is None:
+            raise HTTPException(status_code=404, detail="Customer not found.")
 
     # 2. Rule Engine
-    engine = RuleEngine()
-    engine.add_rule(StructuringRule())
-    engine.add_rule(VelocityRule())
-    # Day 6: The WatchlistRule now scans counterparty_name
-    engine.add_rule(WatchlistRule())
-    
-    context = {"db": db, "customer_id": customer.id}
+    # Take one reference: a concurrent hot-reload cannot change rules mid-evaluation
+    engine = rule_registry.engine
+
+    # Rules that may hit the DB are timed on a session of their own (see RuleEngine._check)
+    context = {"db": db, "session_factory": async_session_factory, "customer_id": transaction_in.customer_id, "customer": customer}
     # This passes the Pydantic model (with counterparty_name) to the rules
-    rule_results = await engine.evaluate(transaction_in, customer_context=context)
+    with stage("rules"):
+        rule_results = await engine.evaluate(transaction_in, customer_context=context)
     
     # 3. Graph Intelligence (Circular Check)
     # We use a try/except block to ensure Graph downtime doesn't kill the SQL transaction
     try:
         is_circular = graph_service.check_circular_dependency(
-            sender_id=customer.id, 
+            sender_id=transaction_in.customer_id, 
             counterparty_account=transaction_in.counterparty_account
         )
     except Exception as e:
-        print(f"Graph Check Warning: {e}")
+        logger.warning(f"Graph circular check failed: {e}")
         is_circular = False
 
     # 4. Risk Calculation
@@ -50,50 +79,138 @@ async def create_transaction(db: AsyncSession, transaction_in: TransactionCreate
     
     # KILL SWITCH
     if is_circular:
-        total_risk_score += 100
-        flagged_reasons.append("Graph: Circular Round-Trip Detected (LAUNDERING SIGNAL)")
+        total_risk_score += CIRCULAR_RISK_SCORE
+        flagged_reasons.append(CIRCULAR_REASON)
 
     reason_text = " | ".join(flagged_reasons) if flagged_reasons else None
     
     # Decision Matrix
-    if total_risk_score >= 100:
-        transaction_status = "BLOCKED"
-    elif total_risk_score > 0:
-        transaction_status = "FLAGGED"
-    else:
-        transaction_status = "COMPLETED"
+    transaction_status = classify_risk(total_risk_score)
 
-    # 5. Persist to Postgres
-    # .model_dump() automatically extracts 'counterparty_name' from the Pydantic model
-    db_transaction = Transaction(
+    # 5. Persist to Postgres: INSERT ... SELECT FROM customers WHERE id = ... RETURNING id.
+    # No row back means the customer was deleted since it was cached; the id comes back without a refresh
+    timestamp = datetime.now()
+    values = {
         **transaction_in.model_dump(),
-        timestamp=datetime.now(),
-        status=transaction_status,
-        risk_score=total_risk_score,
-        flagged_reason=reason_text
-    )
-    db.add(db_transaction)
-    
+        "transaction_uuid": str(uuid.uuid4()),
+        "timestamp": timestamp,
+        "status": transaction_status,
+        "risk_score": total_risk_score,
+        "flagged_reason": reason_text,
+    }
+    columns = Transaction.__table__.c
+    source = select(*(literal(value, columns[name].type) for name, value in values.items())).where(Customer.id == transaction_in.customer_id)
+    statement = insert(Transaction).from_select(list(values), source).returning(Transaction.id)
+
+    try:
+        with stage("persist"):
+            transaction_id = (await db.execute(statement)).scalar()
+            if transaction_id is None:
+                await db.rollback()
+                customer_context_cache.invalidate(transaction_in.customer_id)
+                raise HTTPException(status_code=404, detail="Customer not found.")
+            await db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Transaction insert failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Database commit failed: {str(e)}")
+
+    # Keep the in-memory velocity window in step with what is committed
+    velocity_store.record(transaction_in.customer_id, transaction_in.amount, timestamp.timestamp())
+
+    # 6. Async Shadow Write (Sync to Neo4j)
+    try:
+        graph_service.create_customer_node(customer.id, customer.full_name, customer.risk_score)
+        graph_service.record_transaction(
+            transaction_in.customer_id, 
+            transaction_in.counterparty_account, 
+            transaction_in.amount, 
+            transaction_in.currency
+        )
+    except Exception as graph_e:
+        logger.warning(f"Graph sync failed: {graph_e}")
+
+    return Transaction(id=transaction_id, **values)
+
+async def create_transactions_batch(
+    db: AsyncSession,
+    transactions_in: Sequence[TransactionCreate],
+    transaction_uuids: Optional[Sequence[str]] = None,
+) -> List[TransactionBatchItem]:
+    """
+    Bulk ingestion with a constant number of round trips, whatever the batch size:
+    one customer lookup, batch rule evaluation (grouped velocity history), one graph
+    ring lookup, one multi-row INSERT ... RETURNING, one commit and one graph write.
+    Items for unknown customers are rejected individually; results come back in input order.
+    `transaction_uuids` keeps the UUIDs already handed out when the records were accepted.
+    """
+    # 1. Validate every customer id: cached contexts, ONE query for the rest
+    with stage("customers"):
+        known = await customer_context_cache.get_many(db, (t.customer_id for t in transactions_in))
+    valid = [i for i, t in enumerate(transactions_in) if t.customer_id in known]
+
+    uuids = list(transaction_uuids) if transaction_uuids is not None else [str(uuid.uuid4()) for _ in transactions_in]
+    results = [
+        TransactionBatchItem(index=i, status="REJECTED", error="Customer not found.")
+        for i in range(len(transactions_in))
+    ]
+    if not valid:
+        return results
+
+    # 2. Rule Engine over the whole batch (earlier rows of a customer count for later ones)
+    timestamp = datetime.now()
+    items = [transactions_in[i] for i in valid]
+    engine = rule_registry.engine
+    with stage("rules"):
+        evaluation = await engine.evaluate_batch(items, customer_context={"db": db, "customers": known})
+    total_risk = evaluation.total_risk.tolist()
+
+    # 3. Graph intelligence: the same kill switch as create_transaction, ONE ring lookup
+    # for every distinct (customer, counterparty account). Graph downtime never fails the batch
+    pairs = sorted({(str(t.customer_id), t.counterparty_account) for t in items if t.counterparty_account})
+    circular = await asyncio.to_thread(graph_service.circular_pairs, pairs) if pairs else set()
+
+    # 4. Persist: one multi-row INSERT ... RETURNING (ids in parameter order), one commit
+    rows = []
+    for k, (i, item) in enumerate(zip(valid, items)):
+        reasons = evaluation.reasons(k)
+        if (str(item.customer_id), item.counterparty_account) in circular:
+            total_risk[k] += CIRCULAR_RISK_SCORE
+            reasons = reasons + [CIRCULAR_REASON]
+        rows.append({
+            **item.model_dump(),
+            "transaction_uuid": uuids[i],
+            "timestamp": timestamp,
+            "status": classify_risk(total_risk[k]),
+            "risk_score": total_risk[k],
+            "flagged_reason": " | ".join(reasons) if reasons else None,
+        })
     try:
-        await db.commit()
-        await db.refresh(db_transaction)
-        
-        # 6. Async Shadow Write (Sync to Neo4j)
-        try:
-            # Note: Graph Service might need updates later, but for now we sync core data
-            graph_service.create_customer_node(customer.id, customer.full_name, customer.risk_score)
-            graph_service.record_transaction(
-                customer.id, 
-                transaction_in.counterparty_account, 
-                transaction_in.amount, 
-                transaction_in.currency
-            )
-        except Exception as graph_e:
-            print(f"WARNING: Graph sync failed: {graph_e}")
-            
-        return db_transaction
+        with stage("persist"):
+            inserted = await db.execute(insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True), rows)
+            ids = inserted.scalars().all()
+            await db.commit()
     except Exception as e:
         await db.rollback()
-        # This will show up in your Terminal 1 logs if DB save fails
-        print(f"DATABASE ERROR: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Database commit failed: {str(e)}")
\ No newline at end of file
+        logger.error(f"Batch insert of {len(rows)} transactions failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Database commit failed: {str(e)}")
+
+    # 5. Keep the in-memory velocity window in step with what is committed
+    for row, i, transaction_id in zip(rows, valid, ids):
+        velocity_store.record(row["customer_id"], row["amount"], timestamp.timestamp())
+        results[i] = TransactionBatchItem(
+            index=i, status=row["status"], id=transaction_id, transaction_uuid=row["transaction_uuid"],
+            risk_score=row["risk_score"], flagged_reason=row["flagged_reason"],
+        )
+
+    # 6. Shadow write to Neo4j, ONE query for the batch: later batches (and the async queue,
+    # which decides through this path) see these edges in their ring lookup
+    await asyncio.to_thread(graph_service.record_transactions, [
+        {"sender": str(row["customer_id"]), "receiver": row["counterparty_account"], "amount": row["amount"],
+         "currency": row["currency"], "txn_id": row["transaction_uuid"],
+         "sender_name": known[row["customer_id"]].full_name, "sender_risk": known[row["customer_id"]].risk_score}
+        for row in rows
+    ])
+    return results
@@ -0,0 +1,392 @@
+import logging
+import time
+from array import array
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select, func
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_window(label: str) -> int:
+    """'5m' -> 300, '24h' -> 86400, '7d' -> 604800."""
+    return int(label[:-1]) * _UNIT_SECONDS[label[-1]]
+
+class _WindowCounter:
+    """
+    Bucketed running totals (count, amount) over one window.
+
+    The window is split into `n` buckets of equal width, held in a ring of n + 1 slots.
+    Updates touch one slot, queries read the running totals: both O(1) (advancing the
+    ring expires at most n + 1 slots, amortised O(1)).
+    Totals are conservative: they cover the window plus at most one bucket width of
+    older activity, so a limit is never missed because of bucketing.
+    """
+    __slots__ = ("width", "counts", "amounts", "bucket_ids", "current", "total_count", "total_amount")
+
+    def __init__(self, window_seconds: float, buckets: int):
+        self.width = window_seconds / buckets
+        self.counts = array("q", bytes(8 * (buckets + 1)))
+        self.amounts = array("d", bytes(8 * (buckets + 1)))
+        self.bucket_ids = array("q", [-1] * (buckets + 1))
+        self.current = -1
+        self.total_count = 0
+        self.total_amount = 0.0
+
+    def _advance(self, bucket: int):
+        if bucket <= self.current:
+            return
+        slots = len(self.counts)
+        for b in range(max(self.current + 1, bucket - slots + 1), bucket + 1):
+            slot = b % slots
+            if self.bucket_ids[slot] != -1:
+                self.total_count -= self.counts[slot]
+                self.total_amount -= self.amounts[slot]
+            self.counts[slot] = 0
+            self.amounts[slot] = 0.0
+            self.bucket_ids[slot] = b
+        self.current = bucket
+
+    def add(self, ts: float, amount: float):
+        bucket = int(ts // self.width)
+        self._advance(bucket)
+        if bucket <= self.current - len(self.counts):
+            return  # Older than anything this window still holds
+        slot = bucket % len(self.counts)
+        self.counts[slot] += 1
+        self.amounts[slot] += amount
+        self.total_count += 1
+        self.total_amount += amount
+
+    def totals(self, now: float) -> Tuple[int, float]:
+        self._advance(int(now // self.width))
+        return self.total_count, self.total_amount
+
+class _ExactWindowCounter:
+    """
+    Exact running totals over one window: every event is kept until it leaves the window
+    (timestamps >= now - window count, as in TransactionBatch.prior_in_window). For
+    chronological replays, where history carried between chunks must match the history
+    computed inside a chunk; queries must not go back in time.
+    """
+    __slots__ = ("window", "events", "total_count", "total_amount")
+
+    def __init__(self, window_seconds: float, buckets: Optional[int] = None):
+        self.window = window_seconds
+        self.events: Deque[Tuple[float, float]] = deque()
+        self.total_count = 0
+        self.total_amount = 0.0
+
+    def add(self, ts: float, amount: float):
+        self.events.append((ts, amount))
+        self.total_count += 1
+        self.total_amount += amount
+
+    def totals(self, now: float) -> Tuple[int, float]:
+        events = self.events
+        while events and events[0][0] < now - self.window:
+            _, amount = events.popleft()
+            self.total_count -= 1
+            self.total_amount -= amount
+        if not events:
+            self.total_amount = 0.0  # no float residue once empty
+        return self.total_count, self.total_amount
+
+class _CustomerActivity:
+    __slots__ = ("windows", "sub_threshold", "last_seen")
+
+    def __init__(self, windows: List[float], sub_threshold_windows: List[float], buckets: Optional[int]):
+        counter = _ExactWindowCounter if buckets is None else _WindowCounter
+        self.windows = [counter(w, buckets) for w in windows]
+        # Only amounts below the reporting threshold (structuring / smurfing aggregates)
+        self.sub_threshold = [counter(w, buckets) for w in sub_threshold_windows]
+        self.last_seen = 0.0
+
+class VelocityStore:
+    """
+    In-process, per-customer activity aggregates over several windows at once
+    (count and summed amount for e.g. 1m/5m/1h/24h/7d), plus a separate series of
+    only the sub-threshold amounts (below `sub_threshold_limit`) for structuring.
+    The limit is the structuring rule's own threshold (see track_sub_threshold);
+    until it is set the sub-threshold series answers nothing.
+
+    Warmed from Postgres at startup and updated after every commit, so velocity
+    checks answer from memory instead of a COUNT query per transaction.
+    buckets_per_window=None keeps exact per-event timestamps instead of buckets
+    (replays: same answers as the in-batch history, at the cost of memory).
+    Memory is bounded: customers idle for longer than the horizon (the longest window)
+    are dropped losslessly and at most `max_customers` are kept (least recently
+    active evicted first).
+
+    NOTE: state is per process. With several uvicorn workers each store only sees
+    its own commits, so multi-worker deployments should disable it
+    (VELOCITY_STORE_ENABLED=False) and keep the DB path.
+    """
+
+    SERIES = ("all", "sub_threshold")
+
+    def __init__(
+        self,
+        windows_seconds: List[int],
+        buckets_per_window: Optional[int],
+        max_customers: int,
+        sub_threshold_limit: Optional[float] = None,
+        sub_threshold_windows_seconds: Optional[List[int]] = None,
+    ):
+        self.windows_seconds = sorted(windows_seconds)
+        self.sub_threshold_windows_seconds = sorted(sub_threshold_windows_seconds or [])
+        self.sub_threshold_limit = sub_threshold_limit
+        self._window_index: Dict[str, Dict[int, int]] = {
+            "all": {w: i for i, w in enumerate(self.windows_seconds)},
+            "sub_threshold": {w: i for i, w in enumerate(self.sub_threshold_windows_seconds)},
+        }
+        self.buckets_per_window = buckets_per_window
+        self.horizon_seconds = max(self.windows_seconds + self.sub_threshold_windows_seconds, default=0)
+        self.max_customers = max_customers
+        self._customers: "OrderedDict[int, _CustomerActivity]" = OrderedDict()
+        # Newest activity among customers evicted under memory pressure. Unknown customers
+        # newer than this may have lost history, so the store declines to answer for them.
+        self._evicted_floor = float("-inf")
+        self.is_warm = False
+
+    @classmethod
+    def for_rules(cls, rules, buckets_per_window: Optional[int], max_customers: int) -> "VelocityStore":
+        """A store tracking exactly the windows, and the sub-threshold limit, that `rules` read."""
+        windows: Dict[str, set] = {series: set() for series in cls.SERIES}
+        limits = set()
+        for rule in rules:
+            for series, seconds in rule.history_windows().items():
+                windows[series].update(seconds)
+                if series == "sub_threshold":
+                    limits.add(rule.sub_threshold_limit())
+        if len(limits) > 1:
+            raise ValueError(f"Rules read sub-threshold history below different limits {sorted(limits)}; a store tracks one.")
+        return cls(
+            windows_seconds=sorted(windows["all"]),
+            buckets_per_window=buckets_per_window,
+            max_customers=max_customers,
+            sub_threshold_limit=next(iter(limits), None),
+            sub_threshold_windows_seconds=sorted(windows["sub_threshold"]),
+        )
+
+    def __len__(self) -> int:
+        return len(self._customers)
+
+    def supports(self, window_seconds: int, series: str = "all") -> bool:
+        return window_seconds in self._window_index[series]
+
+    def track_sub_threshold(self, limit: float):
+        """
+        Sets the amount below which activity counts in the sub-threshold series. A change
+        drops what the store holds: the next ensure_warm() reloads it under the new limit.
+        """
+        if limit == self.sub_threshold_limit:
+            return
+        self.clear()
+        self.sub_threshold_limit = limit
+
+    def record(self, customer_id: int, amount: float, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        activity = self._customers.get(customer_id)
+        if activity is None:
+            activity = _CustomerActivity(self.windows_seconds, self.sub_threshold_windows_seconds, self.buckets_per_window)
+            self._customers[customer_id] = activity
+        for counter in activity.windows:
+            counter.add(ts, amount)
+        if self.sub_threshold_limit is not None and amount < self.sub_threshold_limit:
+            for counter in activity.sub_threshold:
+                counter.add(ts, amount)
+        activity.last_seen = max(activity.last_seen, ts)
+        self._customers.move_to_end(customer_id)
+        self._evict(ts)
+
+    def window(self, customer_id: int, window_seconds: int, now: Optional[float] = None, series: str = "all") -> Optional[Tuple[int, float]]:
+        """
+        (count, summed amount) of the customer's activity in the window ending `now`.
+        series="sub_threshold" only counts amounts below `sub_threshold_limit`.
+        Returns None when the store cannot answer authoritatively
+        (cold, window not tracked, or history evicted).
+        """
+        index = self._window_index[series]
+        if not self.is_warm or window_seconds not in index or (series == "sub_threshold" and self.sub_threshold_limit is None):
+            return None
+        now = time.time() if now is None else now
+        activity = self._customers.get(customer_id)
+        if activity is None:
+            return None if self._evicted_floor >= now - window_seconds else (0, 0.0)
+        counters = activity.windows if series == "all" else activity.sub_threshold
+        return counters[index[window_seconds]].totals(now)
+
+    def _evict(self, now: float):
+        # 1. Idle customers: everything they hold is outside the horizon
+        idle_before = now - self.horizon_seconds
+        while self._customers:
+            customer_id, activity = next(iter(self._customers.items()))
+            if activity.last_seen >= idle_before:
+                break
+            self._customers.popitem(last=False)
+
+        # 2. Memory pressure: least recently active first
+        while len(self._customers) > self.max_customers:
+            _, activity = self._customers.popitem(last=False)
+            self._evicted_floor = max(self._evicted_floor, activity.last_seen)
+
+    def clear(self):
+        self._customers.clear()
+        self._evicted_floor = float("-inf")
+        self.is_warm = False
+
+    async def ensure_warm(self) -> None:
+        """Warms the store once from a fresh session; failures leave it cold (DB fallback)."""
+        if not settings.VELOCITY_STORE_ENABLED or self.is_warm:
+            return
+        from app.db.base import async_session_factory
+        try:
+            async with async_session_factory() as db:
+                await self.warm(db)
+        except Exception as e:
+            logger.error(f"Velocity store warm-up failed, falling back to DB queries: {e}")
+
+    async def warm(self, db) -> int:
+        """
+        Loads every transaction inside the horizon from Postgres, oldest first.
+        """
+        from app.models.transaction import Transaction
+
+        window_start = datetime.now() - timedelta(seconds=self.horizon_seconds)
+        query = select(Transaction.customer_id, Transaction.amount, Transaction.timestamp).where(
+            Transaction.timestamp >= window_start
+        ).order_by(Transaction.timestamp)
+
+        loaded = 0
+        result = await db.stream(query)
+        async for customer_id, amount, timestamp in result:
+            self.record(customer_id, amount, timestamp.timestamp())
+            loaded += 1
+
+        self.is_warm = True
+        logger.info(f"Velocity store warmed with {loaded} transactions for {len(self)} customers.")
+        return loaded
+
+async def aggregate_from_db(
+    db, customer_id: int, windows_seconds: List[int], below_amount: Optional[float] = None, lock=None
+) -> Dict[int, Tuple[int, float]]:
+    """
+    DB fallback for the store: (count, summed amount) per window in ONE query,
+    using a COUNT/SUM ... FILTER pair per window.
+    `below_amount` restricts the aggregate to sub-threshold amounts.
+    `lock` serialises use of a session shared by concurrently running rules.
+    """
+    from app.models.transaction import Transaction
+
+    now = datetime.now()
+    columns = []
+    for window in windows_seconds:
+        in_window = Transaction.timestamp >= now - timedelta(seconds=window)
+        columns.append(func.count(Transaction.id).filter(in_window))
+        columns.append(func.coalesce(func.sum(Transaction.amount).filter(in_window), 0.0))
+
+    query = select(*columns).where(
+        Transaction.customer_id == customer_id,
+        Transaction.timestamp >= now - timedelta(seconds=max(windows_seconds))
+    )
+    if below_amount is not None:
+        query = query.where(Transaction.amount < below_amount)
+
+    async with lock or nullcontext():
+        row = (await db.execute(query)).first()
+    return {w: (row[2 * i] or 0, row[2 * i + 1] or 0.0) for i, w in enumerate(windows_seconds)}
+
+async def aggregate_many_from_db(
+    db, customer_ids: List[int], windows_seconds: List[int], below_amount: Optional[float] = None
+) -> Dict[int, Dict[int, Tuple[int, float]]]:
+    """Grouped variant of aggregate_from_db: every customer of a batch in ONE query."""
+    from app.models.transaction import Transaction
+
+    now = datetime.now()
+    columns = [Transaction.customer_id]
+    for window in windows_seconds:
+        in_window = Transaction.timestamp >= now - timedelta(seconds=window)
+        columns.append(func.count(Transaction.id).filter(in_window))
+        columns.append(func.coalesce(func.sum(Transaction.amount).filter(in_window), 0.0))
+
+    query = select(*columns).where(
+        Transaction.customer_id.in_(customer_ids),
+        Transaction.timestamp >= now - timedelta(seconds=max(windows_seconds))
+    ).group_by(Transaction.customer_id)
+    if below_amount is not None:
+        query = query.where(Transaction.amount < below_amount)
+
+    totals = {cid: {w: (0, 0.0) for w in windows_seconds} for cid in customer_ids}
+    for row in (await db.execute(query)).all():
+        totals[row[0]] = {w: (row[1 + 2 * i] or 0, row[2 + 2 * i] or 0.0) for i, w in enumerate(windows_seconds)}
+    return totals
+
+# Singleton Instance
+velocity_store = VelocityStore(
+    windows_seconds=settings.VELOCITY_WINDOWS_SECONDS,
+    buckets_per_window=settings.VELOCITY_BUCKETS_PER_WINDOW,
+    max_customers=settings.VELOCITY_STORE_MAX_CUSTOMERS,
+    sub_threshold_windows_seconds=settings.STRUCTURING_WINDOWS_SECONDS,
+)
+
+async def batch_window_totals(
+    customer_context: dict, batch, windows_seconds: List[int], series: str = "all", below_amount: Optional[float] = None
+) -> Dict[int, np.ndarray]:
+    """
+    Stored (pre-batch) history for every ROW of a batch: {window: (n, 2) array of
+    (count, summed amount)}, evaluated at each row's own timestamp, so history that
+    has left a row's window no longer counts for it (replays are chunk-size independent).
+    Answered from the store where possible; the rest comes from ONE grouped query,
+    which is evaluated as of now (live ingestion stamps every row with the current time).
+    """
+    # An explicitly supplied store (e.g. a backtest replay) is always used
+    store = customer_context.get('velocity_store')
+    enabled = store is not None or settings.VELOCITY_STORE_ENABLED
+    store = velocity_store if store is None else store
+    usable = enabled and (series == "all" or store.sub_threshold_limit == below_amount)
+
+    n = len(batch)
+    totals = {w: np.zeros((n, 2)) for w in windows_seconds}
+    customers, inverse, _ = batch.customer_index()
+    missing = np.zeros(len(customers), dtype=bool)
+    if usable:
+        # Rows of one customer sharing a timestamp (every live row) share one lookup
+        answers: Dict[Tuple[int, float], Dict[int, Optional[Tuple[int, float]]]] = {}
+        for i, (position, ts) in enumerate(zip(inverse.tolist(), batch.timestamps.tolist())):
+            if missing[position]:
+                continue
+            key = (position, ts)
+            if key not in answers:
+                customer_id = int(customers[position])
+                answers[key] = {w: store.window(customer_id, w, now=ts, series=series) for w in windows_seconds}
+            per_window = answers[key]
+            if any(v is None for v in per_window.values()):
+                missing[position] = True
+                continue
+            for w, value in per_window.items():
+                totals[w][i] = value
+    else:
+        missing[:] = True
+
+    if missing.any() and 'db' not in customer_context:
+        # Zero-filling would silently drop the history (e.g. a replay store missing a rule's window)
+        raise ValueError(
+            f"No {series} history for windows {windows_seconds}: the velocity store cannot answer "
+            f"and there is no database session to read it from."
+        )
+    if missing.any():
+        missing_ids = customers[missing].tolist()
+        history = await aggregate_many_from_db(customer_context['db'], missing_ids, windows_seconds, below_amount)
+        rows = missing[inverse]
+        lookup = np.full(len(customers), -1)
+        lookup[missing] = np.arange(len(missing_ids))
+        for w in windows_seconds:
+            stored = np.array([history[c][w] for c in missing_ids], dtype=np.float64).reshape(-1, 2)
+            totals[w][rows] = stored[lookup[inverse[rows]]]
+    return totals
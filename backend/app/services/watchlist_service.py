@@ -1,10 +1,23 @@
-from rapidfuzz import process, fuzz
-from typing import Tuple
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.batching import MicroBatcher
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.services.identifier_index import IdentifierIndex, IdentifierMatch, load_identifier_file
+from app.services.sanctions_index import SanctionsIndex, SanctionMatch, normalize_name
+from app.services.sanctions_snapshot import LayeredIndex, open_snapshot, snapshot_state
+
+logger = logging.getLogger(__name__)
 
 class WatchlistService:
     def __init__(self):
-        # SIMULATION: In a real bank, this loads daily from XML/CSV (OFAC/UN/EU).
-        # We load this into memory for O(1) speed during transactions.
+        # SIMULATION: Built-in demo list, used until real lists (OFAC/UN/EU) are loaded
+        # from settings.SANCTIONS_LIST_PATHS.
         self.sanctions_list = [
             "Ivan Drago",              # The specific test case
             "Gennady Golovkin",        # High risk individual
@@ -16,31 +29,231 @@ class WatchlistService:
         ]
         # STRICTNESS: 80% similarity means "Ivan Dragg" (90%) will be caught.
         self.threshold = 80.0
+        # Normalized, bigram-blocked index: only a shortlist is fuzzy-scored per name
+        self.index = SanctionsIndex.from_names(self.sanctions_list)
+        # Exact-match accounts / IBANs / wallet addresses published with the lists
+        self.identifiers = IdentifierIndex()
+        # Politically exposed persons: a separate index, screened at onboarding only
+        self.pep_index = SanctionsIndex([])
+        self.pep_threshold = settings.PEP_THRESHOLD
+        self.pep_paths: List[str] = []
+        self.loaded_paths: List[str] = []
+        # (version directory, delta files) of the memory-mapped snapshot in use, if any
+        self.snapshot_state: Optional[Tuple[str, Tuple[str, ...]]] = None
+        self._next_poll = 0.0
+        # Serializes snapshot refreshes (background polls and ensure_loaded)
+        self._refresh_lock = threading.Lock()
+        # Best match per (normalized name, list version, threshold): payroll, utilities and
+        # regular suppliers repeat constantly, so most screenings are a dictionary lookup
+        self.cache = LRUCache(settings.SCREENING_CACHE_SIZE)
+        # Cache misses are scored off the event loop, coalesced into bulk cdist calls
+        self.executor = ThreadPoolExecutor(max_workers=settings.SCREENING_EXECUTOR_WORKERS, thread_name_prefix="screening")
+        self.batcher = MicroBatcher(
+            self._score_misses,
+            executor=self.executor,
+            max_batch_size=settings.SCREENING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.SCREENING_BATCH_MAX_WAIT_MS,
+            max_pending=settings.SCREENING_QUEUE_MAX,
+            name="screening",
+        )
+
+    @property
+    def version(self) -> str:
+        return self.index.version
+
+    def load(self, paths: Sequence[str]) -> SanctionsIndex:
+        """Builds a new index from list files and swaps it in (screenings in flight keep the old one)."""
+        index = SanctionsIndex.from_files(paths)
+        self.identifiers = IdentifierIndex(record for path in paths for record in load_identifier_file(path))
+        self.index = index
+        self.loaded_paths = list(paths)
+        # Outcomes against the old list are void (the version in the key also guards this)
+        self.cache.clear()
+        logger.info(f"Sanctions index v{index.version}: {index.party_count} parties, {len(index)} aliases.")
+        return index
+
+    def refresh_snapshot(self, root: Optional[str] = None) -> bool:
+        """
+        Swaps in the live snapshot version (or its new deltas) if it changed. The base
+        arrays are memory-mapped, so every worker shares one copy in the page cache,
+        and an unchanged base is reused when only deltas were added.
+        """
+        root = root or settings.SANCTIONS_SNAPSHOT_DIR
+        with self._refresh_lock:
+            state = snapshot_state(root)
+            if state == self.snapshot_state:
+                return False
+            previous = self.index if isinstance(self.index, LayeredIndex) else None
+            index = open_snapshot(root, previous)
+            self.index = index
+            self.identifiers = index.identifiers
+            self.snapshot_state = state
+            self.cache.clear()
+        logger.info(f"Sanctions snapshot v{index.version}: {index.party_count} parties, {len(index)} aliases.")
+        return True
+
+    def maybe_refresh(self):
+        """
+        Polls the snapshot directory at most every SANCTIONS_SNAPSHOT_POLL_SECONDS, in a
+        background thread: screening never waits on the file system or on building the
+        delta overlay, and uses the current version until the new one is swapped in.
+        """
+        if not settings.SANCTIONS_SNAPSHOT_DIR or time.monotonic() < self._next_poll or self._refresh_lock.locked():
+            return
+        self._next_poll = time.monotonic() + settings.SANCTIONS_SNAPSHOT_POLL_SECONDS
+        threading.Thread(target=self._poll_snapshot, name="snapshot-refresh", daemon=True).start()
+
+    def _poll_snapshot(self):
+        try:
+            self.refresh_snapshot()
+        except (OSError, ValueError) as e:
+            # Keep screening against the current version; retry on the next poll
+            logger.error(f"Sanctions snapshot refresh failed: {e}")
+
+    def load_peps(self, paths: Sequence[str]) -> SanctionsIndex:
+        """Builds the PEP index from list files and swaps it in."""
+        index = SanctionsIndex.from_files(paths)
+        self.pep_index = index
+        self.pep_paths = list(paths)
+        logger.info(f"PEP index v{index.version}: {index.party_count} persons, {len(index)} aliases.")
+        return index
+
+    async def ensure_loaded(self):
+        """Opens the snapshot, or loads the configured list files, once (off the event loop)."""
+        if settings.PEP_LIST_PATHS and not self.pep_paths:
+            await asyncio.to_thread(self.load_peps, settings.PEP_LIST_PATHS)
+        if settings.SANCTIONS_SNAPSHOT_DIR:
+            if self.snapshot_state is None:
+                await asyncio.to_thread(self.refresh_snapshot)
+                self._next_poll = time.monotonic() + settings.SANCTIONS_SNAPSHOT_POLL_SECONDS
+        elif settings.SANCTIONS_LIST_PATHS and not self.loaded_paths:
+            await asyncio.to_thread(self.load, settings.SANCTIONS_LIST_PATHS)
+
+    def screen(self, name: str, threshold: Optional[float] = None, limit: Optional[int] = None) -> List[SanctionMatch]:
+        """All listed parties matching `name`, best first."""
+        self.maybe_refresh()
+        return self.index.screen(name, self.threshold if threshold is None else threshold, limit=limit)
+
+    def screen_many(self, names: Sequence[str], threshold: Optional[float] = None, limit: Optional[int] = None) -> List[List[SanctionMatch]]:
+        """Bulk screening: one list of matches per name, scored with matrix cdist."""
+        self.maybe_refresh()
+        return self.index.screen_many(names, self.threshold if threshold is None else threshold, limit=limit)
+
+    def _score_misses(self, names: Sequence[str]) -> List[Optional[SanctionMatch]]:
+        """Scores names (once per distinct normalized form) and stores the outcomes in the cache."""
+        index, threshold = self.index, self.threshold
+        normalized = [normalize_name(name) for name in names]
+        distinct = sorted(set(normalized))
+        scored = dict(zip(distinct, index.screen_many(distinct, threshold, limit=1)))
+        results = []
+        for key in normalized:
+            match = scored[key][0] if scored[key] else None
+            self.cache.set((key, index.version, threshold), match)
+            results.append(match)
+        return results
+
+    def _cached(self, names: Sequence[str]) -> List[object]:
+        # False marks a miss (None is a cached "no match")
+        self.maybe_refresh()
+        version, threshold = self.index.version, self.threshold
+        return [self.cache.get((normalize_name(name), version, threshold), False) for name in names]
+
+    def best_matches(self, names: Sequence[str]) -> List[Optional[SanctionMatch]]:
+        """Best match (or None) per name at the service threshold, through the cache."""
+        results = self._cached(names)
+        misses = [i for i, result in enumerate(results) if result is False]
+        if misses:
+            for i, match in zip(misses, self._score_misses([names[i] for i in misses])):
+                results[i] = match
+        return results
+
+    async def best_match_async(self, name: str) -> Optional[SanctionMatch]:
+        """Event-loop friendly: cache hits answer inline, misses join the next micro-batch."""
+        if not name:
+            return None
+        match = self._cached([name])[0]
+        if match is False:
+            match = await self.batcher.submit(name)
+        return match
+
+    async def best_matches_async(self, names: Sequence[str]) -> List[Optional[SanctionMatch]]:
+        """Bulk variant: misses are scored in ONE call on the screening executor."""
+        results = self._cached(names)
+        misses = [i for i, result in enumerate(results) if result is False]
+        if misses:
+            loop = asyncio.get_running_loop()
+            scored = await loop.run_in_executor(self.executor, self._score_misses, [names[i] for i in misses])
+            for i, match in zip(misses, scored):
+                results[i] = match
+        return results
 
     def check_sanction(self, name: str) -> Tuple[bool, str, float]:
         """
-        Screens a name against the sanctions list using Token Sort Ratio.
-        Token Sort Ratio handles reordering (e.g. "Doe John" vs "John Doe").
+        Screens a name against the sanctions index using Token Sort Ratio.
+        Token Sort Ratio handles reordering (e.g. "Doe John" vs "John Doe");
+        names are normalized (case, accents, punctuation) on both sides.
+        Outcomes are cached per normalized name and list version.
         
         Returns: (is_hit, matched_name, score)
         """
         if not name:
             return False, "", 0.0
 
-        # process.extractOne finds the best single match in the list efficiently
-        result = process.extractOne(
-            name, 
-            self.sanctions_list, 
-            scorer=fuzz.token_sort_ratio
-        )
-        
-        # Result format is (match, score, index)
-        if result:
-            match_name, score, _ = result
-            if score >= self.threshold:
-                return True, match_name, score
+        self.maybe_refresh()
+        index = self.index
+        key = (normalize_name(name), index.version, self.threshold)
+        match = self.cache.get(key, False)
+        if match is False:
+            match = index.best_match(name, self.threshold)
+            self.cache.set(key, match)
+
+        if match:
+            return True, match.name, match.score
         
         return False, "", 0.0
 
+    def screen_parties(self, names: Sequence[str]) -> List[Tuple[Optional[SanctionMatch], Optional[SanctionMatch]]]:
+        """
+        (best sanctions match, best PEP match) per name, for onboarding.
+        The whole list is screened in one bulk call per index.
+        """
+        self.maybe_refresh()
+        sanctions = self.index.screen_many(names, self.threshold, limit=1)
+        peps = self.pep_index.screen_many(names, self.pep_threshold, limit=1) if len(self.pep_index) else [[] for _ in names]
+        return [(s[0] if s else None, p[0] if p else None) for s, p in zip(sanctions, peps)]
+
+    async def screen_parties_async(self, names: Sequence[str]) -> List[Tuple[Optional[SanctionMatch], Optional[SanctionMatch]]]:
+        """screen_parties on the screening executor (keeps the event loop free)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.screen_parties, list(names))
+
+    def match_identifiers(self, values: Sequence[str]) -> List[List[IdentifierMatch]]:
+        """Exact identifier screening (accounts, IBANs, wallets): listed parties per value."""
+        self.maybe_refresh()
+        return self.identifiers.lookup_many(values)
+
+    def stats(self) -> dict:
+        index = self.index
+        return {
+            "list_version": index.version,
+            "parties": index.party_count,
+            "aliases": len(index),
+            "identifiers": len(self.identifiers),
+            "peps": len(self.pep_index),
+            "threshold": self.threshold,
+            "snapshot": self.snapshot_state[0] if self.snapshot_state else None,
+            "cache": self.cache.stats(),
+            "batching": self.batcher.stats(),
+        }
+
+    def best_scores(self, names: List[str], floor: float = 0.0) -> np.ndarray:
+        """
+        Best score of each name against the whole index (0.0 below `floor`); used for tuning.
+        A higher floor lets the index block candidates instead of scoring every alias.
+        """
+        index = self.index
+        scores = [index.best_match(name, floor) for name in names]
+        return np.fromiter((m.score if m else 0.0 for m in scores), dtype=np.float64, count=len(names))
+
 # Singleton Instance
-watchlist_service = WatchlistService()
\ No newline at end of file
+watchlist_service = WatchlistService()
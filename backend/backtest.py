@@ -0,0 +1,28 @@
+import argparse
+import json
+import logging
+from datetime import datetime
+from app.services.backtest_service import run_backtest
+
+# Replays historical transactions through the configured rules.
+#   python backtest.py --source db --workers 8 --out backtest_out
+#   python backtest.py --source export.csv --workers 4 --out backtest_out
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay historical transactions through the rule engine.")
+    parser.add_argument("--source", default="db", help="'db' for the transactions table, or a chronological CSV/NDJSON export")
+    parser.add_argument("--workers", type=int, default=4, help="Customer shards / worker processes")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Transactions evaluated per batch")
+    parser.add_argument("--out", default="backtest_out", help="Output directory")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="ISO start timestamp (db source only)")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None, help="ISO end timestamp (db source only)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    summary = run_backtest(args.source, args.out, args.workers, args.chunk_size, args.since, args.until)
+
+    print(f"--- BACKTEST: {summary['transactions']} transactions in {summary['elapsed_seconds']}s ---")
+    print(json.dumps({"rule_hits": summary["rule_hits"], "statuses": summary["statuses"]}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ from app.models.base import Base
 # IMPORTANT: Import models so they register with Base.metadata
 from app.models.customer import Customer
 from app.models.transaction import Transaction
+from app.models.screening_alert import ScreeningAlert
 
 async def init_db():
     print(f"Connecting to: {settings.DATABASE_URL}")
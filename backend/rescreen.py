@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import json
+import logging
+from app.core.config import settings
+from app.services.rescreen_service import RescreenJob
+from app.services.sanctions_index import load_list_file
+from app.services.sanctions_snapshot import pending_additions
+
+# Rescreens all customers and counterparties against parties newly added to the list.
+#   python rescreen.py --added additions.csv --checkpoint rescreen.json
+#   python rescreen.py --snapshot-deltas --checkpoint rescreen.json    (additions in SANCTIONS_SNAPSHOT_DIR)
+# Re-running the same command after an interruption resumes from the checkpoint.
+
+def main():
+    parser = argparse.ArgumentParser(description="Rescreen the portfolio against newly listed sanctioned parties.")
+    parser.add_argument("--added", action="append", default=[], help="List file with the added parties (CSV / OFAC / UN / EU XML)")
+    parser.add_argument("--snapshot-deltas", action="store_true", help="Use the additions recorded in the live snapshot's deltas")
+    parser.add_argument("--checkpoint", default="rescreen_checkpoint.json", help="Progress file used to resume")
+    parser.add_argument("--workers", type=int, default=settings.RESCREEN_WORKERS, help="Scoring processes")
+    parser.add_argument("--page-size", type=int, default=settings.RESCREEN_PAGE_SIZE, help="Names read per page")
+    parser.add_argument("--max-rate", type=float, default=settings.RESCREEN_MAX_NAMES_PER_SECOND, help="Names per second (0 = unthrottled)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    added = [record for path in args.added for record in load_list_file(path)]
+    if args.snapshot_deltas:
+        added.extend(pending_additions(settings.SANCTIONS_SNAPSHOT_DIR))
+    if not added:
+        parser.error("nothing to rescreen: pass --added and/or --snapshot-deltas")
+
+    job = RescreenJob(added, args.checkpoint, workers=args.workers, page_size=args.page_size, max_names_per_second=args.max_rate)
+    state = asyncio.run(job.run())
+    print(f"--- RESCREEN {job.version}: {state['screened']} names, {state['alerts']} alerts ---")
+    print(json.dumps(state, indent=2))
+
+if __name__ == "__main__":
+    main()
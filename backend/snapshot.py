@@ -0,0 +1,43 @@
+import argparse
+import csv
+import logging
+from app.services.identifier_index import IdentifierIndex, load_identifier_file
+from app.services.sanctions_index import SanctionsIndex, load_list_file
+from app.services.sanctions_snapshot import compact_snapshot, current_version, publish_delta, publish_snapshot
+
+# Compiles sanctions lists into the memory-mapped snapshot every API worker serves from.
+#   python snapshot.py build --root /srv/sanctions sdn.xml un.xml eu.xml
+#   python snapshot.py delta --root /srv/sanctions --add additions.csv --remove removals.csv
+#   python snapshot.py compact --root /srv/sanctions
+
+def _removals(path: str):
+    # CSV with `source` and `uid` columns
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        return [(row["source"], row["uid"]) for row in csv.DictReader(f)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and update the sanctions screening snapshot.")
+    parser.add_argument("command", choices=["build", "delta", "compact"])
+    parser.add_argument("files", nargs="*", help="List files (CSV / OFAC / UN / EU XML) for 'build'")
+    parser.add_argument("--root", required=True, help="Snapshot directory (SANCTIONS_SNAPSHOT_DIR)")
+    parser.add_argument("--add", action="append", default=[], help="List file of parties to add or replace ('delta')")
+    parser.add_argument("--remove", action="append", default=[], help="CSV of source,uid to remove ('delta')")
+    args = parser.parse_intermixed_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "build":
+        identifiers = IdentifierIndex(record for path in args.files for record in load_identifier_file(path))
+        version = publish_snapshot(SanctionsIndex.from_files(args.files), args.root, identifiers)
+        print(f"--- SNAPSHOT v{version} is live ---")
+    elif args.command == "delta":
+        add = [record for path in args.add for record in load_list_file(path)]
+        remove = [key for path in args.remove for key in _removals(path)]
+        identifiers = {(e.source, e.uid): values for path in args.add for e, values in load_identifier_file(path)}
+        name = publish_delta(args.root, add, remove, identifiers)
+        print(f"--- DELTA {name} on {current_version(args.root)}: +{len(add)} / -{len(remove)} ---")
+    else:
+        version = compact_snapshot(args.root)
+        print(f"--- SNAPSHOT v{version} is live (deltas folded in) ---")
+
+if __name__ == "__main__":
+    main()
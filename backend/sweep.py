@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import csv
+import json
+import logging
+from datetime import datetime
+from app.rules.registry import rule_registry
+from app.services.sweep_service import ThresholdSweep, load_history
+
+# Evaluates a grid of rule thresholds over history in one pass.
+#   python sweep.py --source export.csv --grid grid.json --out sweep.csv
+# grid.json: {"structuring": {"LOWER_BOUND": [8000, 9000]}, "velocity": {"MAX_TRANSACTIONS": [3, 5]},
+#             "watchlist": {"threshold": [80, 90]}, "ALERT_THRESHOLD_SCORE": [60, 80]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep rule thresholds over historical transactions.")
+    parser.add_argument("--source", default="db", help="'db' for the transactions table, or a chronological CSV/NDJSON export")
+    parser.add_argument("--grid", required=True, help="JSON file with the parameter grid")
+    parser.add_argument("--out", default="sweep.csv", help="CSV with one row per parameter combination")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="ISO start timestamp (db source only)")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None, help="ISO end timestamp (db source only)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.grid, "r") as f:
+        grid = json.load(f)
+
+    batch = asyncio.run(load_history(args.source, args.since, args.until))
+    rows = ThresholdSweep(batch, grid, configured=rule_registry.engine.rules).run()
+
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"--- SWEEP: {len(batch)} transactions x {len(rows)} combinations -> {args.out} ---")
+
+if __name__ == "__main__":
+    main()
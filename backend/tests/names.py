@@ -0,0 +1,23 @@
+import random
+
+SYLLABLES = ["al", "ka", "mir", "ov", "an", "dra", "go", "esc", "bar", "lee", "son", "ham", "ed", "ru", "zh", "ng", "ia"]
+
+def random_name(rng: random.Random) -> str:
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))).title() for _ in range(rng.randint(1, 4))
+    )
+
+def perturb(rng: random.Random, name: str) -> str:
+    chars = list(name)
+    for _ in range(rng.randint(0, 3)):
+        i = rng.randrange(len(chars))
+        op = rng.choice(("drop", "swap", "insert"))
+        if op == "drop" and len(chars) > 1:
+            del chars[i]
+        elif op == "swap":
+            chars[i] = rng.choice("aeiouxyz ")
+        else:
+            chars.insert(i, rng.choice("aeiou"))
+    tokens = "".join(chars).split()
+    rng.shuffle(tokens)
+    return " ".join(tokens).upper() if rng.random() < 0.3 else " ".join(tokens)
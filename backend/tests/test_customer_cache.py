@@ -0,0 +1,61 @@
+import time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.models.base import Base
+from app.models.customer import Customer, RiskLevel
+from app.models.transaction import Transaction
+from app.services.customer_cache import CustomerContextCache, customer_context_cache
+
+class CountingSession:
+    """Awaitable facade over a synchronous SQLite session, counting statements."""
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.statements = 0
+
+    async def execute(self, statement, params=None):
+        self.statements += 1
+        return self.session.execute(statement, params)
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Customer.__table__, Transaction.__table__])
+    with Session(engine) as session:
+        session.add_all([
+            Customer(id=1, full_name="Jane Example", email="a@example.com", jurisdiction="DE"),
+            Customer(id=2, full_name="Max Muster", email="b@example.com", risk_level=RiskLevel.HIGH, is_pep=True),
+        ])
+        session.commit()
+        customer_context_cache.clear()
+        yield CountingSession(session)
+        customer_context_cache.clear()
+    engine.dispose()
+
+@pytest.mark.asyncio
+async def test_contexts_are_read_once_and_unknown_ids_are_not_cached(db):
+    first = await customer_context_cache.get_many(db, [1, 2, 2, 99])
+    assert sorted(first) == [1, 2] and db.statements == 1
+    assert first[2].risk_level == "high" and first[2].is_pep and first[1].jurisdiction == "DE"
+
+    again = await customer_context_cache.get_many(db, [1, 2])
+    assert again == first and db.statements == 1
+    # A customer created later must not be hidden by a cached miss
+    assert await customer_context_cache.get(db, 99) is None
+    assert db.statements == 2
+
+@pytest.mark.asyncio
+async def test_orm_updates_evict_and_the_ttl_bounds_staleness(db):
+    assert (await customer_context_cache.get(db, 1)).risk_level == "low"
+    customer = db.session.get(Customer, 1)
+    customer.risk_level = RiskLevel.CRITICAL
+    db.session.commit()
+    assert (await customer_context_cache.get(db, 1)).risk_level == "critical"
+    assert db.statements == 2
+
+    short = CustomerContextCache(max_size=10, ttl_seconds=0.05)
+    await short.get(db, 2)
+    time.sleep(0.06)
+    await short.get(db, 2)
+    assert db.statements == 4
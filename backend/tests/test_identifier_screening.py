@@ -0,0 +1,84 @@
+import random
+import string
+import pytest
+from types import SimpleNamespace
+from app.core.config import settings
+from app.rules.batch import TransactionBatch
+from app.rules.identifier import IdentifierRule
+from app.services.identifier_index import IdentifierIndex, load_identifier_file, normalize_identifier
+from app.services.sanctions_index import SanctionEntry, SanctionsIndex
+from app.services.sanctions_snapshot import publish_delta, publish_snapshot
+from app.services.watchlist_service import WatchlistService, watchlist_service
+
+def test_identifier_normalization():
+    assert normalize_identifier(" de89 3704-0044 0532 0130 00 ") == "DE89370400440532013000"
+    assert normalize_identifier("0x7F367cC41522cE07553e823bf3be79A889DEbe1B") == "0x7f367cc41522ce07553e823bf3be79a889debe1b"
+    assert normalize_identifier("BC1QXY2KGDYGJRSQTZQ2N0YRF2493P83KKFJHX0WLH") == "bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh"
+    # base58 addresses are case-sensitive
+    assert normalize_identifier("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa") != normalize_identifier("1a1zp1ep5qgefi2dmptftl5slmv7divfna")
+
+def test_index_finds_every_listed_identifier_and_nothing_else():
+    rng = random.Random(19)
+    listed = ["".join(rng.choice(string.ascii_letters + string.digits) for _ in range(34)) for _ in range(5000)]
+    index = IdentifierIndex((SanctionEntry(str(i), f"Party {i}", "ofac"), [value]) for i, value in enumerate(listed))
+    others = ["".join(rng.choice(string.ascii_letters + string.digits) for _ in range(34)) for _ in range(5000)]
+
+    results = index.lookup_many(listed[:500] + others)
+    assert all(r and r[0].entry.uid == str(i) for i, r in enumerate(results[:500]))
+    assert not any(results[500:])
+    assert index.lookup("") == [] and IdentifierIndex().lookup("x") == []
+
+def test_identifiers_load_from_lists_and_snapshots(tmp_path, monkeypatch):
+    listing = tmp_path / "internal.csv"
+    listing.write_text("uid,name,identifiers\n1,Ivan Drago,DE89 3704 0044 0532 0130 00;0xABC123\n2,Pablo Escobar,\n")
+    ofac = tmp_path / "sdn.xml"
+    ofac.write_text(
+        "<sdnList><sdnEntry><uid>306</uid><lastName>LAZARUS</lastName><idList><id><idType>Digital Currency Address - ETH</idType>"
+        "<idNumber>0x098B716B8Aaf21512996dC57EB0615e2383E2f96</idNumber></id>"
+        # Personal documents and attributes are not payment identifiers
+        "<id><idType>Passport</idType><idNumber>12345678</idNumber></id>"
+        "<id><idType>National ID No.</idType><idNumber>870101-1234567</idNumber></id>"
+        "<id><idType>Gender</idType><idNumber>Male</idNumber></id></idList></sdnEntry></sdnList>"
+    )
+    eu = tmp_path / "eu.xml"
+    eu.write_text(
+        '<export><sanctionEntity logicalId="77"><nameAlias wholeName="Example Trading LLC"/>'
+        '<identification identificationTypeCode="passport" number="12345678"/>'
+        '<identification identificationTypeCode="id" number="AB123456"/>'
+        '<identification identificationTypeCode="regnumber" number="1027700000000"/></sanctionEntity></export>'
+    )
+    assert load_identifier_file(str(eu)) == []
+    records = load_identifier_file(str(listing)) + load_identifier_file(str(ofac))
+    assert [(e.uid, values) for e, values in records] == [
+        ("1", ["DE89 3704 0044 0532 0130 00", "0xABC123"]), ("306", ["0x098B716B8Aaf21512996dC57EB0615e2383E2f96"]),
+    ]
+
+    root = str(tmp_path / "snapshot")
+    publish_snapshot(SanctionsIndex.from_files([str(listing)]), root, IdentifierIndex(records))
+    monkeypatch.setattr(settings, "SANCTIONS_SNAPSHOT_DIR", root)
+    monkeypatch.setattr(settings, "SANCTIONS_SNAPSHOT_POLL_SECONDS", 0.0)
+    service = WatchlistService()
+    service.refresh_snapshot()
+    hits = service.match_identifiers(["DE89370400440532013000", "0x098b716b8aaf21512996dc57eb0615e2383e2f96", "GB00", "1234-5678"])
+    assert [[m.entry.uid for m in h] for h in hits] == [["1"], ["306"], [], []]
+
+    # Delta: party 1 is re-listed with a new wallet only; party 306 is delisted
+    publish_delta(root, add=[(SanctionEntry("1", "Ivan Drago", "internal"), ["Ivan Drago"])], remove=[("sdn", "306")],
+                  identifiers={("internal", "1"): ["TXYZ1234"]})
+    service.refresh_snapshot()
+    hits = service.match_identifiers(["DE89370400440532013000", "TXYZ1234", "0x098b716b8aaf21512996dc57eb0615e2383e2f96"])
+    assert [[m.entry.uid for m in h] for h in hits] == [[], ["1"], []]
+
+@pytest.mark.asyncio
+async def test_identifier_rule_single_and_batch_agree(monkeypatch):
+    monkeypatch.setattr(watchlist_service, "identifiers", IdentifierIndex([(SanctionEntry("9", "Lazarus Group", "ofac"), ["0xABC"])]))
+    rows = [
+        SimpleNamespace(amount=10.0, customer_id=1, counterparty_account="0xabc"),
+        SimpleNamespace(amount=10.0, customer_id=2, counterparty_account="GB29NWBK60161331926819"),
+        SimpleNamespace(amount=10.0, customer_id=3, counterparty_account=None),
+    ]
+    rule = IdentifierRule()
+    single = [await rule.check(row) for row in rows]
+    assert [r.triggered for r in single] == [True, False, False] and "Lazarus Group" in single[0].reason
+    batch = await rule.check_batch(TransactionBatch(rows))
+    assert batch.triggered.tolist() == [True, False, False] and batch.reasons[0] == single[0].reason
@@ -0,0 +1,165 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.schemas.transaction import TransactionBatchItem, TransactionCreate
+from app.services.ingestion_queue import IngestionQueue, ingestion_queue
+
+def record(i: int) -> dict:
+    return {"customer_id": 1, "amount": 10.0 + i, "currency": "USD", "transaction_type": "PAYMENT",
+            "counterparty_name": "Utility Co", "counterparty_account": f"ACC{i}"}
+
+async def fake_process(items, uuids):
+    await asyncio.sleep(0.001)
+    return [TransactionBatchItem(index=k, status="FLAGGED" if t.amount > 15 else "COMPLETED", id=100 + k, transaction_uuid=u)
+            for k, (t, u) in enumerate(zip(items, uuids))]
+
+@pytest.mark.asyncio
+async def test_queue_accepts_immediately_and_decides_in_micro_batches():
+    queue = IngestionQueue(fake_process, workers=2, max_batch_size=4, max_wait_ms=5, max_pending=100)
+    accepted = [queue.submit(TransactionCreate(**record(i))) for i in range(10)]
+    assert {a["status"] for a in accepted} == {"QUEUED"}
+    assert queue.stats()["queue_depth"] == 10
+
+    await queue.drain(timeout=5)
+    decisions = [queue.status(a["transaction_uuid"]) for a in accepted]
+    assert [d["status"] for d in decisions] == ["COMPLETED"] * 6 + ["FLAGGED"] * 4
+    assert all(d["transaction_uuid"] == a["transaction_uuid"] for d, a in zip(decisions, accepted))
+
+    stats = queue.stats()
+    assert stats["queue_depth"] == stats["in_flight"] == 0
+    assert stats["largest_batch"] == 4 and stats["batches"] >= 3
+    assert stats["lag_ms"]["max"] >= stats["lag_ms"]["avg"] > 0
+    await queue.shutdown()
+
+@pytest.mark.asyncio
+async def test_queue_refuses_when_full_and_dead_letters_failed_batches(tmp_path):
+    calls = []
+    async def failing(items, uuids):
+        calls.append(len(items))
+        raise RuntimeError("database unavailable")
+
+    path = tmp_path / "dead_letter.jsonl"
+    queue = IngestionQueue(failing, workers=1, max_batch_size=10, max_wait_ms=1, max_pending=2,
+                           retries=2, retry_backoff_ms=1, dead_letter_path=str(path))
+    first = queue.submit(TransactionCreate(**record(0)))
+    queue.submit(TransactionCreate(**record(1)))
+    with pytest.raises(asyncio.QueueFull):
+        queue.submit(TransactionCreate(**record(2)))
+
+    await queue.drain(timeout=5)
+    assert calls == [2, 2, 2]  # the first attempt and two retries
+    assert queue.status(first["transaction_uuid"])["status"] == "ERROR"
+    stats = queue.stats()
+    assert stats["failed"] == 2 and stats["retried"] == 4 and stats["dead_lettered"] == 2
+
+    # Persisted: still answered once the in-memory decision is gone, and replayable under the same UUID
+    queue.decisions.clear()
+    assert queue.status(first["transaction_uuid"])["error"] == "database unavailable"
+    queue.process = fake_process
+    assert await queue.requeue_dead_letters() == 2
+    await queue.drain(timeout=5)
+    assert queue.status(first["transaction_uuid"])["status"] == "COMPLETED" and not path.exists()
+    await queue.shutdown()
+
+@pytest.mark.asyncio
+async def test_one_customer_is_decided_by_one_worker_in_order_and_retries_keep_it(tmp_path):
+    seen, failures = {}, [1]
+    async def flaky(items, uuids):
+        if failures:
+            failures.pop()
+            raise RuntimeError("connection reset")
+        for t in items:
+            seen.setdefault(t.customer_id, []).append((asyncio.current_task(), t.amount))
+        return await fake_process(items, uuids)
+
+    queue = IngestionQueue(flaky, workers=4, max_batch_size=3, max_wait_ms=1, max_pending=100,
+                           retries=1, retry_backoff_ms=1, dead_letter_path=str(tmp_path / "dead_letter.jsonl"))
+    for i in range(30):
+        queue.submit(TransactionCreate(**dict(record(i), customer_id=i % 5)))
+    await queue.drain(timeout=5)
+
+    for customer_id, decided in seen.items():
+        assert len({task for task, _ in decided}) == 1
+        assert [amount for _, amount in decided] == [10.0 + i for i in range(customer_id, 30, 5)]
+    assert queue.stats()["failed"] == 0 and queue.stats()["retried"] > 0
+    await queue.shutdown()
+
+def test_async_endpoint_returns_202_and_serves_the_decision(monkeypatch):
+    monkeypatch.setattr(ingestion_queue, "process", fake_process)
+    with TestClient(app) as client:
+        assert client.post("/api/v1/transactions/async", json=record(0)).status_code == 401
+
+        token = client.post("/token", data={"username": "nayan", "password": "secret"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        response = client.post("/api/v1/transactions/async", json=record(9), headers=headers)
+        assert response.status_code == 202 and response.json()["status"] == "QUEUED"
+
+        transaction_uuid = response.json()["transaction_uuid"]
+        for _ in range(100):
+            status = client.get(f"/api/v1/transactions/async/{transaction_uuid}", headers=headers).json()
+            if status["status"] not in ("QUEUED", "PROCESSING"):
+                break
+            time.sleep(0.01)
+        assert status["status"] == "FLAGGED"
+        assert client.get("/api/v1/transactions/queue/stats").json()["accepted"] >= 1
+
+@pytest.mark.asyncio
+async def test_shutdown_dead_letters_batches_still_in_flight(tmp_path):
+    started = asyncio.Event()
+    async def stuck(items, uuids):
+        started.set()
+        await asyncio.Event().wait()
+
+    path = tmp_path / "dead_letter.jsonl"
+    queue = IngestionQueue(stuck, workers=1, max_batch_size=2, max_wait_ms=1, max_pending=100,
+                           retries=0, dead_letter_path=str(path))
+    accepted = [queue.submit(TransactionCreate(**record(i))) for i in range(3)]
+    await asyncio.wait_for(started.wait(), 5)
+    await queue.shutdown(timeout=0.05)
+
+    # Both the batch taken off the queue and the record behind it are kept, none stays PROCESSING
+    assert not queue.pending and queue.stats()["in_flight"] == 0
+    assert [queue.status(a["transaction_uuid"])["status"] for a in accepted] == ["ERROR"] * 3
+    assert {entry["transaction_uuid"] for entry in queue.dead_letters.records()} == {a["transaction_uuid"] for a in accepted}
+
+@pytest.mark.asyncio
+async def test_requeue_keeps_what_the_queue_has_no_room_for(tmp_path):
+    async def failing(items, uuids):
+        raise RuntimeError("database unavailable")
+
+    path = tmp_path / "dead_letter.jsonl"
+    queue = IngestionQueue(failing, workers=1, max_batch_size=10, max_wait_ms=1, max_pending=3,
+                           retries=0, dead_letter_path=str(path))
+    accepted = [queue.submit(TransactionCreate(**record(i))) for i in range(3)]
+    await queue.drain(timeout=5)
+    assert len(queue.dead_letters) == 3
+
+    # Room for two: the third stays on file, with its original error
+    queue.process, queue.max_pending = fake_process, 2
+    assert await queue.requeue_dead_letters() == 2
+    assert await queue.requeue_dead_letters() == 0
+    assert queue.status(accepted[2]["transaction_uuid"])["error"] == "database unavailable"
+
+    # Room runs out while the store is being read: the remainder is written back, not lost
+    await queue.drain(timeout=5)
+    queue.max_pending = 1
+    queue.submit(TransactionCreate(**record(3)))
+    queue.max_pending = 2
+    read = queue.dead_letters.take
+    def take_then_shrink(limit):
+        entries = read(limit)
+        queue.max_pending = 1
+        return entries
+    queue.dead_letters.take = take_then_shrink
+    assert await queue.requeue_dead_letters() == 0
+    assert [entry["transaction_uuid"] for entry in queue.dead_letters.records()] == [accepted[2]["transaction_uuid"]]
+
+    del queue.dead_letters.take
+    queue.max_pending = 2
+    await queue.drain(timeout=5)
+    assert await queue.requeue_dead_letters() == 1
+    await queue.drain(timeout=5)
+    assert [queue.status(a["transaction_uuid"])["status"] for a in accepted] == ["COMPLETED"] * 3 and not path.exists()
+    await queue.shutdown()
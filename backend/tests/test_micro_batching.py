@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import pytest
+from types import SimpleNamespace
+from app.core.batching import MicroBatcher
+from app.rules.watchlist import WatchlistRule
+from app.services.watchlist_service import watchlist_service
+
+@pytest.mark.asyncio
+async def test_concurrent_submits_are_coalesced_off_the_event_loop():
+    calls = []
+
+    def handler(items):
+        calls.append((len(items), threading.current_thread() is threading.main_thread()))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(handler, max_batch_size=32, max_wait_ms=20, max_pending=8)
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(100)))
+
+    assert results == [i * 2 for i in range(100)]
+    assert sum(size for size, _ in calls) == 100
+    assert len(calls) < 100 and max(size for size, _ in calls) <= 32
+    assert not any(on_loop for _, on_loop in calls)
+
+@pytest.mark.asyncio
+async def test_handler_errors_reach_every_waiter():
+    def handler(items):
+        raise ValueError("scoring failed")
+
+    batcher = MicroBatcher(handler, max_wait_ms=5)
+    results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+@pytest.mark.asyncio
+async def test_watchlist_rule_screens_through_the_batcher():
+    watchlist_service.cache.clear()
+    before = watchlist_service.batcher.stats()["batches"]
+    rule = WatchlistRule()
+    names = ["Ivan Dragg", "Alice Corp", "Osama Bin Ladn", "Bob Ltd"] * 5
+    results = await asyncio.gather(*(rule.check(SimpleNamespace(counterparty_name=n)) for n in names))
+
+    assert [r.triggered for r in results] == [True, False, True, False] * 5
+    assert watchlist_service.batcher.stats()["batches"] - before < len(names)
@@ -0,0 +1,82 @@
+import pytest
+from types import SimpleNamespace
+from app.core.config import settings
+from app.models.customer import RiskLevel
+from app.schemas.customer import CustomerCreate
+from app.services import customer_service
+from app.services.sanctions_index import SanctionsIndex
+from app.services.watchlist_service import watchlist_service
+
+class RecordingSession:
+    """Just enough of AsyncSession for create_customer and create_customers."""
+
+    def __init__(self):
+        self.added = []
+        self.commits = 0
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def refresh(self, obj):
+        obj.id = len(self.added)
+
+    def add_all(self, objs):
+        self.added.extend(objs)
+
+    async def flush(self):
+        for i, obj in enumerate(self.added, start=1):
+            obj.id = i
+
+    async def execute(self, statement):
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: list(self.added)))
+
+    async def rollback(self):
+        pass
+
+def customer(name: str) -> CustomerCreate:
+    return CustomerCreate(full_name=name, email="kyc@example.com", phone_number="+4915112345678", nationality="DE", jurisdiction="DE")
+
+@pytest.fixture
+def pep_list(tmp_path, monkeypatch):
+    listing = tmp_path / "peps.csv"
+    listing.write_text("uid,name,aliases\n1,Olaf Scholz,\n2,Angela Merkel,Angela Dorothea Merkel\n")
+    # Restored after the test
+    monkeypatch.setattr(watchlist_service, "pep_index", watchlist_service.pep_index)
+    monkeypatch.setattr(watchlist_service, "pep_paths", watchlist_service.pep_paths)
+    watchlist_service.load_peps([str(listing)])
+
+@pytest.mark.asyncio
+async def test_onboarding_sets_pep_flag_and_risk_from_screening(pep_list):
+    db = RecordingSession()
+    created = await customer_service.create_customer(db, customer("Merkel, Angela"))
+    assert created.is_pep and created.risk_level == RiskLevel.HIGH and created.risk_score == customer_service.PEP_RISK_SCORE
+
+    sanctioned = await customer_service.create_customer(db, customer("Ivan Dragg"))
+    assert not sanctioned.is_pep and sanctioned.risk_level == RiskLevel.CRITICAL and sanctioned.risk_score == 100.0
+
+    clean = await customer_service.create_customer(db, customer("Jane Example"))
+    assert (clean.is_pep, clean.risk_level, clean.risk_score, clean.kyc_status) == (False, RiskLevel.LOW, 0.0, "PENDING")
+
+@pytest.mark.asyncio
+async def test_onboarding_loads_the_configured_lists_itself(tmp_path, monkeypatch):
+    # Nothing loaded yet (e.g. the watchlist rule is disabled): onboarding must not screen against empty lists
+    listing = tmp_path / "peps.csv"
+    listing.write_text("uid,name,aliases\n1,Olaf Scholz,\n")
+    monkeypatch.setattr(settings, "PEP_LIST_PATHS", [str(listing)])
+    monkeypatch.setattr(watchlist_service, "pep_index", SanctionsIndex([]))
+    monkeypatch.setattr(watchlist_service, "pep_paths", [])
+
+    db = RecordingSession()
+    assert (await customer_service.create_customer(db, customer("Olaf Scholz"))).is_pep
+    monkeypatch.setattr(watchlist_service, "pep_index", SanctionsIndex([]))
+    monkeypatch.setattr(watchlist_service, "pep_paths", [])
+    assert [c.is_pep for c in await customer_service.create_customers(RecordingSession(), [customer("Olaf Scholz")])] == [True]
+
+def test_bulk_screening_matches_one_at_a_time(pep_list):
+    names = ["Olaf Scholz", "Angela D. Merkel", "Pablo Escobarr", "Jane Example", "Olaf Scholz"]
+    bulk = watchlist_service.screen_parties(names)
+    assert bulk == [watchlist_service.screen_parties([name])[0] for name in names]
+    assert [(s is not None, p is not None) for s, p in bulk] == [(False, True), (False, True), (True, False), (False, False), (False, True)]
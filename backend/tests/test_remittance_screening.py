@@ -0,0 +1,65 @@
+import asyncio
+import random
+import pytest
+from app.core.automaton import AhoCorasick
+from app.rules.batch import TransactionBatch
+from app.rules.remittance import RemittanceTextRule
+from app.services.sanctions_index import SanctionEntry, SanctionsIndex
+from app.services.text_screening import TextScreener, text_screening_service
+from app.services.watchlist_service import watchlist_service
+from types import SimpleNamespace
+
+def test_automaton_finds_every_occurrence_in_one_pass():
+    rng = random.Random(18)
+    patterns = sorted({"".join(rng.choice("abc") for _ in range(rng.randint(1, 5))) for _ in range(60)})
+    automaton = AhoCorasick(patterns)
+    for _ in range(50):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 40)))
+        expected = sorted(
+            (start + len(p), i) for i, p in enumerate(patterns) for start in range(len(text)) if text.startswith(p, start)
+        )
+        assert sorted(automaton.iter_matches(text)) == expected
+
+def test_screener_matches_listed_names_and_keywords_as_whole_words():
+    index = SanctionsIndex([
+        (SanctionEntry("1", "Ivan Drago", "ofac"), ["Ivan Drago"]),
+        (SanctionEntry("2", "OCEAN VOYAGER", "ofac"), ["Ocean Voyager", "M/V Ocean Voyager"]),
+        (SanctionEntry("3", "KPA", "eu"), ["KPA"]),
+    ])
+    screener = TextScreener(index, keywords=["hawala", "ship to ship transfer"])
+
+    hits = screener.scan("Freight: ship-to-ship transfer, vessel M/V OCEAN VOYAGER; ref Iván DRAGO")
+    assert {(h.kind, h.entry.uid if h.entry else h.pattern) for h in hits} == {
+        ("keyword", "ship to ship transfer"), ("sanction", "2"), ("sanction", "1"),
+    }
+    # Whole words only, and short aliases are not screened in free text
+    assert screener.scan("Invoice 42 for ivan dragonfly ltd, KPA ref") == []
+    assert screener.scan("") == []
+
+@pytest.mark.asyncio
+async def test_remittance_rule_single_and_batch_agree(monkeypatch):
+    rule = RemittanceTextRule()
+    rows = [
+        SimpleNamespace(amount=10.0, customer_id=1, notes="Invoice 1033 via hawala broker"),
+        SimpleNamespace(amount=10.0, customer_id=2, notes="Payment on behalf of Pablo Escobar"),
+        SimpleNamespace(amount=10.0, customer_id=3, notes=None),
+        SimpleNamespace(amount=10.0, customer_id=4, notes="Invoice 1033 via hawala broker"),
+    ]
+    single = [await rule.check(row) for row in rows]
+    assert [r.risk_score for r in single] == [RemittanceTextRule.KEYWORD_RISK_SCORE, 100.0, 0.0, RemittanceTextRule.KEYWORD_RISK_SCORE]
+    assert "Pablo Escobar" in single[1].reason
+
+    batch = await rule.check_batch(TransactionBatch(rows))
+    assert batch.risk_score.tolist() == [r.risk_score for r in single]
+    assert batch.reasons[1] == single[1].reason
+
+    # A new list version is compiled in the background; until then the previous automaton keeps scanning
+    before = text_screening_service.screener()
+    monkeypatch.setattr(watchlist_service, "index", SanctionsIndex.from_names(["Alice Corp"]))
+    assert (await rule.check(rows[1])).risk_score == 100.0
+    for _ in range(200):
+        if await text_screening_service.current() is not before:
+            break
+        await asyncio.sleep(0.01)
+    assert await text_screening_service.current() is not before
+    assert (await rule.check(rows[1])).risk_score == 0.0
@@ -0,0 +1,87 @@
+import pytest
+from app.services.rescreen_service import RescreenJob
+from app.services.sanctions_index import SanctionEntry
+
+CUSTOMERS = [(i, name) for i, name in enumerate(["Alice Corp", "Ivan Drago", "Jon Smith", "Maria Lopez", "Bob Ltd", "Oleg Petrov"], start=1)]
+COUNTERPARTIES = sorted({"ACME Supplies", "Oleg Petrov", "Smith Jon", "Utility Co", "Zeta Trading"})
+
+class MemoryRescreen(RescreenJob):
+    """Pages and alerts in memory instead of Postgres (same keyset contract)."""
+
+    def __init__(self, *args, fail_on_page=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.alerts = {}
+        self.pages = 0
+        self.fail_on_page = fail_on_page
+
+    async def fetch_page(self, phase, after):
+        rows = CUSTOMERS if phase == "customer" else [(name, name) for name in COUNTERPARTIES]
+        return [row for row in rows if after is None or row[0] > after][:self.page_size]
+
+    async def write_alerts(self, rows):
+        self.pages += 1
+        if self.pages == self.fail_on_page:
+            raise RuntimeError("connection lost")
+        for row in rows:
+            # Same uniqueness as uq_screening_alert_subject_party (ON CONFLICT DO NOTHING)
+            self.alerts.setdefault((row["subject_type"], row["subject_ref"], row["list_source"], row["list_uid"]), row)
+
+ADDED = [
+    (SanctionEntry("7", "Oleg Petrov", "ofac"), ["Oleg Petrov", "Oleg Petroff"]),
+    (SanctionEntry("8", "John Smith", "un"), ["John Smith"]),
+]
+
+@pytest.mark.asyncio
+async def test_rescreen_only_scores_added_parties_and_resumes(tmp_path):
+    checkpoint = str(tmp_path / "rescreen.json")
+    full = MemoryRescreen(ADDED, str(tmp_path / "full.json"), threshold=85, workers=1, page_size=2, max_names_per_second=0)
+    state = await full.run()
+    assert state["done"] and state["screened"] == len(CUSTOMERS) + len(COUNTERPARTIES)
+    # Ivan Drago is on the old list, not among the additions: no alert
+    assert set(full.alerts) == {
+        ("customer", "6", "ofac", "7"), ("customer", "3", "un", "8"),
+        ("counterparty", "Oleg Petrov", "ofac", "7"), ("counterparty", "Smith Jon", "un", "8"),
+    }
+
+    # Interrupted mid-way, then resumed from the last committed page
+    interrupted = MemoryRescreen(ADDED, checkpoint, threshold=85, workers=1, page_size=2, max_names_per_second=0, fail_on_page=3)
+    with pytest.raises(RuntimeError):
+        await interrupted.run()
+    resumed = MemoryRescreen(ADDED, checkpoint, threshold=85, workers=2, page_size=2, max_names_per_second=0)
+    resumed.alerts = dict(interrupted.alerts)
+    state = await resumed.run()
+    assert state["done"] and resumed.alerts.keys() == full.alerts.keys()
+    assert state["screened"] == len(CUSTOMERS) + len(COUNTERPARTIES)
+
+    # A finished job is not re-run; different additions start a fresh one
+    assert (await resumed.run())["screened"] == state["screened"]
+    other = MemoryRescreen(ADDED[:1], checkpoint, threshold=85, workers=1, page_size=10, max_names_per_second=0)
+    assert (await other.run())["alerts"] == 2
+
+@pytest.mark.asyncio
+async def test_large_alert_pages_stay_under_the_bind_parameter_limit(tmp_path, monkeypatch):
+    from sqlalchemy.dialects import postgresql
+    import app.db.base
+
+    class RecordingSession:
+        def __init__(self):
+            self.statements, self.commits = [], 0
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, *exc):
+            return False
+        async def execute(self, statement):
+            self.statements.append(statement.compile(dialect=postgresql.dialect()))
+        async def commit(self):
+            self.commits += 1
+
+    session = RecordingSession()
+    monkeypatch.setattr(app.db.base, "async_session_factory", lambda: session)
+    row = {"subject_type": "customer", "screened_name": "Oleg Petrov", "matched_name": "Oleg Petrov", "score": 100.0,
+           "list_uid": "7", "list_source": "ofac", "list_version": "v1", "status": "OPEN"}
+    rows = [dict(row, subject_ref=str(i)) for i in range(10_000)]
+
+    await RescreenJob(ADDED, str(tmp_path / "rescreen.json")).write_alerts(rows)
+    assert len(session.statements) > 1 and session.commits == 1
+    assert all(len(compiled.params) <= 32767 for compiled in session.statements)
+    assert sum(len(compiled.params) for compiled in session.statements) == 9 * len(rows)
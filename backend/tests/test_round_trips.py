@@ -0,0 +1,111 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from app.core.query_counter import stage, track_queries
+from app.main import app
+from app.models.base import Base
+from app.models.customer import Customer
+from app.models.transaction import Transaction
+from app.rules.registry import rule_registry
+from app.schemas.transaction import TransactionCreate
+from app.services import transaction_service
+from app.services.customer_cache import customer_context_cache
+from app.services.transaction_service import create_transaction
+from app.services.velocity_store import velocity_store
+
+class SyncSessionAdapter:
+    """Awaitable facade over a synchronous SQLite session (no async SQLite driver here)."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def execute(self, statement, params=None):
+        return self.session.execute(statement, params)
+
+    async def commit(self):
+        self.session.commit()
+
+    async def rollback(self):
+        self.session.rollback()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.session.close()
+
+@pytest.fixture
+def db(monkeypatch):
+    # As after startup: velocity windows come from the warmed in-memory store
+    monkeypatch.setattr(velocity_store, "is_warm", True)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Customer.__table__, Transaction.__table__])
+    # Timed rules that query the DB get sessions of their own
+    monkeypatch.setattr(transaction_service, "async_session_factory", lambda: SyncSessionAdapter(Session(engine)))
+    with Session(engine) as session:
+        session.add(Customer(id=1, full_name="Jane Example", email="a@example.com"))
+        session.commit()
+        customer_context_cache.clear()
+        yield SyncSessionAdapter(session)
+        customer_context_cache.clear()
+    engine.dispose()
+
+def payment(customer_id: int) -> TransactionCreate:
+    return TransactionCreate(customer_id=customer_id, amount=120.0, currency="USD", transaction_type="PAYMENT",
+                             counterparty_name="Utility Co", counterparty_account="DE89370400440532013000")
+
+@pytest.mark.asyncio
+async def test_create_transaction_costs_an_insert_and_a_commit(db):
+    # First transaction of the customer: one lookup fills the context cache
+    with track_queries(record=False) as stats:
+        first = await create_transaction(db, payment(1))
+    assert stats.stages["customers"] == {"statements": 1, "round_trips": 1}
+    assert customer_context_cache.peek(1).full_name == "Jane Example"
+
+    with track_queries(record=False) as stats:
+        transaction = await create_transaction(db, payment(1))
+
+    assert stats.stages["persist"] == {"statements": 1, "round_trips": 2}
+    assert stats.round_trips == 2 and set(stats.stages) == {"persist"}
+    stored = db.session.execute(select(Transaction.id, Transaction.transaction_uuid, Transaction.status).order_by(Transaction.id)).all()
+    assert [tuple(row) for row in stored] == [(t.id, t.transaction_uuid, "COMPLETED") for t in (first, transaction)]
+
+@pytest.mark.asyncio
+async def test_unknown_customer_is_rejected_before_any_rule_runs(db, monkeypatch):
+    async def must_not_run(*args, **kwargs):
+        raise AssertionError("rules evaluated for an unknown customer")
+    monkeypatch.setattr(rule_registry.engine, "evaluate", must_not_run)
+
+    with track_queries(record=False) as stats:
+        with pytest.raises(HTTPException) as error:
+            await create_transaction(db, payment(99))
+
+    assert error.value.status_code == 404
+    assert stats.round_trips == 1 and set(stats.stages) == {"customers"}
+    assert db.session.execute(select(Transaction.id)).first() is None
+
+@pytest.mark.asyncio
+async def test_cold_velocity_store_adds_the_window_queries(db, monkeypatch):
+    # Store disabled (or not warmed yet): the velocity windows are counted in the database
+    monkeypatch.setattr(velocity_store, "is_warm", False)
+    await create_transaction(db, payment(1))
+    with track_queries(record=False) as stats:
+        await create_transaction(db, payment(1))
+
+    assert stats.stages["rules"]["round_trips"] >= 1
+    assert stats.stages["persist"] == {"statements": 1, "round_trips": 2}
+    assert db.session.execute(select(Transaction.id)).all()[1:]
+
+def test_stage_counters_and_response_headers(db):
+    with track_queries(record=False) as stats:
+        with stage("lookup"):
+            db.session.execute(select(Customer.id)).all()
+        db.session.execute(select(Transaction.id)).all()
+    assert stats.statements == 2 and stats.stages == {"lookup": {"statements": 1, "round_trips": 1}}
+
+    client = TestClient(app)
+    response = client.get("/api/v1/transactions/queue/stats")
+    assert response.headers["X-DB-Round-Trips"] == "0"
+    assert client.get("/metrics/db").json()["requests"] >= 1
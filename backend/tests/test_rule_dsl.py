@@ -0,0 +1,84 @@
+import pytest
+from types import SimpleNamespace
+from app.rules.dsl import DeclarativeRule, load_declarative_rules
+from app.rules.batch import TransactionBatch
+from app.services.velocity_store import VelocityStore
+
+SPEC = {
+    "name": "High-Risk Jurisdiction Cash Deposit",
+    "risk_score": 70,
+    "reason": "Cash deposit of {amount} from {nationality}",
+    "when": [
+        {"field": "transaction_type", "op": "in", "value": ["DEPOSIT"]},
+        {"field": "nationality", "op": "in", "value": ["KP", "IR"]},
+        {"field": "amount", "op": ">=", "value": 3000},
+    ],
+}
+
+def txn(**fields):
+    base = dict(customer_id=1, amount=5000.0, currency="USD", transaction_type="DEPOSIT", nationality="KP", timestamp=1000.0)
+    base.update(fields)
+    return SimpleNamespace(**base)
+
+@pytest.mark.asyncio
+async def test_compiled_predicate_and_shared_clear_result():
+    rule = DeclarativeRule(SPEC)
+
+    hit = await rule.check(txn())
+    assert hit.triggered and hit.risk_score == 70.0
+    assert hit.reason == "Cash deposit of 5000.0 from KP"
+
+    # Non-triggered results are one pre-built object, not a new allocation per call
+    miss_1 = await rule.check(txn(nationality="US"))
+    miss_2 = await rule.check(txn(nationality=None))
+    assert miss_1 is miss_2 and not miss_1.triggered
+
+@pytest.mark.asyncio
+async def test_vectorized_form_agrees_with_closure():
+    spec = dict(SPEC, when=SPEC["when"] + [{"window": "1h", "metric": "count", "op": ">=", "value": 2}])
+    rule = DeclarativeRule(spec)
+    store = VelocityStore(windows_seconds=[3600], buckets_per_window=12, max_customers=10)
+    store.is_warm = True
+
+    rows = [txn(), txn(amount=100.0), txn(customer_id=2), txn(timestamp=1100.0), txn(nationality="US")]
+    result = await rule.check_batch(TransactionBatch(rows), {"velocity_store": store})
+
+    # Only row 3 qualifies AND has earlier activity of the same customer inside the hour
+    assert result.triggered.tolist() == [False, False, False, True, False]
+
+@pytest.mark.asyncio
+async def test_string_equality_agrees_between_single_and_batch_mode():
+    rule = DeclarativeRule({"name": "Large Withdrawal", "risk_score": 40, "when": [
+        {"field": "transaction_type", "op": "==", "value": "WITHDRAWAL"},
+        {"field": "nationality", "op": "!=", "value": "DE"},
+        {"field": "amount", "op": "between", "value": [20000, 1000000]},
+    ]})
+    rows = [
+        txn(transaction_type="WITHDRAWAL", amount=25000.0), txn(amount=25000.0),
+        txn(transaction_type="WITHDRAWAL", amount=25000.0, nationality="DE"),
+        txn(transaction_type="WITHDRAWAL", amount=100.0), txn(transaction_type=None, amount=25000.0),
+    ]
+    single = [(await rule.check(row)).triggered for row in rows]
+    batch = await rule.check_batch(TransactionBatch(rows), {})
+    assert batch.triggered.tolist() == single == [True, False, False, False, False]
+
+def test_invalid_specs_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        DeclarativeRule({"name": "Bad", "risk_score": 10, "when": [{"field": "amount", "op": "~", "value": 1}]})
+    with pytest.raises(ValueError):
+        DeclarativeRule({"name": "Bad", "risk_score": 10, "when": [{"field": "__class__.x", "op": "==", "value": 1}]})
+    with pytest.raises(ValueError):
+        DeclarativeRule({"name": "Bad", "risk_score": 10, "when": [{"field": "currency", "op": ">", "value": "EUR"}]})
+    with pytest.raises(ValueError):
+        DeclarativeRule({"name": "Bad", "risk_score": 10, "when": [{"field": "transaction_type", "op": "in", "value": "DEPOSIT"}]})
+
+    path = tmp_path / "rules.json"
+    path.write_text('[{"name": "Off", "risk_score": 1, "enabled": false}, {"name": "On", "risk_score": 1}]')
+    assert [r.rule_name for r in load_declarative_rules(str(path))] == ["On"]
+
+def test_example_typologies_compile():
+    from pathlib import Path
+    import app.rules
+
+    path = Path(app.rules.__file__).parent / "typologies.example.json"
+    assert len(load_declarative_rules(str(path))) == 2
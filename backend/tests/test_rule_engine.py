@@ -0,0 +1,238 @@
+import asyncio
+import time
+import pytest
+from types import SimpleNamespace
+from app.rules.base import BaseRule, RuleResult
+from app.rules.engine import RuleEngine
+
+class SlowRule(BaseRule):
+    rule_name = "Slow Rule"
+
+    def __init__(self, delay: float, score: float = 50.0):
+        self.delay = delay
+        self.score = score
+
+    async def check(self, transaction, customer_context=None) -> RuleResult:
+        await asyncio.sleep(self.delay)
+        return RuleResult(rule_name=self.rule_name, triggered=True, risk_score=self.score, reason="slow")
+
+class CountingRule(BaseRule):
+    rule_name = "Counting Rule"
+
+    def __init__(self, name: str, score: float, cost_ms: float):
+        self.rule_name = name
+        self.max_risk_score = score
+        self.estimated_cost_ms = cost_ms
+        self.calls = 0
+
+    async def check(self, transaction, customer_context=None) -> RuleResult:
+        self.calls += 1
+        return RuleResult(rule_name=self.rule_name, triggered=True, risk_score=self.max_risk_score, reason=self.rule_name)
+
+class BrokenRule(BaseRule):
+    rule_name = "Broken Rule"
+
+    async def check(self, transaction, customer_context=None) -> RuleResult:
+        raise RuntimeError("boom")
+
+@pytest.mark.asyncio
+async def test_concurrent_rules_overlap():
+    """
+    Independent rules should cost the MAX latency, not the SUM.
+    """
+    engine = RuleEngine(concurrent=True, rule_timeout=1.0, short_circuit=False)
+    for _ in range(3):
+        engine.add_rule(SlowRule(0.1))
+
+    start = time.perf_counter()
+    results = await engine.evaluate(object())
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == 3
+    assert elapsed < 0.25
+
+@pytest.mark.asyncio
+async def test_rule_errors_and_timeouts_are_isolated():
+    """
+    A failing or stalled rule must not take down the rest of the evaluation.
+    Rules that can block fail closed: the payment is flagged for review, never passed.
+    """
+    engine = RuleEngine(concurrent=True, rule_timeout=0.05, short_circuit=False)
+    engine.add_rule(BrokenRule())
+    engine.add_rule(SlowRule(1.0))
+    engine.add_rule(SlowRule(0.0, score=75.0))
+
+    results = await engine.evaluate(object())
+
+    assert [(r.risk_score, r.errored) for r in results] == [(50.0, True), (50.0, True), (75.0, False)]
+    assert engine.calculate_total_risk(results) == 75.0
+
+    # Alone, a broken blocking rule still flags the payment; a broken low-risk rule only records why
+    engine = RuleEngine(concurrent=False, rule_timeout=0.05, short_circuit=False)
+    engine.add_rule(BrokenRule())
+    assert engine.calculate_total_risk(await engine.evaluate(object())) == 50.0
+    batch = await engine.evaluate_batch([SimpleNamespace(customer_id=1, amount=10.0)])
+    assert batch.total_risk.tolist() == [50.0] and "Manual review" in batch.reasons(0)[0]
+
+    low = BrokenRule()
+    low.max_risk_score = 40.0
+    engine = RuleEngine(concurrent=False, rule_timeout=0.05, short_circuit=False)
+    engine.add_rule(low)
+    results = await engine.evaluate(object())
+    assert [(r.risk_score, r.errored) for r in results] == [(0.0, True)] and "not applied" in results[0].reason
+    assert engine.calculate_total_risk(results) == 0.0
+
+class HistoryRule(SlowRule):
+    """Reads customer history: may query customer_context['db']."""
+    rule_name = "History Rule"
+
+    def history_windows(self):
+        return {"all": [600]}
+
+    async def check(self, transaction, customer_context=None) -> RuleResult:
+        self.sessions.append(customer_context["db"])
+        return await super().check(transaction, customer_context)
+
+class FakeSession:
+    def __init__(self):
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+@pytest.mark.asyncio
+async def test_rules_querying_the_session_are_never_cancelled_on_the_shared_one():
+    shared, own = FakeSession(), []
+    def session_factory():
+        own.append(FakeSession())
+        return own[-1]
+
+    slow = HistoryRule(1.0, score=60.0)
+    slow.max_risk_score, slow.sessions = 60.0, []
+    engine = RuleEngine(concurrent=True, rule_timeout=0.05, short_circuit=False)
+    engine.add_rule(slow)
+
+    # Timed on a session of its own, discarded with the timeout; the timeout shows in the result
+    results = await engine.evaluate(object(), customer_context={"db": shared, "session_factory": session_factory})
+    assert slow.sessions == own and own[0].closed and not shared.closed
+    assert results[0].errored and "timed out" in results[0].reason and results[0].risk_score == 0.0
+
+    # No session of its own to cancel: the rule runs to completion on the shared session
+    slow.delay, slow.sessions = 0.1, []
+    results = await engine.evaluate(object(), customer_context={"db": shared})
+    assert slow.sessions == [shared] and [(r.risk_score, r.errored) for r in results] == [(60.0, False)]
+
+@pytest.mark.asyncio
+async def test_registry_builds_once_and_hot_reloads():
+    """
+    The registry serves one shared engine; reload swaps it atomically.
+    """
+    from app.rules.registry import RuleRegistry
+
+    registry = RuleRegistry()
+    engine = registry.engine
+    assert registry.engine is engine
+    assert [type(r).__name__ for r in engine.rules] == ["StructuringRule", "VelocityRule", "WatchlistRule"]
+
+    new_engine = await registry.reload([
+        {"type": "structuring", "params": {"LOWER_BOUND": 5000.0}},
+        {"type": "velocity", "enabled": False},
+    ])
+    assert registry.engine is new_engine
+    assert len(new_engine.rules) == 1
+    assert new_engine.rules[0].LOWER_BOUND == 5000.0
+    # The old engine is untouched for evaluations that were already running
+    assert len(engine.rules) == 3
+
+    with pytest.raises(ValueError):
+        await registry.reload([{"type": "structuring", "params": {"NO_SUCH_THRESHOLD": 1}}])
+    assert registry.engine is new_engine
+
+@pytest.mark.asyncio
+async def test_short_circuit_skips_rules_that_cannot_change_the_outcome():
+    """
+    A cheap 100-score hit makes the expensive 60-score rule irrelevant; audit mode runs it anyway.
+    """
+    engine = RuleEngine(concurrent=False, rule_timeout=0, short_circuit=True)
+    expensive = CountingRule("Expensive", 60.0, cost_ms=5.0)
+    decisive = CountingRule("Decisive", 100.0, cost_ms=0.1)
+    engine.add_rule(expensive)
+    engine.add_rule(decisive)
+
+    assert engine.schedule() == [decisive, expensive]
+
+    results = await engine.evaluate(object())
+    assert [r.rule_name for r in results] == ["Decisive"]
+    assert expensive.calls == 0
+    assert engine.stats["Expensive"].skipped == 1
+
+    results = await engine.evaluate(object(), audit=True)
+    assert [r.rule_name for r in results] == ["Expensive", "Decisive"]
+    assert expensive.calls == 1
+
+@pytest.mark.asyncio
+async def test_evaluate_batch_matches_row_by_row_semantics():
+    """
+    Vectorized batch evaluation: thresholds as array ops, velocity counts earlier rows of the batch.
+    """
+    from types import SimpleNamespace
+    from app.rules.structuring import StructuringRule
+    from app.rules.velocity import VelocityRule
+    from app.services.velocity_store import VelocityStore
+
+    store = VelocityStore(windows_seconds=[300], buckets_per_window=10, max_customers=100)
+    store.is_warm = True
+    store.record(1, 100.0, 1000.0)
+
+    engine = RuleEngine()
+    engine.add_rule(StructuringRule())
+    engine.add_rule(VelocityRule(MAX_TRANSACTIONS=2))
+
+    rows = [
+        SimpleNamespace(customer_id=1, amount=9500.0, timestamp=1010.0),
+        SimpleNamespace(customer_id=2, amount=50.0, timestamp=1020.0),
+        SimpleNamespace(customer_id=1, amount=20.0, timestamp=1030.0),
+        SimpleNamespace(customer_id=1, amount=30.0, timestamp=5000.0),
+    ]
+    evaluation = await engine.evaluate_batch(rows, customer_context={"velocity_store": store})
+
+    assert evaluation.hit_counts() == {"Structuring Detection": 1, "Velocity/High Frequency Check": 1}
+    assert evaluation.total_risk.tolist() == [75.0, 0.0, 60.0, 0.0]
+    assert evaluation.reasons(2) == ["Velocity High: 2 prior transactions in last 5m."]
+    assert [r.rule_name for r in evaluation.results(0)] == ["Structuring Detection"]
+
+@pytest.mark.asyncio
+async def test_concurrent_short_circuit_starts_lazily_and_never_cancels():
+    """
+    Rules that finish without waiting decide the outcome before costlier ones start;
+    a rule already waiting on I/O (e.g. a COUNT on the shared session) is left to finish.
+    """
+    engine = RuleEngine(concurrent=True, rule_timeout=1.0, short_circuit=True)
+    decisive = CountingRule("Decisive", 100.0, cost_ms=0.1)
+    expensive = CountingRule("Expensive", 60.0, cost_ms=5.0)
+    engine.add_rule(expensive)
+    engine.add_rule(decisive)
+    assert [r.rule_name for r in await engine.evaluate(object())] == ["Decisive"]
+    assert expensive.calls == 0 and engine.stats["Expensive"].skipped == 1
+
+    class WaitingRule(SlowRule):
+        rule_name = "Waiting Rule"
+        max_risk_score = 60.0
+        estimated_cost_ms = 0.01
+        finished = False
+
+        async def check(self, transaction, customer_context=None) -> RuleResult:
+            result = await super().check(transaction, customer_context)
+            self.finished = True
+            return result
+
+    engine = RuleEngine(concurrent=True, rule_timeout=1.0, short_circuit=True)
+    waiting = WaitingRule(0.05, score=60.0)
+    engine.add_rule(waiting)
+    engine.add_rule(CountingRule("Decisive", 100.0, cost_ms=5.0))
+    assert engine.schedule()[0] is waiting
+    results = await engine.evaluate(object())
+    assert waiting.finished and sorted(r.risk_score for r in results) == [60.0, 100.0]
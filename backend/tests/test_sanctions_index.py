@@ -0,0 +1,84 @@
+import random
+import pytest
+from app.services.sanctions_index import SanctionsIndex, load_list_file, normalize_name
+from app.services.watchlist_service import WatchlistService
+from tests.names import perturb, random_name
+
+def test_normalization_handles_case_accents_order_and_punctuation():
+    assert normalize_name("  DRAGO,  Iván ") == normalize_name("ivan drago") == "drago ivan"
+    assert normalize_name("Al-Qaida") == "al qaida"
+
+def test_blocked_screening_has_the_recall_of_a_brute_force_scan():
+    rng = random.Random(11)
+    parties = [random_name(rng) for _ in range(3000)]
+    index = SanctionsIndex.from_names(parties)
+    queries = [perturb(rng, rng.choice(parties)) for _ in range(300)] + [random_name(rng) for _ in range(100)] + ["A", ""]
+
+    shortlisted = 0
+    for threshold in (80.0, 90.0):
+        for query in queries:
+            blocked = index.screen(query, threshold)
+            brute = index.screen(query, threshold, exhaustive=True)
+            assert [(m.entry, m.score) for m in blocked] == [(m.entry, m.score) for m in brute], query
+            shortlisted += len(index.candidates(normalize_name(query), threshold)) if query else 0
+    # Blocking actually blocks: far fewer aliases are scored than a full scan
+    assert shortlisted < 0.1 * len(index) * 2 * len(queries)
+
+def test_loads_csv_and_xml_lists(tmp_path):
+    csv_path = tmp_path / "internal.csv"
+    csv_path.write_text("uid,name,aliases\n7,Ivan Drago,Drago the Siberian; I. Drago\n")
+    ofac = tmp_path / "sdn.xml"
+    ofac.write_text(
+        '<sdnList xmlns="http://tempuri.org/sdnList.xsd"><sdnEntry><uid>306</uid><lastName>ESCOBAR</lastName>'
+        '<firstName>Pablo</firstName><akaList><aka><lastName>EL PATRON</lastName></aka></akaList></sdnEntry></sdnList>'
+    )
+    un = tmp_path / "consolidated.xml"
+    un.write_text(
+        "<CONSOLIDATED_LIST><INDIVIDUALS><INDIVIDUAL><DATAID>1</DATAID><FIRST_NAME>VLADIMIR</FIRST_NAME>"
+        "<SECOND_NAME>MAKAROV</SECOND_NAME><INDIVIDUAL_ALIAS><ALIAS_NAME>Volodya</ALIAS_NAME></INDIVIDUAL_ALIAS>"
+        "</INDIVIDUAL></INDIVIDUALS></CONSOLIDATED_LIST>"
+    )
+    eu = tmp_path / "eu.xml"
+    eu.write_text(
+        '<export><sanctionEntity logicalId="13"><nameAlias wholeName="North Korea State Bank"/>'
+        '<nameAlias wholeName="NKSB"/></sanctionEntity></export>'
+    )
+
+    assert load_list_file(str(csv_path))[0][1] == ["Ivan Drago", "Drago the Siberian", "I. Drago"]
+    service = WatchlistService()
+    service.load([str(csv_path), str(ofac), str(un), str(eu)])
+
+    assert len(service.index.entries) == 4
+    assert service.check_sanction("Ivan Dragg")[0]
+    assert service.check_sanction("pablo escobar")[1] == "Pablo ESCOBAR"
+    assert service.screen("El Patron")[0].entry.uid == "306"
+    assert service.screen("volodya")[0].entry.source == "consolidated"
+    assert service.screen("NKSB")[0].entry.uid == "13"
+    assert not service.check_sanction("Alice Corp")[0]
+
+def test_phonetic_channel_catches_transliteration_variants_at_the_same_threshold():
+    rng = random.Random(17)
+    parties = [random_name(rng) for _ in range(3000)] + ["Muhammad Ali Hassan", "Alexander Petrov", "Yevgeny Prigozhin"]
+    index = SanctionsIndex.from_names(parties)
+
+    for query, listed in (("Mohammed Ali Hasan", "Muhammad Ali Hassan"), ("Aleksandr Petrov", "Alexander Petrov"), ("Evgeniy Prigozhin", "Yevgeny Prigozhin")):
+        # Spelling alone scores below the threshold; the transliterated forms do not
+        assert all(m.entry.name != listed for m in index.screen(query, 90) if m.score < 90)
+        match = index.best_match(query, 90)
+        assert match and match.entry.name == listed, query
+        assert index.screen_many([query], 90)[0][0].entry.name == listed
+
+    # Exact key lookups: the channel adds a handful of candidates, not a scan
+    queries = [normalize_name(random_name(rng)) for _ in range(200)]
+    assert sum(len(index.phonetic_candidates(q)) for q in queries) < 0.05 * sum(len(index.candidates(q, 80)) for q in queries) + len(queries)
+
+def test_phonetic_channel_never_reports_the_transliterated_ratio():
+    index = SanctionsIndex.from_names(["Ali Hassan", "Ivan Drago", "Peter Mueller", "Khalid Meshaal"])
+    # Vowel folding makes these identical or near-identical sounds, but they are different names
+    assert index.best_match("Ola Hussein", 80) is None
+    assert index.best_match("Evan Dorgo", 80).score == pytest.approx(80.0)
+    assert index.best_match("Petra Miller", 80).score == pytest.approx(80.0)
+    # A genuine variant still matches, with a score below 100
+    match = index.best_match("Khaled Mashal", 85)
+    assert match.entry.name == "Khalid Meshaal" and 85 <= match.score < 100
+    assert index.screen_many(["Ola Hussein", "Khaled Mashal"], 85)[0] == []
@@ -0,0 +1,101 @@
+import json
+import random
+import threading
+import time
+import numpy as np
+import pytest
+import app.services.watchlist_service as watchlist_module
+from app.core.config import settings
+from app.services import sanctions_snapshot
+from app.services.sanctions_index import SanctionEntry, SanctionsIndex
+from app.services.sanctions_snapshot import compact_snapshot, open_index, open_snapshot, publish_delta, publish_snapshot
+from app.services.watchlist_service import WatchlistService
+from tests.names import perturb, random_name
+
+def test_memory_mapped_snapshot_screens_like_the_built_index(tmp_path):
+    rng = random.Random(15)
+    index = SanctionsIndex.from_names([random_name(rng) for _ in range(2000)] + ["José Müller-Ibáñez"])
+    version = publish_snapshot(index, str(tmp_path))
+    mapped = open_index(str(tmp_path / f"v{version}"))
+
+    assert isinstance(mapped.postings, np.memmap) and mapped.version == index.version
+    assert len(mapped) == len(index) and mapped.party_count == index.party_count
+    queries = [perturb(rng, index.aliases[rng.randrange(len(index))]) for _ in range(100)] + ["jose muller ibanez"]
+    for threshold in (80, 90):
+        assert mapped.screen_many(queries, threshold) == index.screen_many(queries, threshold)
+    assert mapped.best_match("Muller Ibanez Jose", 90).entry.name == "José Müller-Ibáñez"
+
+def test_deltas_and_new_versions_swap_in_while_screening(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    base = SanctionsIndex([
+        (SanctionEntry("1", "Ivan Drago", "ofac"), ["Ivan Drago", "I. Drago"]),
+        (SanctionEntry("2", "Pablo Escobar", "ofac"), ["Pablo Escobar"]),
+    ])
+    publish_snapshot(base, root)
+    monkeypatch.setattr(settings, "SANCTIONS_SNAPSHOT_DIR", root)
+    monkeypatch.setattr(settings, "SANCTIONS_SNAPSHOT_POLL_SECONDS", 3600.0)
+    service = WatchlistService()
+    assert service.refresh_snapshot() and not service.refresh_snapshot()
+    assert service.check_sanction("Pablo Escobarr")[0]
+    assert not service.check_sanction("Alice Corp")[0]
+
+    # A delta removes one party and adds another; the mapped base is reused as is
+    mapped = service.index.base
+    publish_delta(root, add=[(SanctionEntry("9", "Alice Corp", "eu"), ["Alice Corp", "Alice Corporation"])], remove=[("ofac", "2")])
+    service.refresh_snapshot()
+    assert service.check_sanction("alice corp")[0]
+    assert not service.check_sanction("Pablo Escobarr")[0]
+    assert service.index.base is mapped and service.index.version.startswith(base.version + "+")
+    assert service.stats()["parties"] == 2
+    assert [m.entry.uid for m in service.screen_many(["Ivan Drago", "Alice Corporation"])[0]] == ["1"]
+
+    # Replacing a base party: only the delta's version of it is returned
+    publish_delta(root, add=[(SanctionEntry("1", "Ivan Drago", "ofac"), ["Ivan Drago", "Ivan Dragovich"])])
+    service.refresh_snapshot()
+    assert [m.name for m in service.screen("Ivan Dragovich")] == ["Ivan Dragovich"]
+    assert len(service.screen("Ivan Drago")) == 1
+
+    # Compaction publishes a full version with the deltas folded in, swapped atomically
+    version = compact_snapshot(root)
+    service.refresh_snapshot()
+    assert service.check_sanction("Ivan Dragovich")[0] and service.version == version
+    assert service.index.base is not mapped and not service.index.overlay
+    assert open_snapshot(root).party_count == 2
+
+def test_polls_swap_versions_in_the_background(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    publish_snapshot(SanctionsIndex.from_names(["Pablo Escobar"]), root)
+    monkeypatch.setattr(settings, "SANCTIONS_SNAPSHOT_DIR", root)
+    monkeypatch.setattr(settings, "SANCTIONS_SNAPSHOT_POLL_SECONDS", 0.0)
+    service = WatchlistService()
+    service.refresh_snapshot()
+
+    # The screening that triggers the poll answers from the version it started with
+    publish_delta(root, add=[(SanctionEntry("9", "Alice Corp", "eu"), ["Alice Corp"])])
+    release = threading.Event()
+    opened = sanctions_snapshot.open_snapshot
+    monkeypatch.setattr(watchlist_module, "open_snapshot", lambda *args: release.wait(5) and opened(*args))
+    assert not service.check_sanction("Alice Corp")[0]
+    release.set()
+    deadline = time.monotonic() + 5
+    while service.snapshot_state[1] == () and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert service.check_sanction("Alice Corp")[0]
+
+def test_format_1_snapshots_still_open(tmp_path):
+    index = SanctionsIndex.from_names(["Yevgeny Prigozhin", "Pablo Escobar"])
+    directory = tmp_path / f"v{publish_snapshot(index, str(tmp_path))}"
+    # As written before the phonetic channel: no format key, no translit table or phonetic arrays
+    meta = json.loads((directory / "meta.json").read_text())
+    del meta["format"]
+    (directory / "meta.json").write_text(json.dumps(meta))
+    for name in ("phonetic_keys.npy", "phonetic_ids.npy", "translit.data.npy", "translit.offsets.npy"):
+        (directory / name).unlink()
+
+    mapped = open_index(str(directory))
+    assert mapped.screen_many(["Evgeniy Prigozhin", "Pablo Escobar"], 85) == index.screen_many(["Evgeniy Prigozhin", "Pablo Escobar"], 85)
+
+    meta["format"] = sanctions_snapshot.FORMAT + 1
+    (directory / "meta.json").write_text(json.dumps(meta))
+    with pytest.raises(ValueError):
+        open_index(str(directory))
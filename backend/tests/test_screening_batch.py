@@ -0,0 +1,35 @@
+import random
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.services.sanctions_index import SanctionsIndex
+from tests.names import perturb, random_name
+
+def test_screen_many_matches_per_name_screening():
+    rng = random.Random(5)
+    parties = [random_name(rng) for _ in range(2000)]
+    index = SanctionsIndex.from_names(parties)
+    names = [perturb(rng, rng.choice(parties)) for _ in range(200)] + [random_name(rng) for _ in range(50)] + ["", "Ivan"]
+    names += names[:10]  # duplicates are scored once
+
+    # A tiny cell budget forces many scoring groups
+    for max_cells in (4_000_000, 500):
+        batched = index.screen_many(names, 85.0, limit=3, max_cells=max_cells)
+        assert batched == [index.screen(name, 85.0, limit=3) for name in names]
+
+@pytest.mark.asyncio
+async def test_batch_screening_endpoint():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        payload = {"names": ["Ivan Dragg", "Alice Corp", "escobar pablo"], "max_matches": 2}
+        response = await ac.post("/api/v1/screening/batch", json=payload)
+        assert response.status_code == 401
+
+        token = (await ac.post("/token", data={"username": "nayan", "password": "secret"})).json()["access_token"]
+        response = await ac.post("/api/v1/screening/batch", json=payload, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["screened"] == 3 and body["hits"] == 2
+    assert [r["is_hit"] for r in body["results"]] == [True, False, True]
+    assert body["results"][0]["matches"][0]["matched_name"] == "Ivan Drago"
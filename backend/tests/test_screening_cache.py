@@ -0,0 +1,34 @@
+import time
+from app.core.cache import LRUCache
+from app.services.watchlist_service import WatchlistService
+
+def test_lru_cache_evicts_least_recently_used_and_expires():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # "b" is the least recently used
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1 and cache.stats()["hit_rate"] == 0.75
+
+    short = LRUCache(max_size=10, ttl_seconds=0.01)
+    short.set("a", 1)
+    time.sleep(0.02)
+    assert short.get("a", "expired") == "expired" and len(short) == 0
+
+def test_repeat_counterparties_hit_the_cache_until_the_list_changes(tmp_path):
+    service = WatchlistService()
+    assert service.check_sanction("Ivan Dragg")[0]
+    # Same normalized name: served from the cache
+    assert service.check_sanction("  IVAN, dragg ") == service.check_sanction("Ivan Dragg")
+    assert not service.check_sanction("Alice Corp")[0]
+    assert not service.check_sanction("alice corp")[0]
+    assert service.best_matches(["Alice Corp", "Pablo Escobarr"])[1].name == "Pablo Escobar"
+    assert service.stats()["cache"]["hits"] == 4
+
+    listing = tmp_path / "list.csv"
+    listing.write_text("uid,name\n1,Alice Corp\n")
+    service.load([str(listing)])
+    assert len(service.cache) == 0
+    assert service.check_sanction("alice corp")[0]
+    assert not service.check_sanction("Ivan Dragg")[0]
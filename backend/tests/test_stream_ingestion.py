@@ -0,0 +1,67 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.schemas.transaction import TransactionBatchItem
+from app.services import stream_ingestion
+
+def record(i: int, customer_id: int = 1) -> dict:
+    return {"customer_id": customer_id, "amount": 10.0 + i, "currency": "USD", "transaction_type": "PAYMENT",
+            "counterparty_name": "Utility Co", "counterparty_account": f"ACC{i}"}
+
+async def fake_process(items):
+    await asyncio.sleep(0.001)
+    return [TransactionBatchItem(index=k, status="COMPLETED", id=1000 + k, risk_score=0.0) for k, _ in enumerate(items)]
+
+@pytest.mark.asyncio
+async def test_stream_answers_every_line_in_order_and_applies_backpressure():
+    lines = [json.dumps(record(i)) for i in range(95)]
+    lines[7] = "{not json"
+    lines[40] = json.dumps({**record(40), "amount": -5})
+    payload = ("\n".join(lines) + "\n").encode()
+    processed, ahead = [0], []
+
+    async def body():
+        # Odd-sized chunks: records straddle chunk boundaries
+        for start in range(0, len(payload), 37):
+            # Lines pulled from the body but not yet through the pipeline
+            ahead.append(payload.count(b"\n", 0, start + 37) - processed[0])
+            yield payload[start:start + 37]
+
+    async def process(items):
+        result = await fake_process(items)
+        processed[0] += 10  # every batch covers 10 input lines
+        return result
+
+    out = [json.loads(line) async for line in stream_ingestion.ingest_ndjson(body(), process, batch_size=10, max_pending_batches=2)]
+    assert [d["index"] for d in out] == list(range(95))
+    assert out[7]["status"] == out[40]["status"] == "REJECTED"
+    assert sum(d["status"] == "COMPLETED" for d in out) == 93
+    # The reader never runs further ahead than the bounded queue, the batch in flight and the one being filled
+    assert max(ahead) <= (2 + 2) * 10 + 1
+
+@pytest.mark.asyncio
+async def test_stream_rejects_overlong_lines_and_reports_failed_batches():
+    payload = (json.dumps(record(0)) + "\n" + "x" * 500 + "\n" + json.dumps(record(2))).encode()
+
+    async def body():
+        for start in range(0, len(payload), 64):
+            yield payload[start:start + 64]
+
+    async def failing(items):
+        raise RuntimeError("database unavailable")
+
+    out = [json.loads(line) async for line in stream_ingestion.ingest_ndjson(body(), failing, batch_size=10, max_line_bytes=200)]
+    assert [(d["index"], d["status"]) for d in out] == [(0, "ERROR"), (1, "REJECTED"), (2, "ERROR")]
+
+def test_stream_endpoint_requires_a_token_and_streams_ndjson(monkeypatch):
+    monkeypatch.setattr(stream_ingestion, "_persist", fake_process)
+    client = TestClient(app)
+    body = "\n".join(json.dumps(record(i)) for i in range(3))
+    assert client.post("/api/v1/transactions/stream", content=body).status_code == 401
+
+    token = client.post("/token", data={"username": "nayan", "password": "secret"}).json()["access_token"]
+    response = client.post("/api/v1/transactions/stream", content=body, headers={"Authorization": f"Bearer {token}"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["index"] for line in response.text.splitlines()] == [0, 1, 2]
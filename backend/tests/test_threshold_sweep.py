@@ -0,0 +1,67 @@
+import itertools
+import random
+from types import SimpleNamespace
+import pytest
+from app.rules.batch import TransactionBatch
+from app.rules.engine import RuleEngine
+from app.rules.structuring import StructuringRule
+from app.rules.velocity import VelocityRule
+from app.rules.watchlist import WatchlistRule
+from app.services.sweep_service import ThresholdSweep
+from app.services.velocity_store import VelocityStore
+from app.services.watchlist_service import watchlist_service
+
+def make_history(n: int = 300):
+    rng = random.Random(7)
+    names = ["Alice Corp", "Ivan Dragg", "Pablo Escobarr", "Bob Ltd", "Osama Bin Ladn"]
+    ts = 1_700_000_000.0
+    rows = []
+    for _ in range(n):
+        ts += rng.uniform(1, 240)
+        rows.append(SimpleNamespace(
+            customer_id=rng.randint(1, 6), amount=rng.choice([150.0, 4000.0, 8500.0, 9200.0, 9800.0, 12000.0]),
+            counterparty_name=rng.choice(names), timestamp=ts,
+        ))
+    return TransactionBatch(rows)
+
+@pytest.mark.asyncio
+async def test_sweep_matches_one_replay_per_combination():
+    batch = make_history()
+    grid = {
+        "structuring": {"LOWER_BOUND": [8000.0, 9000.0], "REPORTING_THRESHOLD": [9500.0, 10000.0], "AGGREGATE_WINDOWS": ["1h"]},
+        "velocity": {"TIME_WINDOW_MINUTES": [5, 30], "MAX_TRANSACTIONS": [2, 4]},
+        "watchlist": {"threshold": [80.0, 95.0]},
+        "ALERT_THRESHOLD_SCORE": [50, 80],
+    }
+    rows = ThresholdSweep(batch, grid).run()
+    assert len(rows) == 4 * 4 * 2 * 2
+
+    original_threshold = watchlist_service.threshold
+    try:
+        for row in rows[::7]:
+            watchlist_service.threshold = row["watchlist.threshold"]
+            engine = RuleEngine(short_circuit=False)
+            engine.add_rule(StructuringRule(
+                LOWER_BOUND=row["structuring.LOWER_BOUND"], REPORTING_THRESHOLD=row["structuring.REPORTING_THRESHOLD"],
+                AGGREGATE_WINDOWS=["1h"],
+            ))
+            engine.add_rule(VelocityRule(
+                TIME_WINDOW_MINUTES=row["velocity.TIME_WINDOW_MINUTES"], MAX_TRANSACTIONS=row["velocity.MAX_TRANSACTIONS"],
+            ))
+            engine.add_rule(WatchlistRule())
+
+            # An empty store tracking the rules' windows: all history comes from the batch itself
+            store = VelocityStore.for_rules(engine.rules, buckets_per_window=1, max_customers=10)
+            store.is_warm = True
+            evaluation = await engine.evaluate_batch(batch, customer_context={"velocity_store": store})
+            hits = evaluation.hit_counts()
+            total = evaluation.total_risk
+
+            assert hits[StructuringRule.rule_name] == row["structuring_hits"]
+            assert hits[VelocityRule.rule_name] == row["velocity_hits"]
+            assert hits[WatchlistRule.rule_name] == row["watchlist_hits"]
+            assert int((total >= 100).sum()) == row["blocked"]
+            assert int(((total > 0) & (total < 100)).sum()) == row["flagged"]
+            assert int((total > row["ALERT_THRESHOLD_SCORE"]).sum()) == row["alerts"]
+    finally:
+        watchlist_service.threshold = original_threshold
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from app.models.base import Base
+from app.models.customer import Customer
+from app.models.transaction import Transaction
+from app.schemas.transaction import TransactionCreate
+from app.services.transaction_service import create_transactions_batch
+
+class SyncSessionAdapter:
+    """Awaitable facade over a synchronous SQLite session (no async SQLite driver here)."""
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.statements = 0
+
+    async def execute(self, statement, params=None):
+        self.statements += 1
+        return self.session.execute(statement, params)
+
+    async def commit(self):
+        self.session.commit()
+
+    async def rollback(self):
+        self.session.rollback()
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Customer.__table__, Transaction.__table__])
+    with Session(engine) as session:
+        session.add_all([Customer(id=1, full_name="Jane Example", email="a@example.com"), Customer(id=2, full_name="Max Muster", email="b@example.com")])
+        session.commit()
+        yield SyncSessionAdapter(session)
+    engine.dispose()
+
+def payment(customer_id: int, amount: float, counterparty: str = "Utility Co") -> TransactionCreate:
+    return TransactionCreate(
+        customer_id=customer_id, amount=amount, currency="USD", transaction_type="PAYMENT",
+        counterparty_name=counterparty, counterparty_account="DE89370400440532013000",
+    )
+
+@pytest.mark.asyncio
+async def test_batch_ingestion_persists_in_constant_round_trips_and_keeps_input_order(db):
+    items = [payment(1, 120.0), payment(99, 50.0), payment(2, 9500.0), payment(1, 80.0, "Pablo Escobar")]
+    items += [payment(2, 10.0) for _ in range(200)]
+    results = await create_transactions_batch(db, items)
+
+    assert [r.index for r in results] == list(range(len(items)))
+    assert results[1].status == "REJECTED" and results[1].id is None
+    assert results[0].status == "COMPLETED"
+    assert results[2].status == "FLAGGED" and "Structuring" in results[2].flagged_reason
+    assert results[3].status == "BLOCKED" and "SANCTION" in results[3].flagged_reason
+
+    # Ids match the persisted rows item by item, and the round trips do not grow with the batch
+    stored = dict(db.session.execute(select(Transaction.id, Transaction.transaction_uuid)).all())
+    assert all(stored[r.id] == r.transaction_uuid for r in results if r.status != "REJECTED")
+    assert db.session.scalar(select(func.count()).select_from(Transaction)) == len(items) - 1
+    assert db.statements <= 4
+
+@pytest.mark.asyncio
+async def test_batch_applies_the_graph_circular_kill_switch_and_syncs_the_graph(db, monkeypatch):
+    from app.services import transaction_service
+    lookups, writes = [], []
+
+    def circular_pairs(pairs):
+        lookups.append(list(pairs))
+        return {("2", "DE89370400440532013000")}
+
+    monkeypatch.setattr(transaction_service.graph_service, "circular_pairs", circular_pairs)
+    monkeypatch.setattr(transaction_service.graph_service, "record_transactions", writes.append)
+    results = await create_transactions_batch(db, [payment(1, 120.0), payment(2, 120.0), payment(99, 5.0), payment(2, 80.0)])
+
+    assert lookups == [[("1", "DE89370400440532013000"), ("2", "DE89370400440532013000")]]
+    assert results[0].status == "COMPLETED"
+    assert results[1].status == results[3].status == "BLOCKED" and "Circular Round-Trip" in results[3].flagged_reason
+
+    # Committed payments (not the rejected one) reach the graph in one write
+    assert len(writes) == 1
+    assert [(w["sender"], w["amount"]) for w in writes[0]] == [("1", 120.0), ("2", 120.0), ("2", 80.0)]
+    assert [w["txn_id"] for w in writes[0]] == [results[k].transaction_uuid for k in (0, 1, 3)]
+    assert writes[0][0]["sender_name"] == "Jane Example"
@@ -0,0 +1,124 @@
+import pytest
+from app.services.velocity_store import VelocityStore, parse_window
+
+def make_store(**overrides) -> VelocityStore:
+    params = dict(windows_seconds=[60, 600], buckets_per_window=10, max_customers=100)
+    params.update(overrides)
+    store = VelocityStore(**params)
+    store.is_warm = True
+    return store
+
+def test_parse_window_labels():
+    assert parse_window("5m") == 300
+    assert parse_window("24h") == 86400
+    assert parse_window("7d") == 604800
+
+def test_multi_window_counts_and_volumes():
+    store = make_store()
+    for ts, amount in ((100.0, 10.0), (400.0, 20.0), (650.0, 30.0), (655.0, 40.0)):
+        store.record(1, amount, ts)
+
+    assert store.window(1, 60, now=660.0) == (2, 70.0)
+    assert store.window(1, 600, now=720.0) == (3, 90.0)
+    # Time moves on without new activity: old buckets expire
+    assert store.window(1, 60, now=800.0) == (0, 0.0)
+    # Unknown customers simply have no history; untracked windows defer to the DB
+    assert store.window(2, 60, now=660.0) == (0, 0.0)
+    assert store.window(1, 3600, now=660.0) is None
+
+def test_windows_are_conservative_by_at_most_one_bucket():
+    store = make_store()
+    store.record(1, 5.0, 100.0)
+    # 61.5s later the entry is outside the 60s window but inside the extra 6s bucket
+    assert store.window(1, 60, now=161.5) == (1, 5.0)
+    assert store.window(1, 60, now=162.0) == (0, 0.0)
+
+def test_cold_store_defers_to_database():
+    store = VelocityStore(windows_seconds=[60], buckets_per_window=10, max_customers=100)
+    store.record(1, 50.0, 100.0)
+    assert store.window(1, 60, now=100.0) is None
+
+def test_memory_is_bounded():
+    store = make_store(max_customers=2)
+    store.record(1, 10.0, 100.0)
+    store.record(2, 10.0, 110.0)
+    store.record(3, 10.0, 120.0)
+    assert len(store) == 2
+    # Customer 1 lost in-horizon history: the store must not claim "0"
+    assert store.window(1, 600, now=130.0) is None
+
+    # Idle customers are dropped once their newest entry leaves the horizon
+    store.record(4, 10.0, 1000.0)
+    assert len(store) == 1
+
+def test_sub_threshold_series_only_sums_small_amounts():
+    store = make_store(sub_threshold_limit=10000.0, sub_threshold_windows_seconds=[600])
+    store.record(1, 4000.0, 100.0)
+    store.record(1, 25000.0, 110.0)
+    store.record(1, 4500.0, 120.0)
+
+    assert store.window(1, 600, now=130.0, series="sub_threshold") == (2, 8500.0)
+    assert store.window(1, 600, now=130.0) == (3, 33500.0)
+
+@pytest.mark.asyncio
+async def test_aggregated_structuring_fires_across_deposits():
+    """
+    Smurfing: three deposits of 4k are each harmless but add up past 10k.
+    """
+    from types import SimpleNamespace
+    from app.rules.structuring import StructuringRule
+
+    store = make_store(sub_threshold_limit=10000.0, sub_threshold_windows_seconds=[86400])
+    rule = StructuringRule(AGGREGATE_WINDOWS=["24h"])
+    context = {"customer_id": 7, "velocity_store": store}
+    deposit = SimpleNamespace(amount=4000.0)
+
+    for _ in range(2):
+        assert not (await rule.check(deposit, context)).triggered
+        store.record(7, deposit.amount)
+
+    result = await rule.check(deposit, context)
+    assert result.triggered
+    assert "3 sub-threshold transactions totalling 12000.00" in result.reason
+
+@pytest.mark.asyncio
+async def test_batch_history_expires_at_each_rows_own_timestamp():
+    """Four payments in four minutes, then one three days later: chunking must not change the outcome."""
+    from types import SimpleNamespace
+    from app.rules.batch import TransactionBatch
+    from app.rules.velocity import VelocityRule
+
+    rows = [SimpleNamespace(customer_id=1, amount=10.0, timestamp=1000.0 + 60 * i) for i in range(4)]
+    rows.append(SimpleNamespace(customer_id=1, amount=10.0, timestamp=1000.0 + 3 * 86400))
+    rule = VelocityRule(TIME_WINDOW_MINUTES=5, MAX_TRANSACTIONS=3)
+
+    async def replay(chunk_size: int):
+        store = make_store(windows_seconds=[300])
+        hits = []
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            result = await rule.check_batch(TransactionBatch(chunk), {"velocity_store": store})
+            hits.extend(result.triggered.tolist())
+            for row in chunk:
+                store.record(row.customer_id, row.amount, row.timestamp)
+        return hits
+
+    assert await replay(1000) == await replay(3) == await replay(1) == [False, False, False, True, False]
+
+@pytest.mark.asyncio
+async def test_sub_threshold_series_follows_the_structuring_rules_threshold(monkeypatch):
+    from app.core.config import settings
+    from app.rules.structuring import StructuringRule
+    from app.services import velocity_store as module
+
+    store = make_store(sub_threshold_windows_seconds=[600])
+    store.record(1, 4000.0, 100.0)
+    # No threshold yet: the series does not answer (the rule uses the DB path)
+    assert store.window(1, 600, now=130.0, series="sub_threshold") is None
+
+    monkeypatch.setattr(module, "velocity_store", store)
+    monkeypatch.setattr("app.rules.structuring.velocity_store", store)
+    monkeypatch.setattr(settings, "VELOCITY_STORE_ENABLED", False)
+    await StructuringRule(REPORTING_THRESHOLD=5000.0, AGGREGATE_WINDOWS=["10m"]).warm_up()
+    # A new limit drops the contents, to be re-warmed under it
+    assert store.sub_threshold_limit == 5000.0 and not store.is_warm and len(store) == 0